@@ -1,5 +1,9 @@
 from . import lossfunction
+from . import scheduler
+from . import sweep
 
 __all__ = [
-    'lossfunction'
+    'lossfunction',
+    'scheduler',
+    'sweep'
 ]
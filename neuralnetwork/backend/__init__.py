@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+
+from .numpy_backend import NumpyBackend
+from .threaded_backend import ThreadedNumpyBackend
+
+# Backend classes selectable by name in set_backend
+_backends = {
+    NumpyBackend.name: NumpyBackend,
+    ThreadedNumpyBackend.name: ThreadedNumpyBackend
+}
+
+_current = NumpyBackend()
+
+def get_backend():
+    return _current
+
+def set_backend(backend, **options):
+    """Select the backend every layer routes through, by name or instance. Returns the previous backend."""
+    global _current
+    previous = _current
+    if isinstance(backend, str):
+        if backend not in _backends:
+            raise ValueError(f"Unknown backend: {backend} (available: {list(_backends)})")
+        backend = _backends[backend](**options)
+    _current = backend
+    return previous
+
+def register_backend(backend_class):
+    _backends[backend_class.name] = backend_class
+
+@contextmanager
+def use_backend(backend, **options):
+    previous = set_backend(backend, **options)
+    try:
+        yield get_backend()
+    finally:
+        set_backend(previous)
+
+__all__ = [
+    'NumpyBackend',
+    'ThreadedNumpyBackend',
+    'get_backend',
+    'set_backend',
+    'register_backend',
+    'use_backend'
+]
@@ -0,0 +1,49 @@
+import numpy as np
+from scipy import signal
+
+class NumpyBackend:
+    """
+    Reference implementation of the hot kernels every layer routes through.
+
+    Alternative backends subclass this and override the kernels they speed up,
+    everything else falls back to plain NumPy / SciPy.
+    """
+
+    name = 'numpy'
+
+    def __init__(self):
+        # (subscripts, operand shapes) -> contraction path from np.einsum_path
+        self._einsum_paths = {}
+
+    def matmul(self, a, b, out=None):
+        return np.matmul(a, b, out=out)
+
+    def batched_matmul(self, a, b, out=None):
+        # (..., n, k) @ (..., k, m) with broadcasting over the leading axes
+        return np.matmul(a, b, out=out)
+
+    def einsum(self, subscripts, *operands):
+        key = (subscripts,) + tuple(operand.shape for operand in operands)
+        path = self._einsum_paths.get(key)
+        if path is None:
+            path = np.einsum_path(subscripts, *operands, optimize='optimal')[0]
+            self._einsum_paths[key] = path
+        return np.einsum(subscripts, *operands, optimize=path)
+
+    def softmax(self, inputs, axis=-1):
+        exp_inputs = np.exp(inputs - np.max(inputs, axis=axis, keepdims=True))
+        exp_inputs /= np.sum(exp_inputs, axis=axis, keepdims=True)
+        return exp_inputs
+
+    def layernorm(self, inputs, epsilon):
+        """Normalize over the last axis, returning (normalized, std)"""
+        mean = np.mean(inputs, axis=-1, keepdims=True)
+        variance = np.var(inputs, axis=-1, keepdims=True)
+        std = np.sqrt(variance + epsilon)
+        return (inputs - mean) / std, std
+
+    def correlate2d(self, inputs, kernel, mode='valid'):
+        return signal.correlate2d(inputs, kernel, mode)
+
+    def convolve2d(self, inputs, kernel, mode='full'):
+        return signal.convolve2d(inputs, kernel, mode)
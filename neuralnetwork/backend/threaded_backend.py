@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .numpy_backend import NumpyBackend
+
+class ThreadedNumpyBackend(NumpyBackend):
+    """
+    NumPy backend that shards large matmuls across a thread pool.
+
+    The rows of the left operand (or the leading batch axis of a batched matmul)
+    are split into one shard per thread. NumPy releases the GIL inside matmul,
+    so the shards run in parallel even when BLAS itself is single threaded.
+    """
+
+    name = 'threaded'
+
+    def __init__(self, num_threads=None, min_rows=256):
+        super().__init__()
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+
+    def matmul(self, a, b, out=None):
+        if a.ndim < 2 or b.ndim != 2 or self.num_threads == 1:
+            return super().matmul(a, b, out=out)
+
+        # Fold every leading axis into the rows: (..., n, k) -> (rows, k)
+        rows = a.reshape(-1, a.shape[-1])
+        if rows.shape[0] < self.min_rows:
+            return super().matmul(a, b, out=out)
+
+        result = np.empty((rows.shape[0], b.shape[1]), dtype=np.result_type(a.dtype, b.dtype))
+        self._parallel(rows.shape[0], lambda start, end: np.matmul(rows[start:end], b, out=result[start:end]))
+        result = result.reshape(a.shape[:-1] + (b.shape[1],))
+
+        if out is not None:
+            out[...] = result
+            return out
+        return result
+
+    def batched_matmul(self, a, b, out=None):
+        if a.ndim < 3 or b.ndim < 2 or self.num_threads == 1:
+            return super().batched_matmul(a, b, out=out)
+
+        shape = np.broadcast_shapes(a.shape[:-2], b.shape[:-2]) + (a.shape[-2], b.shape[-1])
+        # Shards split a's leading axis, which must be the leading batch axis of the result
+        if a.ndim < len(shape) or a.shape[0] != shape[0] or shape[0] < 2:
+            return super().batched_matmul(a, b, out=out)
+
+        if out is None:
+            out = np.empty(shape, dtype=np.result_type(a.dtype, b.dtype))
+
+        # b is shared by every shard unless it carries the leading batch axis too
+        shared_b = b.ndim < a.ndim or b.shape[0] == 1
+
+        def run(start, end):
+            np.matmul(a[start:end], b if shared_b else b[start:end], out=out[start:end])
+
+        self._parallel(shape[0], run)
+        return out
+
+    def _parallel(self, size, run):
+        bounds = np.linspace(0, size, min(self.num_threads, size) + 1).astype(int)
+        list(self._executor.map(run, bounds[:-1], bounds[1:]))
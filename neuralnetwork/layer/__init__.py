@@ -1,5 +1,5 @@
 from .layer import Layer
-from .activation import Sigmoid, Tanh, SoftMax, ReLU
+from .activation import Sigmoid, Tanh, SoftMax, ReLU, SiLU, GELU
 from .dense import Dense
 from .debug import DebugLayer, ShapeDebugLayer, StatDebugLayer, FullDebugLayer
 
@@ -10,6 +10,8 @@ __all__ = [
     'Tanh',
     'SoftMax',
     'ReLU',
+    'SiLU',
+    'GELU',
     'DebugLayer',
     'ShapeDebugLayer', 
     'StatDebugLayer',
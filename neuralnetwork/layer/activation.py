@@ -1,74 +1,108 @@
 import numpy as np
 
+from neuralnetwork.backend import get_backend
 from .layer import Layer
 
 class Activation(Layer):
     """
     Base activation layer for neural networks.
-    
+
     Expected input shape: Any shape (batch_size, ...)
     Output shape: Same as input shape
-    
+
     Applies element-wise activation function and its derivative.
+
+    When derivative_from_output is True, activation_prime receives the forward
+    output instead of the input, so backward never re-evaluates the activation.
+    Such activations can also run in place (in_place=True), overwriting their
+    input, when nothing else needs that input afterwards.
     """
 
-    def __init__(self, activation, activation_prime):
+    derivative_from_output = False
+    supports_out = True
+    supports_gradient_out = True
+
+    def __init__(self, activation=None, activation_prime=None, in_place=False):
         # Y = f(X) for all i
         # Where:
         #   Y is output (size)
         #   f(x) is weights (size -> size)
         #   X is input (size)
         super().__init__()
-        self.activation = activation
-        self.activation_prime = activation_prime
-
-    def forward(self, inputs):
+        if activation is not None:
+            self.activation = activation
+            # Plain functions are not expected to take out=
+            self.supports_out = False
+        if activation_prime is not None:
+            self.activation_prime = activation_prime
+
+        if in_place and not self.derivative_from_output:
+            raise ValueError(f"{type(self).__name__} needs its input in backward and cannot run in place")
+        self.in_place = in_place
+
+    def forward(self, inputs, out=None):
         self.input = inputs
-        return self.activation(self.input)
+        # Integer inputs cannot hold the result, they get a new array
+        if self.in_place and isinstance(inputs, np.ndarray) and np.issubdtype(inputs.dtype, np.floating):
+            self.output = self.activation(inputs, out=inputs)
+        elif out is not None:
+            self.output = self.activation(inputs, out=out)
+        else:
+            self.output = self.activation(inputs)
+        return self.output
 
-    def backward(self, output_gradient, learning_rate):
-        return np.multiply(output_gradient, self.activation_prime(self.input))
+    def backward(self, output_gradient, learning_rate, out=None):
+        cached = self.output if self.derivative_from_output else self.input
+        return np.multiply(output_gradient, self.activation_prime(cached), out=out)
+
+def _sigmoid(x, out=None):
+    if out is None:
+        # Integer inputs need a float buffer, float inputs keep their precision
+        dtype = x.dtype if np.issubdtype(x.dtype, np.floating) else np.float64
+        out = np.empty(x.shape, dtype)
+    out = np.clip(x, -500, 500, out=out)
+    np.negative(out, out=out)
+    np.exp(out, out=out)
+    out += 1
+    return np.reciprocal(out, out=out)
 
 class Tanh(Activation):
     """
     Hyperbolic tangent activation function.
-    
+
     Expected input shape: Any shape (batch_size, ...)
     Output shape: Same as input shape
-    
+
     Applies tanh activation element-wise.
     """
 
-    def __init__(self):
-        def tanh(x):
-            return np.tanh(x)
+    derivative_from_output = True
 
-        def tanh_prime(x):
-            return 1 - tanh(x) ** 2
+    def activation(self, x, out=None):
+        return np.tanh(x, out=out)
 
-        super().__init__(tanh, tanh_prime)
+    def activation_prime(self, y):
+        # tanh'(x) = 1 - tanh(x)^2
+        return 1 - np.square(y)
 
 class Sigmoid(Activation):
     """
     Sigmoid activation function.
-    
+
     Expected input shape: Any shape (batch_size, ...)
     Output shape: Same as input shape
-    
+
     Applies sigmoid activation element-wise with numerical stability.
     """
 
-    def __init__(self):
-        def sigmoid(x):
-            x = np.clip(x, -500, 500)
-            return 1 / (1 + np.exp(-x))
+    derivative_from_output = True
 
-        def sigmoid_prime(x):
-            x = np.clip(x, -500, 500)
-            s = sigmoid(x)
-            return s * (1 - s)
+    def activation(self, x, out=None):
+        return _sigmoid(x, out=out)
 
-        super().__init__(sigmoid, sigmoid_prime)
+    def activation_prime(self, y):
+        # sigmoid'(x) = sigmoid(x) * (1 - sigmoid(x))
+        return y * (1 - y)
 
 class SoftMax(Layer):
     """
@@ -82,10 +116,7 @@ class SoftMax(Layer):
 
     def forward(self, inputs):
         self.input = inputs
-        stable_inputs = inputs - np.max(inputs, axis=-1, keepdims=True)
-        exp_inputs = np.exp(stable_inputs)
-        sum_exp = np.sum(exp_inputs, axis=-1, keepdims=True)
-        self.output = exp_inputs / sum_exp
+        self.output = get_backend().softmax(inputs, axis=-1)
 
         return self.output
 
@@ -98,11 +129,79 @@ class SoftMax(Layer):
 
 class ReLU(Activation):
 
-    def __init__(self):
-        def relu(x):
-            return np.maximum(0, x)
+    derivative_from_output = True
+
+    def activation(self, x, out=None):
+        return np.maximum(x, 0, out=out)
+
+    def activation_prime(self, y):
+        # Boolean mask, multiplying by it needs no float copy
+        return y > 0
+
+class SiLU(Activation):
+    """
+    SiLU / swish activation: x * sigmoid(beta * x).
+
+    Expected input shape: Any shape (batch_size, ...)
+    Output shape: Same as input shape
+
+    The sigmoid is kept from forward, so backward only needs multiplications.
+    """
+
+    def __init__(self, beta=1.0):
+        super().__init__()
+        self.beta = beta
+        self.sigmoid = None
+
+    def forward(self, inputs, out=None):
+        self.input = inputs
+        self.sigmoid = _sigmoid(self.beta * inputs)
+        self.output = np.multiply(inputs, self.sigmoid, out=out)
+        return self.output
+
+    def backward(self, output_gradient, learning_rate, out=None):
+        # d/dx x * s(bx) = s + b * x * s * (1 - s)
+        s = self.sigmoid
+        return np.multiply(output_gradient, s + self.beta * self.input * s * (1 - s), out=out)
+
+class GELU(Activation):
+    """
+    GELU activation with a cheap approximation.
+
+    Expected input shape: Any shape (batch_size, ...)
+    Output shape: Same as input shape
+
+    approximate='tanh':    0.5 * x * (1 + tanh(sqrt(2 / pi) * (x + 0.044715 * x^3)))
+    approximate='sigmoid': x * sigmoid(1.702 * x), one exp per element
+    The tanh / sigmoid term is kept from forward, so backward only needs multiplications.
+    """
+
+    _TANH_SCALE = np.sqrt(2 / np.pi)
+    _SIGMOID_BETA = 1.702
+
+    def __init__(self, approximate='tanh'):
+        super().__init__()
+        if approximate not in ('tanh', 'sigmoid'):
+            raise ValueError(f"Unknown GELU approximation: {approximate}")
+        self.approximate = approximate
+        self.cached = None
+
+    def forward(self, inputs, out=None):
+        self.input = inputs
+        if self.approximate == 'sigmoid':
+            self.cached = _sigmoid(self._SIGMOID_BETA * inputs)
+            self.output = np.multiply(inputs, self.cached, out=out)
+        else:
+            self.cached = np.tanh(self._TANH_SCALE * (inputs + 0.044715 * inputs ** 3))
+            self.output = np.multiply(0.5 * inputs, 1 + self.cached, out=out)
+        return self.output
 
-        def relu_prime(x):
-            return (x > 0).astype(x.dtype)
+    def backward(self, output_gradient, learning_rate, out=None):
+        x = self.input
+        if self.approximate == 'sigmoid':
+            s = self.cached
+            return np.multiply(output_gradient, s + self._SIGMOID_BETA * x * s * (1 - s), out=out)
 
-        super().__init__(relu, relu_prime)
+        t = self.cached
+        inner_prime = self._TANH_SCALE * (1 + 3 * 0.044715 * x ** 2)
+        return np.multiply(output_gradient, 0.5 * (1 + t) + 0.5 * x * (1 - t ** 2) * inner_prime, out=out)
@@ -1,7 +1,11 @@
 from .convolutional import Convolutional
 from .reshape import Reshape
+from .pooling import MaxPool2D, AvgPool2D, GlobalAveragePool2D
 
 __all__ = [
     'Convolutional',
-    'Reshape'
+    'Reshape',
+    'MaxPool2D',
+    'AvgPool2D',
+    'GlobalAveragePool2D'
 ]
\ No newline at end of file
@@ -0,0 +1,387 @@
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from neuralnetwork.backend import get_backend
+
+# Every algorithm computes the same valid cross-correlation used by Convolutional:
+#   output[i] = sum_j correlate2d(inputs[j], kernels[i, j], 'valid')
+# and its gradients. An instance belongs to one layer and may cache data
+# between forward and backward. kernels_updated() drops what was derived from
+# the kernels, which a KernelCache also notices on its own.
+
+class KernelCache:
+    """
+    Arrays derived from the kernels (spectra, transformed kernels), recomputed
+    once the kernels differ from the copy they were derived from. The kernels
+    are small next to the activations, so comparing them on every call is cheap
+    and also catches in-place writes from outside the layer, e.g. Checkpointer.restore.
+    """
+
+    def __init__(self):
+        self.kernels = None
+        self.values = {}
+
+    def get(self, name, kernels, derive):
+        if self.kernels is None or self.kernels.shape != kernels.shape or not np.array_equal(self.kernels, kernels):
+            self.kernels = kernels.copy()
+            self.values = {}
+        if name not in self.values:
+            self.values[name] = derive(kernels)
+        return self.values[name]
+
+    def clear(self):
+        self.kernels = None
+        self.values = {}
+
+class DirectConvolution:
+    """One scipy correlate2d / convolve2d call per (output channel, input channel) pair"""
+
+    name = 'direct'
+
+    def forward(self, inputs, kernels):
+        backend = get_backend()
+        self.input = inputs
+        depth, input_depth = kernels.shape[:2]
+        output = None
+        for i in range(depth):
+            for j in range(input_depth):
+                channel = backend.correlate2d(inputs[j], kernels[i][j], "valid")
+                if output is None:
+                    output = np.zeros((depth,) + channel.shape)
+                output[i] += channel
+        return output
+
+    def backward(self, output_gradient, kernels):
+        backend = get_backend()
+        kernel_gradients = np.zeros(kernels.shape)
+        input_gradient = np.zeros(self.input.shape)
+        for i in range(kernels.shape[0]):
+            for j in range(kernels.shape[1]):
+                kernel_gradients[i][j] = backend.correlate2d(self.input[j], output_gradient[i], "valid")
+                input_gradient[j] += backend.convolve2d(output_gradient[i], kernels[i][j], "full")
+        return kernel_gradients, input_gradient
+
+    def kernels_updated(self):
+        pass
+
+    @staticmethod
+    def complexity(input_shape, kernel_size, depth):
+        # (kernel calls, multiply-adds) for one forward + backward
+        input_depth, height, width = input_shape
+        output_size = (height - kernel_size + 1) * (width - kernel_size + 1)
+        return 3 * depth * input_depth, 3 * depth * input_depth * output_size * kernel_size ** 2
+
+class Im2colConvolution:
+    """Unfold the input into (positions, input_depth * k * k) columns and use one matmul per pass"""
+
+    name = 'im2col'
+
+    def forward(self, inputs, kernels):
+        depth, input_depth, kernel_size, _ = kernels.shape
+        self.input_shape = inputs.shape
+
+        # (positions, input_depth * k * k), kept for the kernel gradient
+        self.columns = self._columns(inputs, kernel_size)
+        output_height = inputs.shape[1] - kernel_size + 1
+
+        output = get_backend().matmul(self.columns, kernels.reshape(depth, -1).T)
+        return output.T.reshape(depth, output_height, -1)
+
+    def backward(self, output_gradient, kernels):
+        backend = get_backend()
+        depth, input_depth, kernel_size, _ = kernels.shape
+
+        gradient_rows = output_gradient.reshape(depth, -1)
+        kernel_gradients = backend.matmul(gradient_rows, self.columns).reshape(kernels.shape)
+
+        # Full convolution == valid correlation of the padded gradient with the flipped kernels
+        padding = kernel_size - 1
+        padded = np.pad(output_gradient, ((0, 0), (padding, padding), (padding, padding)))
+        flipped = kernels[:, :, ::-1, ::-1].transpose(1, 0, 2, 3).reshape(input_depth, -1)
+
+        input_gradient = backend.matmul(self._columns(padded, kernel_size), flipped.T)
+        return kernel_gradients, input_gradient.T.reshape(self.input_shape)
+
+    def kernels_updated(self):
+        pass
+
+    @staticmethod
+    def _columns(inputs, kernel_size):
+        channels = inputs.shape[0]
+        windows = sliding_window_view(inputs, (kernel_size, kernel_size), axis=(1, 2))
+        # (channels, out_h, out_w, k, k) -> (out_h * out_w, channels * k * k)
+        return windows.transpose(1, 2, 0, 3, 4).reshape(-1, channels * kernel_size ** 2)
+
+    @staticmethod
+    def complexity(input_shape, kernel_size, depth):
+        input_depth, height, width = input_shape
+        output_size = (height - kernel_size + 1) * (width - kernel_size + 1)
+        return 3, 3 * depth * input_depth * output_size * kernel_size ** 2
+
+class FFTConvolution:
+    """
+    Correlation in the frequency domain with (height, width) sized real FFTs.
+
+    Circular correlation of that size never wraps into the valid region, so no
+    extra padding is needed. Each input spectrum is computed once and reused for
+    every output channel, and the kernel spectra are cached until the kernels change.
+    """
+
+    name = 'fft'
+
+    def __init__(self):
+        self.cache = KernelCache()
+
+    def _kernel_spectra(self, kernels):
+        # (depth, input_depth, h, w // 2 + 1)
+        return self.cache.get(self.size, kernels, lambda kernels: np.fft.rfft2(kernels, s=self.size))
+
+    def forward(self, inputs, kernels):
+        backend = get_backend()
+        kernel_size = kernels.shape[-1]
+        self.size = inputs.shape[1:]
+
+        self.input_spectra = np.fft.rfft2(inputs, s=self.size)  # (input_depth, h, w // 2 + 1)
+
+        # correlate(x, k) == irfft(X * conj(K)), summed over input channels
+        spectra = backend.einsum('jhw,ijhw->ihw', self.input_spectra, np.conj(self._kernel_spectra(kernels)))
+        output = np.fft.irfft2(spectra, s=self.size)
+
+        return output[:, :self.size[0] - kernel_size + 1, :self.size[1] - kernel_size + 1]
+
+    def backward(self, output_gradient, kernels):
+        backend = get_backend()
+        kernel_size = kernels.shape[-1]
+
+        gradient_spectra = np.fft.rfft2(output_gradient, s=self.size)  # (depth, h, w // 2 + 1)
+
+        # dK[i, j] = correlate(x[j], g[i]) over the first k x k lags
+        kernel_gradients = np.fft.irfft2(self.input_spectra[np.newaxis] * np.conj(gradient_spectra[:, np.newaxis]),
+                                         s=self.size)[:, :, :kernel_size, :kernel_size]
+
+        # dX[j] = sum_i convolve_full(g[i], k[i, j]), whose length is exactly (h, w)
+        input_gradient = np.fft.irfft2(backend.einsum('ihw,ijhw->jhw', gradient_spectra,
+                                                      self._kernel_spectra(kernels)), s=self.size)
+
+        return kernel_gradients, input_gradient
+
+    def kernels_updated(self):
+        self.cache.clear()
+
+    @staticmethod
+    def complexity(input_shape, kernel_size, depth):
+        input_depth, height, width = input_shape
+        area = height * width
+        transforms = 2 * input_depth + 2 * depth + depth * input_depth
+        return transforms, transforms * area * np.log2(max(area, 2)) + 3 * depth * input_depth * area
+
+class WinogradConvolution:
+    """
+    Winograd F(2x2, 3x3): every 2x2 output tile costs 16 instead of 36 multiplications.
+
+    Input tiles (4x4, stride 2) are transformed with B, kernels with G, their
+    elementwise products are summed over input channels (one batched matmul per
+    tile position) and the result is mapped back with A. The transformed kernels
+    are cached until the kernels change, for forward and for the input gradient.
+    """
+
+    name = 'winograd'
+    kernel_size = 3
+
+    # Kernel transform; the input (B) and output (A) transforms only need additions
+    G = np.array([[1, 0, 0],
+                  [0.5, 0.5, 0.5],
+                  [0.5, -0.5, 0.5],
+                  [0, 0, 1]])
+
+    def __init__(self):
+        self.cache = KernelCache()
+
+    def forward(self, inputs, kernels):
+        if kernels.shape[-1] != self.kernel_size:
+            raise ValueError(f"Winograd F(2x2, 3x3) needs 3x3 kernels, got {kernels.shape[-1]}x{kernels.shape[-1]}")
+        self.input = inputs
+        return self._correlate(inputs, self.cache.get('kernels', kernels, self._transform_kernels))
+
+    def backward(self, output_gradient, kernels):
+        output_height, output_width = output_gradient.shape[1:]
+
+        # dK[i, j] = correlate(x[j], g[i]): a (out_h x out_w) kernel, so plain contraction over the windows
+        windows = sliding_window_view(self.input, (output_height, output_width), axis=(1, 2))
+        kernel_gradients = get_backend().einsum('jabpq,ipq->ijab', windows, output_gradient)
+
+        # Full convolution == valid correlation of the padded gradient with flipped, transposed kernels
+        transformed_flipped_kernels = self.cache.get('flipped', kernels, self._transform_flipped_kernels)
+        padded = np.pad(output_gradient, ((0, 0), (2, 2), (2, 2)))
+        input_gradient = self._correlate(padded, transformed_flipped_kernels)
+
+        return kernel_gradients, input_gradient
+
+    def kernels_updated(self):
+        self.cache.clear()
+
+    def _transform_flipped_kernels(self, kernels):
+        return self._transform_kernels(kernels[:, :, ::-1, ::-1].transpose(1, 0, 2, 3))
+
+    def _transform_kernels(self, kernels):
+        # U = G g G^T per (output channel, input channel), laid out as (16, depth, input_depth)
+        transformed = np.einsum('ak,ijkl,bl->abij', self.G, kernels, self.G)
+        return transformed.reshape(16, kernels.shape[0], kernels.shape[1])
+
+    def _correlate(self, inputs, transformed_kernels):
+        channels, height, width = inputs.shape
+        depth = transformed_kernels.shape[1]
+        output_height, output_width = height - 2, width - 2
+        tiles_h, tiles_w = -(-output_height // 2), -(-output_width // 2)
+
+        # Pad so the 4x4 tiles with stride 2 cover every output
+        padded = np.pad(inputs, ((0, 0), (0, 2 * tiles_h + 2 - height), (0, 2 * tiles_w + 2 - width)))
+        tiles = sliding_window_view(padded, (4, 4), axis=(1, 2))[:, ::2, ::2]  # (channels, tiles_h, tiles_w, 4, 4)
+
+        # V = B^T d B, laid out as (16, channels, tiles)
+        transformed = self._transform_input(tiles.transpose(3, 4, 0, 1, 2)).reshape(16, channels, -1)
+
+        # Sum over input channels for each of the 16 tile positions
+        products = get_backend().batched_matmul(transformed_kernels, transformed)  # (16, depth, tiles)
+
+        # Y = A^T M A: (2, 2, depth, tiles_h, tiles_w)
+        output_tiles = self._transform_output(products.reshape(4, 4, depth, tiles_h, tiles_w))
+        output = output_tiles.transpose(2, 3, 0, 4, 1).reshape(depth, 2 * tiles_h, 2 * tiles_w)
+
+        return output[:, :output_height, :output_width]
+
+    @staticmethod
+    def _transform_input(d):
+        # B^T d B over the two leading (4, 4) axes
+        d = np.stack([d[0] - d[2], d[1] + d[2], d[2] - d[1], d[1] - d[3]])
+        return np.stack([d[:, 0] - d[:, 2], d[:, 1] + d[:, 2], d[:, 2] - d[:, 1], d[:, 1] - d[:, 3]], axis=1)
+
+    @staticmethod
+    def _transform_output(m):
+        # A^T m A over the two leading (4, 4) axes
+        m = np.stack([m[0] + m[1] + m[2], m[1] - m[2] - m[3]])
+        return np.stack([m[:, 0] + m[:, 1] + m[:, 2], m[:, 1] - m[:, 2] - m[:, 3]], axis=1)
+
+    @staticmethod
+    def complexity(input_shape, kernel_size, depth):
+        input_depth, height, width = input_shape
+        tiles = -(-(height - 2) // 2) * -(-(width - 2) // 2)
+        # Forward and input gradient through Winograd, kernel gradient as a direct contraction
+        return 8, (2 * 16 * depth * input_depth + 2 * 32 * (depth + input_depth)) * tiles + \
+            depth * input_depth * 9 * (height - 2) * (width - 2)
+
+ALGORITHMS = {
+    DirectConvolution.name: DirectConvolution,
+    Im2colConvolution.name: Im2colConvolution,
+    FFTConvolution.name: FFTConvolution,
+    WinogradConvolution.name: WinogradConvolution
+}
+
+# name -> (seconds per kernel call, seconds per unit of work), measured once per process
+# and shared by every Convolutional created with algorithm='auto'
+_calibration = None
+
+# Reference problems spanning small and large ratios of calls to work: (input_shape, kernel_size, depth).
+# More problems than the two coefficients, so the fit is overdetermined.
+_CALIBRATION_SHAPES = [((1, 12, 12), 3, 2), ((2, 20, 20), 3, 4), ((1, 28, 28), 5, 8), ((4, 24, 24), 3, 8),
+                       ((4, 40, 40), 7, 6)]
+
+def calibrate(force=False):
+    """Time every algorithm on the reference problems and fit its per-call and per-work cost"""
+    global _calibration
+    if _calibration is not None and not force:
+        return _calibration
+
+    rng = np.random.default_rng(0)
+    calibration = {}
+    for name, algorithm_class in ALGORITHMS.items():
+        complexity, timings = [], []
+        for input_shape, kernel_size, depth in _CALIBRATION_SHAPES:
+            # Fixed-size algorithms are timed with their own kernel size
+            kernel_size = getattr(algorithm_class, 'kernel_size', kernel_size)
+            inputs = rng.standard_normal(input_shape)
+            kernels = rng.standard_normal((depth, input_shape[0], kernel_size, kernel_size))
+            algorithm = algorithm_class()
+            output = algorithm.forward(inputs, kernels)
+
+            best = np.inf
+            for _ in range(3):
+                start = time.perf_counter()
+                algorithm.kernels_updated()
+                output = algorithm.forward(inputs, kernels)
+                algorithm.backward(output, kernels)
+                best = min(best, time.perf_counter() - start)
+
+            complexity.append(algorithm_class.complexity(input_shape, kernel_size, depth))
+            timings.append(best)
+
+        calibration[name] = _fit_costs(np.array(complexity, dtype=float), np.array(timings))
+
+    _calibration = calibration
+    return _calibration
+
+def _fit_costs(complexity, timings):
+    # Non-negative least squares of the relative error (rows scaled by 1 / time, so the
+    # small problems count as much as the large ones). With two coefficients, a negative
+    # one is dropped and the other refitted alone.
+    rows, targets = complexity / timings[:, np.newaxis], np.ones(len(timings))
+    coefficients = np.linalg.lstsq(rows, targets, rcond=None)[0]
+    if np.all(coefficients >= 0):
+        return tuple(coefficients)
+
+    best, best_error = None, np.inf
+    for kept in range(len(coefficients)):
+        column = rows[:, kept]
+        value = max(column @ targets / (column @ column), 0.0)
+        error = np.sum((column * value - targets) ** 2)
+        if error < best_error:
+            best, best_error = tuple(value if i == kept else 0.0 for i in range(len(coefficients))), error
+    return best
+
+def estimate_time(name, input_shape, kernel_size, depth):
+    calls, work = ALGORITHMS[name].complexity(input_shape, kernel_size, depth)
+    per_call, per_work = calibrate()[name]
+    return per_call * calls + per_work * work
+
+def select_algorithm(input_shape, kernel_size, depth, candidates=None):
+    """Name of the algorithm with the lowest estimated forward + backward time for this layer shape"""
+    candidates = [name for name in (candidates or ALGORITHMS) if _supports(name, kernel_size)]
+    return min(candidates, key=lambda name: estimate_time(name, input_shape, kernel_size, depth))
+
+def create_algorithm(name, input_shape, kernel_size, depth):
+    if name == 'auto':
+        name = select_algorithm(input_shape, kernel_size, depth)
+    if name not in ALGORITHMS:
+        raise ValueError(f"Unknown convolution algorithm: {name} (available: {['auto'] + list(ALGORITHMS)})")
+    if not _supports(name, kernel_size):
+        raise ValueError(f"Convolution algorithm {name} does not support {kernel_size}x{kernel_size} kernels")
+    return ALGORITHMS[name]()
+
+def check_against_direct(name, input_shape=(3, 13, 11), kernel_size=3, depth=4, seed=0, kernels=None,
+                         algorithm=None):
+    """
+    Largest absolute difference between an algorithm and the scipy path over forward and both gradients.
+    kernels and algorithm may be a layer's own, to check it with whatever it has cached.
+    """
+    rng = np.random.default_rng(seed)
+    inputs = rng.standard_normal(input_shape)
+    if kernels is None:
+        kernels = rng.standard_normal((depth, input_shape[0], kernel_size, kernel_size))
+
+    reference = DirectConvolution()
+    if algorithm is None:
+        algorithm = ALGORITHMS[name]()
+    expected, actual = reference.forward(inputs, kernels), algorithm.forward(inputs, kernels)
+    output_gradient = rng.standard_normal(expected.shape)
+
+    errors = [np.max(np.abs(expected - actual))]
+    for expected_gradient, actual_gradient in zip(reference.backward(output_gradient, kernels),
+                                                  algorithm.backward(output_gradient, kernels)):
+        errors.append(np.max(np.abs(expected_gradient - actual_gradient)))
+
+    return max(errors)
+
+def _supports(name, kernel_size):
+    return getattr(ALGORITHMS[name], 'kernel_size', kernel_size) == kernel_size
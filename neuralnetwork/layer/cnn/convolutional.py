@@ -1,11 +1,23 @@
 import numpy as np
-from scipy import signal
 
 from neuralnetwork.layer import Layer
+from neuralnetwork.layer.cnn.conv_algorithms import create_algorithm
 
 class Convolutional(Layer):
+    """
+    Valid 2D cross-correlation layer.
 
-    def __init__(self, input_shape, kernel_size, depth):
+    Expected input shape: (input_depth, height, width)
+    Output shape: (depth, height - kernel_size + 1, width - kernel_size + 1)
+
+    algorithm is 'direct' (scipy), 'im2col', 'fft', 'winograd' (3x3 kernels only)
+    or 'auto', which picks the fastest one for this layer shape from a one-time
+    micro-benchmark.
+    """
+
+    parameter_names = ('kernels', 'biases')
+
+    def __init__(self, input_shape, kernel_size, depth, algorithm='auto'):
         super().__init__()
         input_depth, input_height, input_width = input_shape
         self.depth = depth
@@ -15,22 +27,17 @@ class Convolutional(Layer):
         self.kernel_shape = (depth, input_depth, kernel_size, kernel_size)
         self.kernels = np.random.randn(*self.kernel_shape)
         self.biases = np.random.randn(*self.output_shape)
+        self.algorithm = create_algorithm(algorithm, input_shape, kernel_size, depth)
 
     def forward(self, inputs):
         self.input = inputs
-        self.output = np.copy(self.biases)
-        for i in range(self.depth):
-            for j in range(self.input_depth):
-                self.output[i] += signal.correlate2d(self.input[j], self.kernels[i][j], "valid")
+        self.output = self.biases + self.algorithm.forward(inputs, self.kernels)
         return self.output
 
     def backward(self, output_gradient, learning_rate):
-        kernel_gradients = np.zeros(self.kernel_shape)
-        input_gradient = np.zeros(self.input_shape)
-        for i in range(self.depth):
-            for j in range(self.input_depth):
-                kernel_gradients[i][j] = signal.correlate2d(self.input[j], output_gradient[i], "valid")
-                input_gradient[j] += signal.convolve2d(output_gradient[i], self.kernels[i][j], "full")
-        self.kernels += -learning_rate * kernel_gradients
-        self.biases += -learning_rate * output_gradient
+        kernel_gradients, input_gradient = self.algorithm.backward(output_gradient, self.kernels)
+        self._update(self.kernels, kernel_gradients, learning_rate)
+        self._update(self.biases, output_gradient, learning_rate)
+        # Only marks cached kernel transforms stale, so it is also right when the update is held back
+        self.algorithm.kernels_updated()
         return input_gradient
@@ -0,0 +1,102 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from neuralnetwork.layer import Layer
+
+class Pool2D(Layer):
+    """
+    Base 2D pooling layer over the last two axes.
+
+    Expected input shape: (..., height, width), e.g. (depth, height, width) or (batch_size, depth, height, width)
+    Output shape: (..., (height - pool_size) // stride + 1, (width - pool_size) // stride + 1)
+
+    Windows are strided views of the input, so forward never copies the patches.
+    """
+
+    def __init__(self, pool_size=2, stride=None):
+        super().__init__()
+        self.pool_size = pool_size
+        self.stride = stride or pool_size
+
+    def _windows(self, inputs):
+        # (..., out_h, out_w, pool_size, pool_size) view
+        windows = sliding_window_view(inputs, (self.pool_size, self.pool_size), axis=(-2, -1))
+        return windows[..., ::self.stride, ::self.stride, :, :]
+
+    def _offsets(self, output_shape):
+        # (offset, index) for every position inside a window, the index selects that
+        # position of every window as a strided (..., out_h, out_w) slice of the input
+        output_height, output_width = output_shape[-2:]
+        for row in range(self.pool_size):
+            for column in range(self.pool_size):
+                yield row * self.pool_size + column, \
+                    (Ellipsis, slice(row, row + self.stride * output_height, self.stride),
+                     slice(column, column + self.stride * output_width, self.stride))
+
+    def _scatter(self, contribution):
+        """
+        Sum contribution(offset) (shaped like the output) back into every window offset of the input.
+        One vectorised slice update per offset, overlapping windows included.
+        """
+        input_gradient = np.zeros(self.input.shape)
+        for offset, index in self._offsets(self.output.shape):
+            input_gradient[index] += contribution(offset)
+        return input_gradient
+
+class MaxPool2D(Pool2D):
+    """
+    Max pooling. The position of each maximum inside its window is stored as
+    a uint8 index instead of a full-size mask.
+    """
+
+    def forward(self, inputs):
+        self.input = inputs
+        output_shape = self._windows(inputs).shape[:-2]
+
+        # Running maximum over the window offsets, each one a strided slice of the input.
+        # Only strictly larger values move the index, so ties keep the first offset like argmax.
+        index_type = np.uint8 if self.pool_size ** 2 <= 256 else np.uint16
+        self.argmax = np.zeros(output_shape, dtype=index_type)
+        self.output = None
+        for offset, index in self._offsets(output_shape):
+            if self.output is None:
+                self.output = inputs[index].copy()
+                continue
+            larger = inputs[index] > self.output
+            np.copyto(self.output, inputs[index], where=larger)
+            self.argmax[larger] = offset
+
+        return self.output
+
+    def backward(self, output_gradient, learning_rate):
+        return self._scatter(lambda offset: np.where(self.argmax == offset, output_gradient, 0.0))
+
+class AvgPool2D(Pool2D):
+    """Average pooling"""
+
+    def forward(self, inputs):
+        self.input = inputs
+        self.output = np.mean(self._windows(inputs), axis=(-2, -1))
+        return self.output
+
+    def backward(self, output_gradient, learning_rate):
+        share = output_gradient / self.pool_size ** 2
+        return self._scatter(lambda offset: share)
+
+class GlobalAveragePool2D(Layer):
+    """
+    Average over the whole feature map of every channel.
+
+    Expected input shape: (..., depth, height, width)
+    Output shape: (..., depth)
+    """
+
+    def forward(self, inputs):
+        self.input = inputs
+        self.output = np.mean(inputs, axis=(-2, -1))
+        return self.output
+
+    def backward(self, output_gradient, learning_rate):
+        height, width = self.input.shape[-2:]
+        share = output_gradient[..., np.newaxis, np.newaxis] / (height * width)
+        return np.broadcast_to(share, self.input.shape).copy()
@@ -1,30 +1,38 @@
 from .layer import Layer
 import numpy as np
 
+from neuralnetwork.backend import get_backend
+
 class Dense(Layer):
+    supports_out = True
+    supports_gradient_out = True
+    parameter_names = ('weights', 'biases')
+
     def __init__(self, input_size, output_size):
         super().__init__()
         self.weights = np.random.randn(input_size, output_size) * np.sqrt(2. / input_size)
         self.biases = np.random.randn(1, output_size)
 
-    def forward(self, inputs):
+    def forward(self, inputs, out=None):
         self.input = inputs
-        self.output = np.matmul(inputs, self.weights) + self.biases
+        self.output = get_backend().matmul(inputs, self.weights, out=out)
+        self.output += self.biases
         return self.output
 
-    def backward(self, output_gradient, learning_rate):
+    def backward(self, output_gradient, learning_rate, out=None):
+        backend = get_backend()
         batch_size = output_gradient.shape[0]
 
-        weight_gradient = np.matmul(self.input.T, output_gradient)
+        weight_gradient = backend.matmul(self.input.T, output_gradient)
 
         bias_gradient = np.sum(output_gradient, axis=0, keepdims=True)
 
-        input_gradient = np.matmul(output_gradient, self.weights.T)
+        input_gradient = backend.matmul(output_gradient, self.weights.T, out=out)
 
         weight_gradient /= batch_size
         bias_gradient /= batch_size
 
-        self.weights -= learning_rate * weight_gradient
-        self.biases -= learning_rate * bias_gradient
+        self._update(self.weights, weight_gradient, learning_rate)
+        self._update(self.biases, bias_gradient, learning_rate)
 
         return input_gradient
\ No newline at end of file
@@ -0,0 +1,129 @@
+import math
+
+import numpy as np
+
+_collector = None
+
+def get_gradient_collector():
+    """The GradientCollector of the backward pass in progress, or None when layers update immediately"""
+    return _collector
+
+class GradientCollector:
+    """
+    Holds back the parameter updates of one backward pass so they can be
+    scaled together, e.g. clipped to a global gradient norm:
+
+        with GradientCollector() as gradients:
+            for layer in reversed(layers):
+                gradient = layer.backward(gradient, learning_rate)
+        grad_norm = gradients.apply(learning_rate, max_norm=1.0)
+
+    The squared norm is accumulated as gradients arrive, so clipping costs no
+    extra pass over them. Gradients must not be modified until apply().
+
+    A gradient added with columns only covers those (unique) indices of the
+    parameter's last axis, e.g. the vocabulary columns a sampled loss touched.
+    """
+
+    def __init__(self):
+        self.updates = []
+        self.squared_norm = 0.0
+        self._previous = None
+
+    def __enter__(self):
+        global _collector
+        self._previous = _collector
+        _collector = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _collector
+        _collector = self._previous
+        return False
+
+    def add(self, parameter, gradient, columns=None):
+        self.updates.append((parameter, gradient, columns))
+        self.squared_norm += float(np.vdot(gradient, gradient))
+
+    def norm(self):
+        return math.sqrt(self.squared_norm)
+
+    def apply(self, learning_rate, max_norm=None):
+        """
+        parameter -= learning_rate * gradient for every collected pair, with the
+        gradients scaled down to max_norm when their global norm is larger.
+        Returns the norm before clipping.
+        """
+        norm = self.norm()
+        step = learning_rate
+        if max_norm is not None and norm > max_norm:
+            step *= max_norm / (norm + 1e-6)
+
+        for parameter, gradient, columns in self.updates:
+            _subtract(parameter, step * gradient, columns)
+
+        self.updates = []
+        self.squared_norm = 0.0
+        return norm
+
+class SharedParameter:
+    """
+    A parameter array tied between several layers (e.g. an embedding and the output projection).
+
+    Every user adds its gradient for the step with accumulate(), and the summed
+    gradient is applied as one update once the last of the num_users users
+    has contributed. value is the array the layers read from. Users may hand in
+    gradients of a few columns only, the update stays sparse while all of them do.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.num_users = 0
+        self.gradient = None
+        self.columns = None
+        self.contributions = 0
+
+    def attach(self):
+        self.num_users += 1
+        return self.value
+
+    def accumulate(self, layer, gradient, learning_rate, columns=None):
+        # The first gradient of a step is taken over, so users must hand in a fresh array
+        if self.gradient is None:
+            self.gradient, self.columns = gradient, columns
+        elif columns is None and self.columns is None:
+            self.gradient += gradient
+        elif self.columns is None:
+            self.gradient[..., columns] += gradient
+        elif columns is None:
+            gradient[..., self.columns] += self.gradient
+            self.gradient, self.columns = gradient, None
+        else:
+            self.gradient, self.columns = _merge_columns(self.gradient, self.columns, gradient, columns)
+        self.contributions += 1
+
+        if self.contributions >= self.num_users:
+            layer._update(self.value, self.gradient, learning_rate, self.columns)
+            self.gradient = None
+            self.columns = None
+            self.contributions = 0
+
+def _subtract(parameter, update, columns=None):
+    if columns is None:
+        parameter -= update
+    else:
+        parameter[..., columns] -= update
+
+def _merge_columns(gradient, columns, other_gradient, other_columns):
+    # Sum of two column gradients over the union of their columns
+    merged_columns = np.union1d(columns, other_columns)
+    merged = np.zeros(gradient.shape[:-1] + (len(merged_columns),))
+    merged[..., np.searchsorted(merged_columns, columns)] += gradient
+    merged[..., np.searchsorted(merged_columns, other_columns)] += other_gradient
+    return merged, merged_columns
+
+def _as_shared(shared_weights):
+    # Layers taking shared_weights accept a SharedParameter or a plain array to share
+    if shared_weights is None or isinstance(shared_weights, SharedParameter):
+        return shared_weights
+    return SharedParameter(shared_weights)
@@ -1,4 +1,15 @@
+from .gradient import get_gradient_collector, _subtract
+
 class Layer:
+    # Layers that can write their forward output / input gradient into a
+    # preallocated array take it as forward(inputs, out=...) / backward(..., out=...)
+    supports_out = False
+    supports_gradient_out = False
+
+    # Attributes holding trainable arrays / nested layers (either may also be a list)
+    parameter_names = ()
+    sublayer_names = ()
+
     def __init__(self):
         self.input = None
         self.output = None
@@ -6,5 +17,42 @@ class Layer:
     def forward(self, inputs):
         raise NotImplementedError()
 
+    def forward_step(self, inputs, cache):
+        # Incremental forward used while decoding. Position-wise layers can
+        # reuse forward, layers that mix positions must override this.
+        return self.forward(inputs)
+
     def backward(self, output_gradient, learning_rate):
         raise NotImplementedError()
+
+    def sublayers(self):
+        for name in self.sublayer_names:
+            value = getattr(self, name)
+            yield from value if isinstance(value, list) else [value]
+
+    def parameters(self, prefix=''):
+        """(name, array) for every trainable array of this layer and its sublayers"""
+        for name in self.parameter_names:
+            value = getattr(self, name)
+            if isinstance(value, list):
+                for i, array in enumerate(value):
+                    yield f'{prefix}{name}.{i}', array
+            else:
+                yield prefix + name, value
+
+        for name in self.sublayer_names:
+            value = getattr(self, name)
+            if isinstance(value, list):
+                for i, layer in enumerate(value):
+                    yield from layer.parameters(f'{prefix}{name}.{i}.')
+            else:
+                yield from value.parameters(f'{prefix}{name}.')
+
+    def _update(self, parameter, gradient, learning_rate, columns=None):
+        # parameter -= learning_rate * gradient, held back while a GradientCollector is active.
+        # With columns the gradient only covers those (unique) indices of the parameter's last axis.
+        collector = get_gradient_collector()
+        if collector is None:
+            _subtract(parameter, learning_rate * gradient, columns)
+        else:
+            collector.add(parameter, gradient, columns)
@@ -0,0 +1,78 @@
+import numpy as np
+
+from neuralnetwork.backend import get_backend
+from .layer import Layer
+
+class QuantizedTensor:
+    """
+    Symmetric per-channel int8 weights with float32 scales.
+
+    values: int8 array with the same shape as the float weights
+    scales: one float32 scale per channel along `axis` (the output channels of a matmul weight)
+    """
+
+    def __init__(self, values, scales, axis=-1):
+        self.values = values
+        self.scales = scales
+        self.axis = axis
+        self.shape = values.shape
+
+    @classmethod
+    def from_float(cls, weights, axis=-1):
+        axis = axis % weights.ndim
+        reduce_axes = tuple(i for i in range(weights.ndim) if i != axis)
+
+        max_abs = np.max(np.abs(weights), axis=reduce_axes, keepdims=True)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+
+        values = np.clip(np.rint(weights / scales), -127, 127).astype(np.int8)
+
+        return cls(values, scales.reshape(-1), axis)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.scales.nbytes
+
+    def dequantize(self, dtype=np.float64):
+        shape = [1] * self.values.ndim
+        shape[self.axis] = -1
+        return self.values.astype(dtype) * self.scales.reshape(shape)
+
+def quantized_matmul(inputs, weights, tile_size=256):
+    """
+    inputs @ weights for an (input_size, output_size) QuantizedTensor with per-output-channel scales.
+
+    Only one tile of output columns is converted to float at a time, and the
+    scales are applied to the (smaller) matmul result instead of the weights.
+    """
+    backend = get_backend()
+    output_size = weights.shape[1]
+    output = np.empty(inputs.shape[:-1] + (output_size,), dtype=np.result_type(inputs.dtype, np.float32))
+
+    for start in range(0, output_size, tile_size):
+        end = min(start + tile_size, output_size)
+        tile = weights.values[:, start:end].astype(output.dtype)
+        output[..., start:end] = backend.matmul(inputs, tile)
+        output[..., start:end] *= weights.scales[start:end]
+
+    return output
+
+class QuantizedDense(Layer):
+    """
+    Inference-only Dense layer with int8 weights.
+
+    Expected input shape: (batch_size, input_size)
+    Output shape: (batch_size, output_size)
+    """
+
+    def __init__(self, dense, tile_size=256):
+        super().__init__()
+        self.weights = QuantizedTensor.from_float(dense.weights)
+        self.biases = dense.biases.copy()
+        self.tile_size = tile_size
+
+    def forward(self, inputs):
+        self.input = inputs
+        self.output = quantized_matmul(inputs, self.weights, self.tile_size)
+        self.output += self.biases
+        return self.output
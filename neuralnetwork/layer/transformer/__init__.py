@@ -1,18 +1,29 @@
-from .attention import SingleHeadAttention, MultiHeadAttention
+from .attention import SingleHeadAttention, MultiHeadAttention, GroupedQueryAttention, MultiQueryAttention
+from .local_attention import BandedAttention
+from .linear_attention import LinearAttention
 from .positional_encoding import PositionalEncoding
 from .add_and_norm import AddAndNorm
 from .normalization import Normalization
-from .embedding_projection import Embedding, Projection, create_shared_embedding_projection
+from .embedding_projection import Embedding, Projection, ChunkedProjection, create_shared_embedding_projection
 from .transformer_ffn import TransformerFFN
+from .output_head import OutputHead, SampledSoftmax, AdaptiveSoftmax
 
 __all__ = [
     'SingleHeadAttention',
     'MultiHeadAttention',
+    'GroupedQueryAttention',
+    'MultiQueryAttention',
+    'BandedAttention',
+    'LinearAttention',
     'PositionalEncoding',
     'AddAndNorm',
     'Normalization',
     'Embedding',
     'Projection',
+    'ChunkedProjection',
     'create_shared_embedding_projection',
-    'TransformerFFN'
+    'TransformerFFN',
+    'OutputHead',
+    'SampledSoftmax',
+    'AdaptiveSoftmax'
 ]
\ No newline at end of file
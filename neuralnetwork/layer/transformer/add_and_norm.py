@@ -1,3 +1,5 @@
+import numpy as np
+
 from neuralnetwork.layer import Layer
 from neuralnetwork.layer.transformer.normalization import Normalization
 
@@ -11,6 +13,9 @@ class AddAndNorm(Layer):
     Applies: LayerNorm(x) -> Sublayer -> Add residual connection
     """
 
+    supports_out = True
+    sublayer_names = ('normalization', 'sublayer')
+
     def __init__(self, d_model, sublayer):
         super().__init__()
         self.normalization = Normalization(d_model)
@@ -18,7 +23,7 @@ class AddAndNorm(Layer):
         self.sub_output = None
         self.norm_output = None
 
-    def forward(self, inputs):
+    def forward(self, inputs, out=None):
         """
         Process inputs through Add & Norm layer
         """
@@ -31,6 +36,17 @@ class AddAndNorm(Layer):
         self.sub_output = self.sublayer.forward(self.norm_output)
 
         # Add residual connection (vectorized)
+        self.output = np.add(self.input, self.sub_output, out=out)
+
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        """
+        Incremental Add & Norm used while decoding
+        """
+        self.input = inputs
+        self.norm_output = self.normalization.forward(self.input)
+        self.sub_output = self.sublayer.forward_step(self.norm_output, cache)
         self.output = self.input + self.sub_output
 
         return self.output
@@ -1,7 +1,9 @@
 import numpy as np
 
+from neuralnetwork.backend import get_backend
 from neuralnetwork.layer import Layer
 from neuralnetwork.layer.activation import SoftMax
+from neuralnetwork.layer.transformer.local_attention import BandedAttention
 
 class SingleHeadAttention(Layer):
     """
@@ -9,12 +11,20 @@ class SingleHeadAttention(Layer):
 
     Expected input shape: (batch_size, seq_len, d_model)
     Output shape: (batch_size, seq_len, d_model)
+
+    With a window every position only attends positions less than window
+    away, plus the first global_tokens positions (see BandedAttention), at
+    O(seq_len * window) cost. Without one, attention spans the whole sequence.
     """
 
-    def __init__(self, d_model, mask=True):
+    parameter_names = ('weight_q', 'weight_k', 'weight_v')
+
+    def __init__(self, d_model, mask=True, window=None, global_tokens=0):
         super().__init__()
         self.d_model = d_model
         self.mask = mask
+        self.window = window
+        self.local = BandedAttention(window, global_tokens, causal=mask) if window is not None else None
         self.weight_q = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
         self.weight_k = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
         self.weight_v = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
@@ -23,16 +33,22 @@ class SingleHeadAttention(Layer):
         self.K = None
         self.V = None
         self.attention_weights = None
+        self.banded = False
         self.softmax = SoftMax()
 
     def forward(self, inputs):
         self.input = inputs
         batch_size, seq_len, d_model = inputs.shape
-        self.Q = np.matmul(inputs, self.weight_q)
-        self.K = np.matmul(inputs, self.weight_k)
-        self.V = np.matmul(inputs, self.weight_v)
+        backend = get_backend()
+        self.Q, self.K, self.V = self._project(inputs)
+
+        # A window covering the whole sequence is plain attention, without the band's padding
+        self.banded = self.local is not None and seq_len > self.window
+        if self.banded:
+            self.output = self.local.forward(self.Q, self.K, self.V)
+            return self.output
 
-        scores = np.einsum('bsd,btd->bst', self.Q, self.K) / np.sqrt(self.d_model)
+        scores = backend.einsum('bsd,btd->bst', self.Q, self.K) / np.sqrt(self.d_model)
 
         if self.mask:
             # Causal mask (look-ahead mask)
@@ -41,14 +57,65 @@ class SingleHeadAttention(Layer):
 
         self.attention_weights = self.softmax.forward(scores)
 
-        self.output = np.matmul(self.attention_weights, self.V)
+        self.output = backend.batched_matmul(self.attention_weights, self.V)
+
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        self.input = inputs
+        backend = get_backend()
+        q, k, v = self._project(inputs)
+
+        # Attend over every cached key/value plus the new ones
+        if self.local is None:
+            keys, values = cache.append(self, k, v)
+            mask = cache.attention_mask(causal=self.mask)
+        else:
+            # Cached key positions tell which keys are still inside the window
+            keys, values, key_positions = cache.append(self, k, v, cache.positions)
+            mask = cache.attention_mask(causal=self.mask) & self.local.step_mask(cache.positions, key_positions)
+
+        scores = backend.einsum('bsd,btd->bst', q, keys) / np.sqrt(self.d_model)
+        scores = np.where(mask, scores, -1e9)
+
+        attention_weights = self.softmax.forward(scores)
+
+        self.output = backend.batched_matmul(attention_weights, values)
 
         return self.output
 
+    def _project(self, inputs):
+        backend = get_backend()
+        return (backend.matmul(inputs, self.weight_q),
+                backend.matmul(inputs, self.weight_k),
+                backend.matmul(inputs, self.weight_v))
+
     def backward(self, output_gradient, learning_rate):
-        batch_size, seq_len, d_model = self.input.shape
-        d_v = np.einsum('bts,bsd->btd', self.attention_weights.transpose(0, 2, 1), output_gradient)
-        d_attention_weights = np.einsum('bsd,bdt->bst', output_gradient, self.V.transpose(0, 2, 1))
+        backend = get_backend()
+        if self.banded:
+            d_q, d_k, d_v = self.local.backward(output_gradient)
+        else:
+            d_q, d_k, d_v = self._attention_backward(output_gradient)
+
+        d_weight_q = backend.einsum('bij,bjk->ik', self.input.transpose(0, 2, 1), d_q)
+        d_weight_k = backend.einsum('bij,bjk->ik', self.input.transpose(0, 2, 1), d_k)
+        d_weight_v = backend.einsum('bij,bjk->ik', self.input.transpose(0, 2, 1), d_v)
+
+        input_gradient = (backend.matmul(d_q, self.weight_q.T) +
+                          backend.matmul(d_k, self.weight_k.T) +
+                          backend.matmul(d_v, self.weight_v.T))
+
+        self._update(self.weight_q, d_weight_q, learning_rate)
+        self._update(self.weight_k, d_weight_k, learning_rate)
+        self._update(self.weight_v, d_weight_v, learning_rate)
+
+        return input_gradient
+
+    def _attention_backward(self, output_gradient):
+        backend = get_backend()
+        seq_len = self.input.shape[1]
+        d_v = backend.einsum('bts,bsd->btd', self.attention_weights.transpose(0, 2, 1), output_gradient)
+        d_attention_weights = backend.einsum('bsd,bdt->bst', output_gradient, self.V.transpose(0, 2, 1))
 
         d_scores = self.softmax.backward(d_attention_weights, 0.0)  # Softmax doesn't use learning_rate
 
@@ -56,22 +123,10 @@ class SingleHeadAttention(Layer):
             seq_mask = np.triu(np.ones((seq_len, seq_len)), k=1).astype(bool)
             d_scores[:, seq_mask] = 0
             
-        d_q = np.matmul(d_scores, self.K) / np.sqrt(self.d_model)
-        d_k = np.matmul(d_scores.transpose(0, 2, 1), self.Q) / np.sqrt(self.d_model)
-
-        d_weight_q = np.einsum('bij,bjk->ik', self.input.transpose(0, 2, 1), d_q)
-        d_weight_k = np.einsum('bij,bjk->ik', self.input.transpose(0, 2, 1), d_k)
-        d_weight_v = np.einsum('bij,bjk->ik', self.input.transpose(0, 2, 1), d_v)
-
-        input_gradient = (np.matmul(d_q, self.weight_q.T) +
-                          np.matmul(d_k, self.weight_k.T) +
-                          np.matmul(d_v, self.weight_v.T))
+        d_q = backend.batched_matmul(d_scores, self.K) / np.sqrt(self.d_model)
+        d_k = backend.batched_matmul(d_scores.transpose(0, 2, 1), self.Q) / np.sqrt(self.d_model)
 
-        self.weight_q -= learning_rate * d_weight_q
-        self.weight_k -= learning_rate * d_weight_k
-        self.weight_v -= learning_rate * d_weight_v
-
-        return input_gradient
+        return d_q, d_k, d_v
 
 class MultiHeadAttention(Layer):
     """
@@ -79,9 +134,14 @@ class MultiHeadAttention(Layer):
 
     Expected input shape: (batch_size, seq_len, d_model)
     Output shape: (batch_size, seq_len, d_model)
+
+    window and global_tokens make every head sliding-window attention.
     """
 
-    def __init__(self, d_model, num_heads, mask=True):
+    parameter_names = ('weight_o',)
+    sublayer_names = ('attention_heads',)
+
+    def __init__(self, d_model, num_heads, mask=True, window=None, global_tokens=0):
         super().__init__()
         self.d_model = d_model
         self.num_heads = num_heads
@@ -91,7 +151,8 @@ class MultiHeadAttention(Layer):
             
         self.d_k = d_model // num_heads
 
-        self.attention_heads = [SingleHeadAttention(self.d_k, mask=mask) for _ in range(num_heads)]
+        self.attention_heads = [SingleHeadAttention(self.d_k, mask=mask, window=window, global_tokens=global_tokens)
+                                for _ in range(num_heads)]
 
         self.weight_o = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
 
@@ -112,16 +173,33 @@ class MultiHeadAttention(Layer):
             self.head_outputs.append(head_output)
 
         self.concat_output = np.concatenate(self.head_outputs, axis=-1)
-        self.output = np.matmul(self.concat_output, self.weight_o)
+        self.output = self._project_output(self.concat_output)
+
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        self.input = inputs
+        batch_size, seq_len, d_model = inputs.shape
+
+        input_heads = inputs.reshape(batch_size, seq_len, self.num_heads, self.d_k)
+
+        head_outputs = [self.attention_heads[h].forward_step(input_heads[:, :, h, :], cache)
+                        for h in range(self.num_heads)]
+
+        self.output = self._project_output(np.concatenate(head_outputs, axis=-1))
 
         return self.output
 
+    def _project_output(self, concat_output):
+        return get_backend().matmul(concat_output, self.weight_o)
+
     def backward(self, output_gradient, learning_rate):
+        backend = get_backend()
         batch_size, seq_len, d_model = self.input.shape
 
-        d_concat_output = np.matmul(output_gradient, self.weight_o.T)
+        d_concat_output = backend.matmul(output_gradient, self.weight_o.T)
 
-        d_weight_o = np.einsum('bsd,bsh->dh', self.concat_output, output_gradient)
+        d_weight_o = backend.einsum('bsd,bsh->dh', self.concat_output, output_gradient)
         head_grad_size = self.d_k
         head_gradients = []
         for h in range(self.num_heads):
@@ -138,6 +216,174 @@ class MultiHeadAttention(Layer):
             
         input_gradient = input_gradient_heads.reshape(batch_size, seq_len, d_model)
 
-        self.weight_o -= learning_rate * d_weight_o
+        self._update(self.weight_o, d_weight_o, learning_rate)
 
         return input_gradient
+
+class GroupedQueryAttention(Layer):
+    """
+    Grouped-query attention: num_heads query heads share num_kv_heads key/value heads.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, d_model)
+
+    As in MultiHeadAttention, query head h projects only its d_k slice of the
+    input. Query heads are split into num_kv_heads groups of
+    num_heads // num_kv_heads, and each group attends over one shared
+    key/value head projected from the mean of the group's input slices. The
+    K/V weights, projection FLOPs and decode cache per token are num_heads /
+    num_kv_heads times smaller than in MultiHeadAttention; with
+    num_kv_heads == num_heads it computes the same function.
+    """
+
+    parameter_names = ('weight_q', 'weight_k', 'weight_v', 'weight_o')
+
+    def __init__(self, d_model, num_heads, num_kv_heads, mask=True):
+        super().__init__()
+        if d_model % num_heads != 0:
+            raise ValueError(f"d_model ({d_model}) must be divisible by num_heads ({num_heads})")
+        if num_heads % num_kv_heads != 0:
+            raise ValueError(f"num_heads ({num_heads}) must be divisible by num_kv_heads ({num_kv_heads})")
+
+        self.d_model = d_model
+        self.num_heads = num_heads
+        self.num_kv_heads = num_kv_heads
+        self.group_size = num_heads // num_kv_heads
+        self.d_k = d_model // num_heads
+        self.mask = mask
+
+        # One (d_k, d_k) projection per head, the same sizes as the heads of MultiHeadAttention
+        self.weight_q = np.random.normal(0, np.sqrt(1.0 / self.d_k), (num_heads, self.d_k, self.d_k))
+        self.weight_k = np.random.normal(0, np.sqrt(1.0 / self.d_k), (num_kv_heads, self.d_k, self.d_k))
+        self.weight_v = np.random.normal(0, np.sqrt(1.0 / self.d_k), (num_kv_heads, self.d_k, self.d_k))
+        self.weight_o = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
+
+        self.Q = None
+        self.K = None
+        self.V = None
+        self.kv_input = None
+        self.attention_weights = None
+        self.concat_output = None
+
+    def _split_heads(self, inputs):
+        # (batch_size, seq_len, d_model) -> query head slices (batch_size, seq_len, num_heads, d_k)
+        # and the mean slice of every group (batch_size, seq_len, num_kv_heads, d_k)
+        batch_size, seq_len, _ = inputs.shape
+        query_input = inputs.reshape(batch_size, seq_len, self.num_heads, self.d_k)
+        kv_input = query_input.reshape(batch_size, seq_len, self.num_kv_heads, self.group_size, self.d_k).mean(axis=3)
+        return query_input, kv_input
+
+    def _project(self, inputs):
+        # Q: (batch_size, seq_len, num_kv_heads, group_size, d_k), K / V: (batch_size, seq_len, num_kv_heads, d_k)
+        backend = get_backend()
+        batch_size, seq_len, _ = inputs.shape
+        query_input, self.kv_input = self._split_heads(inputs)
+        q = backend.einsum('bshi,hij->bshj', query_input, self.weight_q)
+        k = backend.einsum('bsgi,gij->bsgj', self.kv_input, self.weight_k)
+        v = backend.einsum('bsgi,gij->bsgj', self.kv_input, self.weight_v)
+        return q.reshape(batch_size, seq_len, self.num_kv_heads, self.group_size, self.d_k), k, v
+
+    def _group_queries(self, q):
+        # (batch_size, seq_len, num_kv_heads, group_size, d_k) -> (batch_size, num_kv_heads, group_size * seq_len, d_k)
+        batch_size, seq_len = q.shape[:2]
+        return q.transpose(0, 2, 3, 1, 4).reshape(batch_size, self.num_kv_heads, self.group_size * seq_len, self.d_k)
+
+    def _ungroup_queries(self, grouped, seq_len):
+        # Inverse of _group_queries, flattened to (batch_size, seq_len, d_model)
+        batch_size = grouped.shape[0]
+        grouped = grouped.reshape(batch_size, self.num_kv_heads, self.group_size, seq_len, self.d_k)
+        return grouped.transpose(0, 3, 1, 2, 4).reshape(batch_size, seq_len, self.d_model)
+
+    def _attend(self, q, keys, values, mask):
+        # mask: (seq_len, length) or (batch_size, seq_len, length) of the slots each query may attend
+        # All query heads of a group are stacked along the rows, so a group is one matmul against its K/V head
+        backend = get_backend()
+        batch_size, seq_len = q.shape[:2]
+        length = keys.shape[1]
+
+        scores = backend.batched_matmul(self._group_queries(q), keys.transpose(0, 2, 3, 1)) / np.sqrt(self.d_k)
+        scores = scores.reshape(batch_size, self.num_kv_heads, self.group_size, seq_len, length)
+        if mask is not None:
+            scores = np.where(mask[..., np.newaxis, np.newaxis, :, :], scores, -1e9)
+
+        attention_weights = backend.softmax(scores, axis=-1)
+        heads = backend.batched_matmul(attention_weights.reshape(batch_size, self.num_kv_heads, -1, length),
+                                       values.transpose(0, 2, 1, 3))
+        return attention_weights, self._ungroup_queries(heads, seq_len)
+
+    def forward(self, inputs):
+        self.input = inputs
+        seq_len = inputs.shape[1]
+        self.Q, self.K, self.V = self._project(inputs)
+
+        mask = np.tril(np.ones((seq_len, seq_len), dtype=bool)) if self.mask else None
+        self.attention_weights, self.concat_output = self._attend(self.Q, self.K, self.V, mask)
+
+        self.output = get_backend().matmul(self.concat_output, self.weight_o)
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        self.input = inputs
+        q, k, v = self._project(inputs)
+
+        # Only the shared key/value heads are cached
+        keys, values = cache.append(self, k, v)
+        _, concat_output = self._attend(q, keys, values, cache.attention_mask(causal=self.mask))
+
+        self.output = get_backend().matmul(concat_output, self.weight_o)
+        return self.output
+
+    def backward(self, output_gradient, learning_rate):
+        backend = get_backend()
+        batch_size, seq_len, _ = self.input.shape
+        weights = self.attention_weights.reshape(batch_size, self.num_kv_heads, -1, seq_len)
+
+        d_weight_o = backend.einsum('bsd,bsh->dh', self.concat_output, output_gradient)
+        d_heads = self._group_queries(backend.matmul(output_gradient, self.weight_o.T).reshape(self.Q.shape))
+
+        # Keys and values collect the gradient of every query head in their group
+        d_v = backend.batched_matmul(weights.transpose(0, 1, 3, 2), d_heads)
+        d_weights = backend.batched_matmul(d_heads, self.V.transpose(0, 2, 3, 1))
+        d_scores = weights * (d_weights - np.sum(weights * d_weights, axis=-1, keepdims=True))
+
+        if self.mask:
+            causal = np.triu(np.ones((seq_len, seq_len), dtype=bool), k=1)
+            d_scores.reshape(batch_size, self.num_kv_heads, self.group_size, seq_len, seq_len)[..., causal] = 0
+
+        d_scores /= np.sqrt(self.d_k)
+        d_q = self._ungroup_queries(backend.batched_matmul(d_scores, self.K.transpose(0, 2, 1, 3)), seq_len)
+        d_q = d_q.reshape(batch_size, seq_len, self.num_heads, self.d_k)
+        d_k = backend.batched_matmul(d_scores.transpose(0, 1, 3, 2), self._group_queries(self.Q)).transpose(0, 2, 1, 3)
+        d_v = d_v.transpose(0, 2, 1, 3)
+
+        query_input = self.input.reshape(batch_size, seq_len, self.num_heads, self.d_k)
+        d_weight_q = backend.einsum('bshi,bshj->hij', query_input, d_q)
+        d_weight_k = backend.einsum('bsgi,bsgj->gij', self.kv_input, d_k)
+        d_weight_v = backend.einsum('bsgi,bsgj->gij', self.kv_input, d_v)
+
+        # Every slice of a group gets an equal share of the gradient of their mean
+        d_kv_input = (backend.einsum('bsgj,gij->bsgi', d_k, self.weight_k) +
+                      backend.einsum('bsgj,gij->bsgi', d_v, self.weight_v)) / self.group_size
+        input_gradient = backend.einsum('bshj,hij->bshi', d_q, self.weight_q).reshape(
+            batch_size, seq_len, self.num_kv_heads, self.group_size, self.d_k)
+        input_gradient += d_kv_input[:, :, :, np.newaxis, :]
+        input_gradient = input_gradient.reshape(batch_size, seq_len, self.d_model)
+
+        self._update(self.weight_q, d_weight_q, learning_rate)
+        self._update(self.weight_k, d_weight_k, learning_rate)
+        self._update(self.weight_v, d_weight_v, learning_rate)
+        self._update(self.weight_o, d_weight_o, learning_rate)
+
+        return input_gradient
+
+class MultiQueryAttention(GroupedQueryAttention):
+    """
+    Multi-query attention: every query head shares a single key/value head,
+    the smallest K/V projections and decode cache (2 * d_k values per token).
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, d_model)
+    """
+
+    def __init__(self, d_model, num_heads, mask=True):
+        super().__init__(d_model, num_heads, 1, mask=mask)
@@ -1,17 +1,9 @@
 import numpy as np
 
-# Assuming Layer is defined elsewhere. For completeness, including a placeholder.
-class Layer:
-    def __init__(self):
-        self.input = None
-        self.output = None
-
-    def forward(self, inputs):
-        raise NotImplementedError
-
-    def backward(self, output_gradient, learning_rate):
-        raise NotImplementedError
-
+from neuralnetwork.backend import get_backend
+from neuralnetwork.layer import Layer
+from neuralnetwork.layer.gradient import SharedParameter, _as_shared
+from neuralnetwork.layer.transformer.output_head import OutputHead
 
 class Embedding(Layer):
     """
@@ -19,40 +11,48 @@ class Embedding(Layer):
 
     Expected input shape: (batch_size, seq_len) - token IDs
     Output shape: (batch_size, seq_len, d_model) - embedded vectors
+
+    shared_weights is a SharedParameter (or a plain (d_model, vocab_size) array)
+    tying the table to other layers, see create_shared_embedding_projection.
     """
 
+    supports_out = True
+    parameter_names = ('weights',)
+
     def __init__(self, vocab_size, d_model, shared_weights=None):
         super().__init__()
         self.vocab_size = vocab_size
         self.d_model = d_model
+        self.shared = _as_shared(shared_weights)
 
-        if shared_weights is not None:
-            self.weights = shared_weights
-            self._owns_weights = False
-            self._shared_weights_ref = shared_weights
+        if self.shared is not None:
+            self.weights = self.shared.attach()
         else:
             self.weights = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, vocab_size))
-            self._owns_weights = True
-            self._shared_weights_ref = None
 
-    def forward(self, token_ids):
+    def forward(self, token_ids, out=None):
         self.input = token_ids
-        self.output = self.weights.T[token_ids] * np.sqrt(self.d_model)
+        # Gather the token columns first, taking rows of weights.T would copy the whole table
+        columns = np.take(self.weights, token_ids, axis=1)  # (d_model, batch_size, seq_len)
+        if out is None:
+            out = np.empty(token_ids.shape + (self.d_model,), dtype=self.weights.dtype)
+        self.output = np.multiply(np.moveaxis(columns, 0, -1), np.sqrt(self.d_model), out=out)
         return self.output
 
     def backward(self, output_gradient, learning_rate):
-        batch_size, seq_len = self.input.shape
-
         # Scale gradients by sqrt(d_model) to account for forward scaling
-        scaled_gradient = output_gradient * np.sqrt(self.d_model)
-        token_one_hot = np.eye(self.vocab_size)[self.input.flatten()].reshape(batch_size, seq_len, self.vocab_size)
-        grad_weights = np.einsum('bsd,bsv->dv', scaled_gradient, token_one_hot)
+        scaled_gradient = output_gradient.reshape(-1, self.d_model) * np.sqrt(self.d_model)
 
-        # Update shared weights if they are shared
-        if self._shared_weights_ref is not None:
-            self._shared_weights_ref -= learning_rate * grad_weights
-        elif self._owns_weights:
-            self.weights -= learning_rate * grad_weights
+        # Scatter-add every position's gradient into its token's column, only the columns of the tokens seen
+        columns, slots = np.unique(self.input.ravel(), return_inverse=True)
+        grad_weights = np.zeros((len(columns), self.d_model))
+        np.add.at(grad_weights, slots, scaled_gradient)
+        grad_weights = grad_weights.T
+
+        if self.shared is not None:
+            self.shared.accumulate(self, grad_weights, learning_rate, columns)
+        else:
+            self._update(self.weights, grad_weights, learning_rate, columns)
 
         return None
 
@@ -64,41 +64,116 @@ class Projection(Layer):
     Output shape: (batch_size, seq_len, vocab_size) - logits over vocabulary
     """
 
+    supports_out = True
+    parameter_names = ('weights', 'bias')
+
     def __init__(self, d_model, vocab_size, shared_weights=None):
         super().__init__()
         self.d_model = d_model
         self.vocab_size = vocab_size
+        self.shared = _as_shared(shared_weights)
 
-        if shared_weights is not None:
-            self.weights = shared_weights
-            self._shared_weights_ref = shared_weights
+        if self.shared is not None:
+            self.weights = self.shared.attach()
         else:
             self.weights = np.random.normal(0, np.sqrt(2.0 / d_model), (d_model, vocab_size))
-            self._shared_weights_ref = None
 
         self.bias = np.zeros((vocab_size, 1))
 
-    def forward(self, hidden_states):
+    def forward(self, hidden_states, out=None):
         self.input = hidden_states
-        self.output = np.matmul(hidden_states, self.weights) + self.bias.flatten()
+        self.output = get_backend().matmul(hidden_states, self.weights, out=out)
+        self.output += self.bias.flatten()
         return self.output
 
 
     def backward(self, output_gradient, learning_rate):
-        d_weights = np.einsum('bsd,bsv->dv', self.input, output_gradient)
+        backend = get_backend()
+        d_weights = backend.einsum('bsd,bsv->dv', self.input, output_gradient)
 
         d_bias = np.sum(output_gradient, axis=(0, 1), keepdims=True).reshape(self.vocab_size, 1)
 
-        input_gradient = np.matmul(output_gradient, self.weights.T)
-        if self._shared_weights_ref is None: # Only update if weights are not explicitly shared
-            self.weights -= learning_rate * d_weights
-        self.bias -= learning_rate * d_bias
+        input_gradient = backend.matmul(output_gradient, self.weights.T)
+        if self.shared is not None:
+            self.shared.accumulate(self, d_weights, learning_rate)
+        else:
+            self._update(self.weights, d_weights, learning_rate)
+        self._update(self.bias, d_bias, learning_rate)
 
         return input_gradient
 
-def create_shared_embedding_projection(vocab_size, d_model):
-    shared_weights = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, vocab_size))
+class ChunkedProjection(Projection, OutputHead):
+    """
+    Projection fused with cross entropy for training.
+
+    Expected input shape: (batch_size, seq_len, d_model) - hidden states
+    Output shape: (batch_size, seq_len, vocab_size) - logits over vocabulary (inference)
+
+    loss() walks over chunk_size positions at a time: logits, log-sum-exp, loss
+    and the gradients for the hidden states and the (possibly tied) weights of a
+    chunk are computed before moving on, so at most (chunk_size, vocab_size)
+    logits exist at once. The result equals Projection + cross_entropy.
+    """
+
+    def __init__(self, d_model, vocab_size, chunk_size=1024, shared_weights=None, padding_idx=0):
+        super().__init__(d_model, vocab_size, shared_weights)
+        self.chunk_size = chunk_size
+        self.padding_idx = padding_idx
+
+    def loss(self, hidden_states, target_ids, learning_rate):
+        backend = get_backend()
+        hidden, targets, rows = self._rows(hidden_states, target_ids)
+        num_rows = len(rows)
+        if num_rows == 0:
+            return 0.0, np.zeros_like(hidden_states)
+
+        bias = self.bias.flatten()
+        d_weights = np.zeros_like(self.weights)
+        d_bias = np.zeros_like(bias)
+        row_gradient = np.empty_like(hidden)
+        logits_buffer = np.empty((min(self.chunk_size, num_rows), self.vocab_size))
+        total_loss = 0.0
+
+        for start in range(0, num_rows, self.chunk_size):
+            end = min(start + self.chunk_size, num_rows)
+            chunk_hidden = hidden[start:end]
+            chunk_targets = targets[start:end]
+            positions = np.arange(end - start)
+
+            logits = backend.matmul(chunk_hidden, self.weights, out=logits_buffer[:end - start])
+            logits += bias
+            logits -= np.max(logits, axis=-1, keepdims=True)
+            target_logits = logits[positions, chunk_targets]
+
+            # The logits become the softmax and then the gradient in place
+            np.exp(logits, out=logits)
+            sums = np.sum(logits, axis=-1, keepdims=True)
+            total_loss += np.sum(np.log(sums[:, 0]) - target_logits)
+
+            logits /= sums
+            logits[positions, chunk_targets] -= 1
+            logits /= num_rows
+
+            row_gradient[start:end] = backend.matmul(logits, self.weights.T)
+            d_weights += backend.matmul(chunk_hidden.T, logits)
+            d_bias += np.sum(logits, axis=0)
+
+        if self.shared is not None:
+            self.shared.accumulate(self, d_weights, learning_rate)
+        else:
+            self._update(self.weights, d_weights, learning_rate)
+        self._update(self.bias, d_bias.reshape(self.vocab_size, 1), learning_rate)
+
+        return total_loss / num_rows, self._scatter_rows(hidden_states, rows, row_gradient)
+
+def create_shared_embedding_projection(vocab_size, d_model, chunk_size=None):
+    # One (d_model, vocab_size) table, updated once per step with the sum of both layers' gradients.
+    # With a chunk_size the projection is a ChunkedProjection computing the loss chunk by chunk.
+    shared_weights = SharedParameter(np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, vocab_size)))
     embedding = Embedding(vocab_size, d_model, shared_weights)
-    projection = Projection(d_model, vocab_size, shared_weights)
+    if chunk_size is None:
+        projection = Projection(d_model, vocab_size, shared_weights)
+    else:
+        projection = ChunkedProjection(d_model, vocab_size, chunk_size, shared_weights)
 
-    return embedding, projection
\ No newline at end of file
+    return embedding, projection
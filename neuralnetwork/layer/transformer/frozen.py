@@ -0,0 +1,195 @@
+import numpy as np
+
+from neuralnetwork.backend import get_backend
+from neuralnetwork.layer import Layer
+
+# Inference-only layers produced by neuralnetwork.network.freeze. Constants the
+# training layers recompute on every call are folded into their weights, and
+# they do not implement backward.
+
+class FrozenEmbedding(Layer):
+    """
+    Embedding lookup with the sqrt(d_model) scale folded into the table,
+    optionally fused with a precomputed positional encoding.
+
+    Expected input shape: (batch_size, seq_len) - token IDs
+    Output shape: (batch_size, seq_len, d_model)
+    """
+
+    def __init__(self, table, positional_encoding=None, max_seq_len=512):
+        super().__init__()
+        self.table = np.ascontiguousarray(table)  # (vocab_size, d_model)
+        self.positional_encoding = positional_encoding
+        self.position_table = None
+        if positional_encoding is not None:
+            self.position_table = positional_encoding._compute_position_encoding(max_seq_len)
+
+    def forward(self, token_ids):
+        self.input = token_ids
+        self.output = self.table[token_ids]
+        if self.positional_encoding is not None:
+            self.output += self._positions(token_ids.shape[1])[np.newaxis, :, :]
+        return self.output
+
+    def forward_step(self, token_ids, cache):
+        self.input = token_ids
+        self.output = self.table[token_ids]
+        if self.positional_encoding is not None:
+            self.output += self._positions(cache.capacity)[cache.positions]
+        return self.output
+
+    def _positions(self, length):
+        if self.position_table.shape[0] < length:
+            self.position_table = self.positional_encoding._compute_position_encoding(length)
+        return self.position_table[:length]
+
+class FrozenAttention(Layer):
+    """
+    Multi-head attention with every head's Q/K/V projections fused into one
+    batched matmul. The 1/sqrt(d_k) score scale is folded into the query
+    weights, and a preceding layer normalization may be folded into the biases.
+
+    Expected input shape: (batch_size, seq_len, num_heads * d_k)
+    Output shape: (batch_size, seq_len, num_heads * d_k)
+    """
+
+    def __init__(self, weight_qkv, bias_qkv, weight_o=None, mask=True):
+        super().__init__()
+        self.num_heads, self.d_k, _ = weight_qkv.shape
+        self.weight_qkv = weight_qkv  # (num_heads, d_k, 3 * d_k)
+        self.bias_qkv = bias_qkv  # (num_heads, 1, 3 * d_k)
+        self.weight_o = weight_o
+        self.mask = mask
+        self._masks = {}
+
+    def forward(self, inputs):
+        self.input = inputs
+        backend = get_backend()
+        batch_size, seq_len, d_model = inputs.shape
+
+        q, k, v = self._project(inputs)
+
+        scores = backend.batched_matmul(q, k.transpose(0, 1, 3, 2))  # (batch_size, num_heads, seq_len, seq_len)
+        if self.mask:
+            scores[:, :, self._causal_mask(seq_len)] = -1e9
+
+        self.output = self._combine(backend.batched_matmul(backend.softmax(scores), v))
+
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        self.input = inputs
+        backend = get_backend()
+
+        q, k, v = self._project(inputs)
+
+        # The cache is batch-major: (batch_size, length, num_heads, d_k)
+        keys, values = cache.append(self, k.transpose(0, 2, 1, 3), v.transpose(0, 2, 1, 3))
+
+        scores = backend.batched_matmul(q, keys.transpose(0, 2, 3, 1))
+        scores = np.where(cache.attention_mask(causal=self.mask)[:, np.newaxis], scores, -1e9)
+
+        self.output = self._combine(backend.batched_matmul(backend.softmax(scores), values.transpose(0, 2, 1, 3)))
+
+        return self.output
+
+    def _project(self, inputs):
+        batch_size, seq_len, d_model = inputs.shape
+        input_heads = inputs.reshape(batch_size, seq_len, self.num_heads, self.d_k).transpose(0, 2, 1, 3)
+
+        qkv = get_backend().batched_matmul(input_heads, self.weight_qkv) + self.bias_qkv  # (batch_size, num_heads, seq_len, 3 * d_k)
+
+        return np.split(qkv, 3, axis=-1)
+
+    def _combine(self, head_outputs):
+        batch_size, num_heads, seq_len, d_k = head_outputs.shape
+        concat_output = head_outputs.transpose(0, 2, 1, 3).reshape(batch_size, seq_len, num_heads * d_k)
+        if self.weight_o is None:
+            return concat_output
+        return get_backend().matmul(concat_output, self.weight_o)
+
+    def _causal_mask(self, seq_len):
+        if seq_len not in self._masks:
+            self._masks[seq_len] = np.triu(np.ones((seq_len, seq_len), dtype=bool), k=1)
+        return self._masks[seq_len]
+
+class FrozenFFN(Layer):
+    """
+    Position-wise feed forward network, optionally with a preceding layer
+    normalization folded into the first dense layer.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, d_model)
+    """
+
+    def __init__(self, weights1, biases1, activation, weights2, biases2):
+        super().__init__()
+        self.weights1 = weights1
+        self.biases1 = biases1
+        self.activation = activation
+        self.weights2 = weights2
+        self.biases2 = biases2
+
+    def forward(self, inputs):
+        self.input = inputs
+
+        backend = get_backend()
+        hidden = backend.matmul(inputs, self.weights1)
+        hidden += self.biases1
+        hidden = self.activation.forward(hidden)
+
+        self.output = backend.matmul(hidden, self.weights2)
+        self.output += self.biases2
+
+        return self.output
+
+class FrozenAddAndNorm(Layer):
+    """
+    Pre-Layer Norm residual block. When the normalization's gamma/beta have
+    been folded into the sublayer, normalization is None and only the
+    standardization is applied.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, d_model)
+    """
+
+    def __init__(self, sublayer, epsilon=1e-6, normalization=None):
+        super().__init__()
+        self.sublayer = sublayer
+        self.epsilon = epsilon
+        self.normalization = normalization
+
+    def forward(self, inputs):
+        self.input = inputs
+        self.output = inputs + self.sublayer.forward(self._normalize(inputs))
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        self.input = inputs
+        self.output = inputs + self.sublayer.forward_step(self._normalize(inputs), cache)
+        return self.output
+
+    def _normalize(self, inputs):
+        if self.normalization is not None:
+            return self.normalization.forward(inputs)
+
+        return get_backend().layernorm(inputs, self.epsilon)[0]
+
+class FrozenProjection(Layer):
+    """
+    Output projection with a flat bias.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, vocab_size)
+    """
+
+    def __init__(self, weights, bias):
+        super().__init__()
+        self.weights = np.ascontiguousarray(weights)
+        self.bias = bias
+
+    def forward(self, hidden_states):
+        self.input = hidden_states
+        self.output = get_backend().matmul(hidden_states, self.weights)
+        self.output += self.bias
+        return self.output
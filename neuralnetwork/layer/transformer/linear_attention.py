@@ -0,0 +1,169 @@
+import numpy as np
+
+from neuralnetwork.backend import get_backend
+from neuralnetwork.layer import Layer
+
+def _elu_feature(x):
+    # elu(x) + 1: positive everywhere, its derivative is 1 for x > 0 and the feature itself below
+    return np.where(x > 0, x + 1, np.exp(np.minimum(x, 0)))
+
+def _elu_feature_prime(x, features):
+    return np.where(x > 0, 1.0, features)
+
+def _relu_feature(x):
+    return np.maximum(x, 0)
+
+def _relu_feature_prime(x, features):
+    return x > 0
+
+_feature_maps = {
+    'elu': (_elu_feature, _elu_feature_prime),
+    'relu': (_relu_feature, _relu_feature_prime)
+}
+
+class LinearAttention(Layer):
+    """
+    Linear (kernelised) multi-head attention, interchangeable with MultiHeadAttention.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, d_model)
+
+    softmax(q k^T) is replaced by phi(q) phi(k)^T with a positive feature map
+    phi ('elu': elu(x) + 1, or 'relu'), so the output of position t is
+        phi(q_t) S_t / (phi(q_t) . z_t),  S_t = sum_j phi(k_j) v_j^T,  z_t = sum_j phi(k_j)
+    where the sums run over j <= t (causal, as prefix sums) or over the whole
+    sequence. Training is O(seq_len * d_k^2) instead of O(seq_len^2 * d_k).
+    While decoding, only S and z are kept per sequence, so every new token
+    costs the same time and the state does not grow with the sequence.
+    """
+
+    parameter_names = ('weight_q', 'weight_k', 'weight_v', 'weight_o')
+
+    def __init__(self, d_model, num_heads, mask=True, feature_map='elu', epsilon=1e-6):
+        super().__init__()
+        if d_model % num_heads != 0:
+            raise ValueError(f"d_model ({d_model}) must be divisible by num_heads ({num_heads})")
+        if feature_map not in _feature_maps:
+            raise ValueError(f"Unknown feature map: {feature_map} (available: {list(_feature_maps)})")
+
+        self.d_model = d_model
+        self.num_heads = num_heads
+        self.d_k = d_model // num_heads
+        self.mask = mask
+        self.feature_map = feature_map
+        self.feature, self.feature_prime = _feature_maps[feature_map]
+        self.epsilon = epsilon
+
+        self.weight_q = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
+        self.weight_k = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
+        self.weight_v = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
+        self.weight_o = np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, d_model))
+
+        self.saved = None
+
+    def _project(self, inputs):
+        # (batch_size, seq_len, num_heads, d_k) each
+        backend = get_backend()
+        shape = inputs.shape[:2] + (self.num_heads, self.d_k)
+        return (backend.matmul(inputs, self.weight_q).reshape(shape),
+                backend.matmul(inputs, self.weight_k).reshape(shape),
+                backend.matmul(inputs, self.weight_v).reshape(shape))
+
+    def _attend(self, q_features, kv, k_features):
+        # kv: (batch_size, seq_len or 1, num_heads, d_k, d_k) and k_features: (..., d_k) summed so far
+        numerator = get_backend().batched_matmul(q_features[..., np.newaxis, :], kv)[..., 0, :]
+        denominator = np.sum(q_features * k_features, axis=-1) + self.epsilon
+        return numerator / denominator[..., np.newaxis], denominator
+
+    def _sum(self, values):
+        # Prefix sums over the sequence when causal, the total otherwise
+        if self.mask:
+            return np.cumsum(values, axis=1)
+        return np.sum(values, axis=1, keepdims=True)
+
+    def _sum_gradient(self, gradient):
+        # Adjoint of _sum: suffix sums, or the total gradient for every position
+        if self.mask:
+            return np.flip(np.cumsum(np.flip(gradient, axis=1), axis=1), axis=1)
+        return np.sum(gradient, axis=1, keepdims=True)
+
+    def forward(self, inputs):
+        self.input = inputs
+        backend = get_backend()
+        batch_size, seq_len, _ = inputs.shape
+        q, k, v = self._project(inputs)
+
+        q_features, k_features = self.feature(q), self.feature(k)
+        kv = self._sum(k_features[..., np.newaxis] * v[..., np.newaxis, :])
+        k_sum = self._sum(k_features)
+
+        heads, denominator = self._attend(q_features, kv, k_sum)
+        concat_output = heads.reshape(batch_size, seq_len, self.d_model)
+
+        self.saved = (q, k, v, q_features, k_features, kv, k_sum, heads, denominator, concat_output)
+        self.output = backend.matmul(concat_output, self.weight_o)
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        self.input = inputs
+        backend = get_backend()
+        batch_size, step_length, _ = inputs.shape
+        q, k, v = self._project(inputs)
+
+        # Padded prompt slots must not enter the running sums
+        valid = cache.key_mask[:, cache.length - step_length:cache.length]
+        k_features = self.feature(k) * valid[:, :, np.newaxis, np.newaxis]
+        step_kv = k_features[..., np.newaxis] * v[..., np.newaxis, :]
+
+        state = cache.state(self)
+        if 'kv' not in state:
+            state['kv'] = np.zeros((batch_size, self.num_heads, self.d_k, self.d_k))
+            state['k_sum'] = np.zeros((batch_size, self.num_heads, self.d_k))
+
+        kv = state['kv'][:, np.newaxis] + self._sum(step_kv)
+        k_sum = state['k_sum'][:, np.newaxis] + self._sum(k_features)
+        state['kv'] = state['kv'] + step_kv.sum(axis=1)
+        state['k_sum'] = state['k_sum'] + k_features.sum(axis=1)
+
+        heads, _ = self._attend(self.feature(q), kv, k_sum)
+        self.output = backend.matmul(heads.reshape(batch_size, step_length, self.d_model), self.weight_o)
+        return self.output
+
+    def backward(self, output_gradient, learning_rate):
+        backend = get_backend()
+        q, k, v, q_features, k_features, kv, k_sum, heads, denominator, concat_output = self.saved
+        batch_size, seq_len, _ = self.input.shape
+
+        d_weight_o = backend.einsum('bsd,bsh->dh', concat_output, output_gradient)
+        d_heads = backend.matmul(output_gradient, self.weight_o.T).reshape(heads.shape)
+
+        # heads = numerator / denominator
+        d_numerator = d_heads / denominator[..., np.newaxis]
+        d_denominator = -np.sum(d_heads * heads, axis=-1) / denominator
+
+        d_q_features = (backend.batched_matmul(kv, d_numerator[..., np.newaxis])[..., 0] +
+                        d_denominator[..., np.newaxis] * k_sum)
+        d_kv = self._sum_gradient(q_features[..., np.newaxis] * d_numerator[..., np.newaxis, :])
+        d_k_sum = self._sum_gradient(d_denominator[..., np.newaxis] * q_features)
+
+        d_k_features = backend.batched_matmul(d_kv, v[..., np.newaxis])[..., 0] + d_k_sum
+        d_v = backend.batched_matmul(k_features[..., np.newaxis, :], d_kv)[..., 0, :]
+
+        d_q = (d_q_features * self.feature_prime(q, q_features)).reshape(batch_size, seq_len, self.d_model)
+        d_k = (d_k_features * self.feature_prime(k, k_features)).reshape(batch_size, seq_len, self.d_model)
+        d_v = d_v.reshape(batch_size, seq_len, self.d_model)
+
+        d_weight_q = backend.einsum('bsi,bsj->ij', self.input, d_q)
+        d_weight_k = backend.einsum('bsi,bsj->ij', self.input, d_k)
+        d_weight_v = backend.einsum('bsi,bsj->ij', self.input, d_v)
+
+        input_gradient = (backend.matmul(d_q, self.weight_q.T) +
+                          backend.matmul(d_k, self.weight_k.T) +
+                          backend.matmul(d_v, self.weight_v.T))
+
+        self._update(self.weight_q, d_weight_q, learning_rate)
+        self._update(self.weight_k, d_weight_k, learning_rate)
+        self._update(self.weight_v, d_weight_v, learning_rate)
+        self._update(self.weight_o, d_weight_o, learning_rate)
+
+        return input_gradient
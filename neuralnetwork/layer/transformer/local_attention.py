@@ -0,0 +1,165 @@
+import numpy as np
+
+from neuralnetwork.backend import get_backend
+
+class BandedAttention:
+    """
+    Sliding-window attention computed over blocks of `window` positions.
+
+    Each query attends the keys less than window positions away (only
+    earlier ones when causal) plus the first global_tokens positions of the
+    sequence. Without the causal mask, the global tokens also attend the
+    whole sequence.
+
+    The sequence is cut into blocks of window queries. A block only needs
+    its own key block and the previous one (and the next one when not
+    causal), so the scores are a (batch_size, num_blocks, window,
+    global_tokens + 2 or 3 * window) band. Time and memory are
+    O(seq_len * window) instead of O(seq_len^2).
+
+    forward(q, k, v) -> output and backward(output_gradient) -> (d_q, d_k, d_v)
+    operate on (batch_size, seq_len, d) arrays. The band geometry is cached per sequence length.
+    """
+
+    def __init__(self, window, global_tokens=0, causal=True):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        if global_tokens < 0:
+            raise ValueError("global_tokens cannot be negative")
+        self.window = window
+        self.global_tokens = global_tokens
+        self.causal = causal
+        # Key block offsets every query block attends
+        self.offsets = (-1, 0) if causal else (-1, 0, 1)
+
+        self._geometry = {}
+        self.saved = None
+
+    def _mask(self, seq_len):
+        # (num_blocks, window, global + band) mask of the keys every (padded) query attends
+        if seq_len not in self._geometry:
+            window, num_global = self.window, min(self.global_tokens, seq_len)
+            num_blocks = -(-seq_len // window)
+
+            query_positions = np.arange(num_blocks * window).reshape(num_blocks, window, 1)
+            block_starts = np.arange(num_blocks)[:, np.newaxis, np.newaxis] * window
+            key_positions = np.concatenate([block_starts + offset * window + np.arange(window)
+                                            for offset in self.offsets], axis=-1)
+
+            # Global keys are scored in their own columns, not again inside the band
+            band = (key_positions >= num_global) & (key_positions < seq_len) & self._in_window(query_positions,
+                                                                                               key_positions)
+            global_keys = np.arange(num_global)[np.newaxis, np.newaxis, :]
+            if self.causal:
+                global_mask = global_keys <= query_positions
+            else:
+                global_mask = np.ones((num_blocks, window, num_global), dtype=bool)
+
+            self._geometry[seq_len] = np.concatenate([global_mask, band], axis=-1)
+
+        return self._geometry[seq_len]
+
+    def _in_window(self, query_positions, key_positions):
+        distance = query_positions - key_positions
+        if self.causal:
+            return (distance >= 0) & (distance < self.window)
+        return np.abs(distance) < self.window
+
+    def step_mask(self, query_positions, key_positions):
+        """Window mask (batch_size, step_length, length) for decoding from cached key positions"""
+        key_positions = key_positions[:, np.newaxis, :]
+        return self._in_window(query_positions[:, :, np.newaxis], key_positions) | (key_positions < self.global_tokens)
+
+    def _blocks(self, array, num_blocks, before):
+        # (batch_size, seq_len, d) -> (batch_size, blocks, window, d), zero padded with `before` leading blocks
+        batch_size, seq_len, d = array.shape
+        padded = np.zeros((batch_size, (num_blocks + 2 * before) * self.window, d))
+        padded[:, before * self.window:before * self.window + seq_len] = array
+        return padded.reshape(batch_size, num_blocks + 2 * before, self.window, d)
+
+    def _band(self, blocks, num_blocks):
+        # Keys / values of the neighbouring blocks side by side: (batch_size, num_blocks, len(offsets) * window, d)
+        return np.concatenate([blocks[:, 1 + offset:1 + offset + num_blocks] for offset in self.offsets], axis=2)
+
+    def _unband(self, band, num_blocks, seq_len):
+        # Sum a band gradient back onto the sequence positions
+        batch_size, _, _, d = band.shape
+        blocks = np.zeros((batch_size, num_blocks + 2, self.window, d))
+        for i, offset in enumerate(self.offsets):
+            blocks[:, 1 + offset:1 + offset + num_blocks] += band[:, :, i * self.window:(i + 1) * self.window]
+        return blocks.reshape(batch_size, -1, d)[:, self.window:self.window + seq_len]
+
+    def forward(self, q, k, v):
+        backend = get_backend()
+        batch_size, seq_len, d = q.shape
+        num_blocks = -(-seq_len // self.window)
+        num_global = min(self.global_tokens, seq_len)
+        scale = 1 / np.sqrt(d)
+
+        query_blocks = self._blocks(q, num_blocks, 0)
+        band_k = self._band(self._blocks(k, num_blocks, 1), num_blocks)
+        band_v = self._band(self._blocks(v, num_blocks, 1), num_blocks)
+        global_k, global_v = k[:, :num_global], v[:, :num_global]
+
+        scores = np.concatenate([backend.einsum('bnqd,bgd->bnqg', query_blocks, global_k),
+                                 backend.batched_matmul(query_blocks, band_k.transpose(0, 1, 3, 2))], axis=-1)
+        scores = np.where(self._mask(seq_len), scores * scale, -1e9)
+        weights = backend.softmax(scores, axis=-1)
+
+        output = (backend.einsum('bnqg,bgd->bnqd', weights[..., :num_global], global_v) +
+                  backend.batched_matmul(weights[..., num_global:], band_v))
+        output = output.reshape(batch_size, -1, d)[:, :seq_len]
+
+        global_weights = None
+        if not self.causal and num_global > 0:
+            # Global queries see the whole sequence
+            global_scores = backend.einsum('bgd,btd->bgt', q[:, :num_global], k) * scale
+            global_weights = backend.softmax(global_scores, axis=-1)
+            output[:, :num_global] = backend.batched_matmul(global_weights, v)
+
+        self.saved = (q, k, v, query_blocks, band_k, band_v, weights, global_weights)
+        return output
+
+    def backward(self, output_gradient):
+        backend = get_backend()
+        q, k, v, query_blocks, band_k, band_v, weights, global_weights = self.saved
+        batch_size, seq_len, d = q.shape
+        num_blocks = query_blocks.shape[1]
+        num_global = min(self.global_tokens, seq_len)
+        scale = 1 / np.sqrt(d)
+
+        band_gradient = output_gradient
+        if global_weights is not None:
+            # Rows of the global queries came from full attention, not from the band
+            band_gradient = output_gradient.copy()
+            band_gradient[:, :num_global] = 0
+        d_blocks = self._blocks(band_gradient, num_blocks, 0)
+
+        global_k, global_v = k[:, :num_global], v[:, :num_global]
+        global_weights_band, band_weights = weights[..., :num_global], weights[..., num_global:]
+
+        d_weights = np.concatenate([backend.einsum('bnqd,bgd->bnqg', d_blocks, global_v),
+                                    backend.batched_matmul(d_blocks, band_v.transpose(0, 1, 3, 2))], axis=-1)
+        d_scores = weights * (d_weights - np.sum(weights * d_weights, axis=-1, keepdims=True)) * scale
+        d_scores_global, d_scores_band = d_scores[..., :num_global], d_scores[..., num_global:]
+
+        d_query_blocks = (backend.einsum('bnqg,bgd->bnqd', d_scores_global, global_k) +
+                          backend.batched_matmul(d_scores_band, band_k))
+        d_q = d_query_blocks.reshape(batch_size, -1, d)[:, :seq_len].copy()
+
+        d_k = self._unband(backend.batched_matmul(d_scores_band.transpose(0, 1, 3, 2), query_blocks),
+                           num_blocks, seq_len)
+        d_v = self._unband(backend.batched_matmul(band_weights.transpose(0, 1, 3, 2), d_blocks), num_blocks, seq_len)
+        d_k[:, :num_global] += backend.einsum('bnqg,bnqd->bgd', d_scores_global, query_blocks)
+        d_v[:, :num_global] += backend.einsum('bnqg,bnqd->bgd', global_weights_band, d_blocks)
+
+        if global_weights is not None:
+            d_global_output = output_gradient[:, :num_global]
+            d_global_weights = backend.batched_matmul(d_global_output, v.transpose(0, 2, 1))
+            d_global_scores = global_weights * (d_global_weights - np.sum(global_weights * d_global_weights, axis=-1,
+                                                                          keepdims=True)) * scale
+            d_v += backend.batched_matmul(global_weights.transpose(0, 2, 1), d_global_output)
+            d_q[:, :num_global] += backend.batched_matmul(d_global_scores, k)
+            d_k += backend.batched_matmul(d_global_scores.transpose(0, 2, 1), q[:, :num_global])
+
+        return d_q, d_k, d_v
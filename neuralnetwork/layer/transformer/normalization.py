@@ -1,5 +1,6 @@
 import numpy as np
 
+from neuralnetwork.backend import get_backend
 from neuralnetwork.layer import Layer
 
 class Normalization(Layer):
@@ -12,6 +13,8 @@ class Normalization(Layer):
     Normalizes across the feature dimension (d_model) for each position independently.
     """
 
+    parameter_names = ('gamma', 'beta')
+
     def __init__(self, d_model, epsilon=1e-6):
         super().__init__()
         self.d_model = d_model
@@ -22,8 +25,6 @@ class Normalization(Layer):
         self.beta = np.zeros(d_model)  # Shift parameter
 
         # Cache for backward pass
-        self.mean = None
-        self.variance = None
         self.std = None
         self.normalized = None
 
@@ -31,13 +32,9 @@ class Normalization(Layer):
         self.input = inputs
         batch_size, seq_len, d_model = inputs.shape
 
-        # Compute mean and variance across the feature dimension (vectorized)
-        self.mean = np.mean(inputs, axis=-1, keepdims=True)  # (batch_size, seq_len, 1)
-        self.variance = np.var(inputs, axis=-1, keepdims=True)  # (batch_size, seq_len, 1)
-        self.std = np.sqrt(self.variance + self.epsilon)  # (batch_size, seq_len, 1)
-
-        # Normalize (vectorized)
-        self.normalized = (inputs - self.mean) / self.std  # (batch_size, seq_len, d_model)
+        # Normalize across the feature dimension (vectorized)
+        # normalized: (batch_size, seq_len, d_model), std: (batch_size, seq_len, 1)
+        self.normalized, self.std = get_backend().layernorm(inputs, self.epsilon)
 
         # Apply learnable scale and shift (vectorized)
         self.output = self.gamma * self.normalized + self.beta  # (batch_size, seq_len, d_model)
@@ -64,12 +61,8 @@ class Normalization(Layer):
 
         input_gradient = (N * d_normalized - sum_d_normalized - self.normalized * sum_d_norm_times_norm) * inv_std / N
 
-        # Clip gradients to prevent overflow (kept for the input_gradient passed to previous layer)
-        input_gradient = np.clip(input_gradient, -10.0, 10.0)
-
-        # Update learnable parameters without direct clipping on d_gamma and d_beta here
-        # Assuming global clipping is handled elsewhere, or not needed for these specific updates.
-        self.gamma -= learning_rate * d_gamma / (batch_size * seq_len)  # Average gradients for update
-        self.beta -= learning_rate * d_beta / (batch_size * seq_len)  # Average gradients for update
+        # Update learnable parameters, clipping is done on the global gradient norm by the network
+        self._update(self.gamma, d_gamma / (batch_size * seq_len), learning_rate)  # Average gradients for update
+        self._update(self.beta, d_beta / (batch_size * seq_len), learning_rate)  # Average gradients for update
 
         return input_gradient
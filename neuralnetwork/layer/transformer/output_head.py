@@ -0,0 +1,249 @@
+import numpy as np
+
+from neuralnetwork.backend import get_backend
+from neuralnetwork.layer import Layer
+from neuralnetwork.layer.gradient import _as_shared
+
+class OutputHead(Layer):
+    """
+    Final layer of a BatchNetwork that computes the training loss itself.
+
+    During training the network calls loss(hidden_states, target_ids, learning_rate)
+    instead of forward + loss function, so the head never has to build the
+    full (batch_size, seq_len, vocab_size) logits or their one-hot targets.
+    forward still returns scores over the whole vocabulary for inference.
+
+    Positions whose target is padding_idx are ignored and the loss is the mean
+    over the remaining positions, like lossfunction.cross_entropy.
+    """
+
+    def __init__(self, padding_idx=0):
+        super().__init__()
+        self.padding_idx = padding_idx
+
+    def loss(self, hidden_states, target_ids, learning_rate):
+        """Returns (loss, gradient wrt hidden_states) and updates the head's parameters"""
+        raise NotImplementedError()
+
+    def backward(self, output_gradient, learning_rate):
+        raise ValueError(f"{type(self).__name__} is trained through loss(), not backward()")
+
+    def _rows(self, hidden_states, target_ids):
+        # (batch_size, seq_len, d_model) -> non padding rows (n, d_model), their targets and positions
+        flat_hidden = hidden_states.reshape(-1, hidden_states.shape[-1])
+        flat_targets = target_ids.reshape(-1)
+        rows = np.flatnonzero(flat_targets != self.padding_idx)
+        return flat_hidden[rows], flat_targets[rows], rows
+
+    def _scatter_rows(self, hidden_states, rows, row_gradient):
+        input_gradient = np.zeros((hidden_states.shape[0] * hidden_states.shape[1], hidden_states.shape[2]))
+        input_gradient[rows] = row_gradient
+        return input_gradient.reshape(hidden_states.shape)
+
+def _log_softmax(logits):
+    shifted = logits - np.max(logits, axis=-1, keepdims=True)
+    return shifted - np.log(np.sum(np.exp(shifted), axis=-1, keepdims=True))
+
+class SampledSoftmax(OutputHead):
+    """
+    Output projection trained with sampled softmax.
+
+    Expected input shape: (batch_size, seq_len, d_model) - hidden states
+    Output shape: (batch_size, seq_len, vocab_size) - full logits (inference only)
+
+    Every training step scores the true token of each position against one
+    shared set of num_samples tokens drawn from a proposal distribution
+    (uniform, or unigram^0.75 when token frequencies are given), with the usual
+    log(expected count) correction and accidental hits removed. The cost per
+    position is num_samples instead of vocab_size dot products.
+    Weights are (d_model, vocab_size) like Projection and may be shared with an Embedding.
+    """
+
+    parameter_names = ('weights', 'bias')
+
+    def __init__(self, d_model, vocab_size, num_samples=64, frequencies=None, shared_weights=None, padding_idx=0,
+                 rng=None):
+        super().__init__(padding_idx)
+        self.d_model = d_model
+        self.vocab_size = vocab_size
+        self.num_samples = min(num_samples, vocab_size)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.shared = _as_shared(shared_weights)
+
+        if self.shared is not None:
+            self.weights = self.shared.attach()
+        else:
+            self.weights = np.random.normal(0, np.sqrt(2.0 / d_model), (d_model, vocab_size))
+        self.bias = np.zeros(vocab_size)
+
+        if frequencies is None:
+            self.proposal = np.full(vocab_size, 1.0 / vocab_size)
+        else:
+            smoothed = (np.asarray(frequencies, dtype=np.float64) + 1) ** 0.75
+            self.proposal = smoothed / smoothed.sum()
+
+    def forward(self, hidden_states):
+        self.input = hidden_states
+        self.output = get_backend().matmul(hidden_states, self.weights)
+        self.output += self.bias
+        return self.output
+
+    def loss(self, hidden_states, target_ids, learning_rate):
+        backend = get_backend()
+        hidden, targets, rows = self._rows(hidden_states, target_ids)
+        num_rows = len(rows)
+        if num_rows == 0:
+            return 0.0, np.zeros_like(hidden_states)
+
+        samples = self.rng.choice(self.vocab_size, self.num_samples, p=self.proposal)
+        log_expected = np.log(self.num_samples * self.proposal)
+
+        target_weights = self.weights[:, targets].T  # (n, d_model)
+        sample_weights = self.weights[:, samples]  # (d_model, num_samples)
+
+        true_logits = np.einsum('nd,nd->n', hidden, target_weights) + self.bias[targets] - log_expected[targets]
+        sampled_logits = backend.matmul(hidden, sample_weights) + (self.bias[samples] - log_expected[samples])
+        sampled_logits[targets[:, np.newaxis] == samples[np.newaxis, :]] = -1e9
+
+        # The true token is class 0 of every row
+        logits = np.concatenate([true_logits[:, np.newaxis], sampled_logits], axis=1)
+        log_probs = _log_softmax(logits)
+        loss = -np.mean(log_probs[:, 0])
+
+        d_logits = np.exp(log_probs)
+        d_logits[:, 0] -= 1
+        d_logits /= num_rows
+        d_true, d_sampled = d_logits[:, 0], d_logits[:, 1:]
+
+        row_gradient = target_weights * d_true[:, np.newaxis] + backend.matmul(d_sampled, sample_weights.T)
+
+        # Only the columns of the targets and samples get a gradient, kept as (columns, d_model) rows
+        columns, slots = np.unique(np.concatenate([targets, samples]), return_inverse=True)
+        d_weights = np.zeros((len(columns), self.d_model))
+        np.add.at(d_weights, slots[:num_rows], hidden * d_true[:, np.newaxis])
+        np.add.at(d_weights, slots[num_rows:], backend.matmul(d_sampled.T, hidden))
+        d_bias = np.bincount(slots, np.concatenate([d_true, d_sampled.sum(axis=0)]), len(columns))
+
+        if self.shared is not None:
+            self.shared.accumulate(self, d_weights.T, learning_rate, columns)
+        else:
+            self._update(self.weights, d_weights.T, learning_rate, columns)
+        self._update(self.bias, d_bias, learning_rate, columns)
+
+        return loss, self._scatter_rows(hidden_states, rows, row_gradient)
+
+class AdaptiveSoftmax(OutputHead):
+    """
+    Adaptive softmax: frequent tokens get a full-size head, rarer tokens are
+    grouped into tail clusters reached through one head entry each and scored
+    with smaller projections (d_model / div_value^(i + 1)).
+
+    Expected input shape: (batch_size, seq_len, d_model) - hidden states
+    Output shape: (batch_size, seq_len, vocab_size) - log probabilities (inference only)
+
+    cutoffs are increasing cluster boundaries over tokens ranked by frequency,
+    e.g. (1000, 10000) for a head of the 1000 most frequent tokens and two
+    tail clusters. Without frequencies the token ids are taken as the ranking.
+    Training only evaluates the tail clusters that contain a target.
+    """
+
+    parameter_names = ('head_weights', 'head_bias', 'tail_projections', 'tail_weights', 'tail_biases')
+
+    def __init__(self, d_model, vocab_size, cutoffs, div_value=4.0, frequencies=None, padding_idx=0):
+        super().__init__(padding_idx)
+        cutoffs = list(cutoffs)
+        if not cutoffs:
+            raise ValueError("cutoffs must hold at least one cluster boundary")
+        if any(a >= b for a, b in zip([0] + cutoffs, cutoffs + [vocab_size])):
+            raise ValueError("cutoffs must be strictly increasing and between 0 and vocab_size")
+
+        self.d_model = d_model
+        self.vocab_size = vocab_size
+        self.boundaries = [0] + cutoffs + [vocab_size]
+        self.head_size = cutoffs[0]
+        num_clusters = len(cutoffs)
+
+        # rank_of[token id] -> frequency rank, token_of[rank] -> token id
+        if frequencies is None:
+            self.token_of = np.arange(vocab_size)
+        else:
+            self.token_of = np.argsort(-np.asarray(frequencies), kind='stable')
+        self.rank_of = np.empty(vocab_size, dtype=np.intp)
+        self.rank_of[self.token_of] = np.arange(vocab_size)
+
+        self.head_weights = np.random.normal(0, np.sqrt(2.0 / d_model), (d_model, self.head_size + num_clusters))
+        self.head_bias = np.zeros(self.head_size + num_clusters)
+
+        self.tail_projections = []
+        self.tail_weights = []
+        self.tail_biases = []
+        for i in range(num_clusters):
+            cluster_dim = max(1, int(d_model // div_value ** (i + 1)))
+            cluster_size = self.boundaries[i + 2] - self.boundaries[i + 1]
+            self.tail_projections.append(np.random.normal(0, np.sqrt(1.0 / d_model), (d_model, cluster_dim)))
+            self.tail_weights.append(np.random.normal(0, np.sqrt(2.0 / cluster_dim), (cluster_dim, cluster_size)))
+            self.tail_biases.append(np.zeros(cluster_size))
+
+    def forward(self, hidden_states):
+        self.input = hidden_states
+        backend = get_backend()
+
+        head_log_probs = _log_softmax(backend.matmul(hidden_states, self.head_weights) + self.head_bias)
+
+        log_probs = np.empty(hidden_states.shape[:-1] + (self.vocab_size,))
+        log_probs[..., :self.head_size] = head_log_probs[..., :self.head_size]
+        for i in range(len(self.tail_weights)):
+            projected = backend.matmul(hidden_states, self.tail_projections[i])
+            cluster_log_probs = _log_softmax(backend.matmul(projected, self.tail_weights[i]) + self.tail_biases[i])
+            start, end = self.boundaries[i + 1], self.boundaries[i + 2]
+            log_probs[..., start:end] = head_log_probs[..., self.head_size + i, np.newaxis] + cluster_log_probs
+
+        # Columns are in frequency rank order, put them back in token id order
+        self.output = log_probs[..., self.rank_of]
+        return self.output
+
+    def loss(self, hidden_states, target_ids, learning_rate):
+        backend = get_backend()
+        hidden, targets, rows = self._rows(hidden_states, target_ids)
+        num_rows = len(rows)
+        if num_rows == 0:
+            return 0.0, np.zeros_like(hidden_states)
+
+        ranks = self.rank_of[targets]
+        cluster = np.searchsorted(self.boundaries, ranks, side='right') - 2  # -1 for head tokens
+        head_targets = np.where(cluster < 0, ranks, self.head_size + cluster)
+
+        head_log_probs = _log_softmax(backend.matmul(hidden, self.head_weights) + self.head_bias)
+        total_loss = -np.sum(head_log_probs[np.arange(num_rows), head_targets])
+
+        d_head = np.exp(head_log_probs)
+        d_head[np.arange(num_rows), head_targets] -= 1
+        d_head /= num_rows
+
+        row_gradient = backend.matmul(d_head, self.head_weights.T)
+        self._update(self.head_weights, backend.matmul(hidden.T, d_head), learning_rate)
+        self._update(self.head_bias, d_head.sum(axis=0), learning_rate)
+
+        for i in range(len(self.tail_weights)):
+            members = np.flatnonzero(cluster == i)
+            if len(members) == 0:
+                continue
+            local_targets = ranks[members] - self.boundaries[i + 1]
+            cluster_hidden = hidden[members]
+
+            projected = backend.matmul(cluster_hidden, self.tail_projections[i])
+            cluster_log_probs = _log_softmax(backend.matmul(projected, self.tail_weights[i]) + self.tail_biases[i])
+            total_loss -= np.sum(cluster_log_probs[np.arange(len(members)), local_targets])
+
+            d_cluster = np.exp(cluster_log_probs)
+            d_cluster[np.arange(len(members)), local_targets] -= 1
+            d_cluster /= num_rows
+
+            d_projected = backend.matmul(d_cluster, self.tail_weights[i].T)
+            row_gradient[members] += backend.matmul(d_projected, self.tail_projections[i].T)
+
+            self._update(self.tail_weights[i], backend.matmul(projected.T, d_cluster), learning_rate)
+            self._update(self.tail_biases[i], d_cluster.sum(axis=0), learning_rate)
+            self._update(self.tail_projections[i], backend.matmul(cluster_hidden.T, d_projected), learning_rate)
+
+        return total_loss / num_rows, self._scatter_rows(hidden_states, rows, row_gradient)
@@ -4,11 +4,14 @@ from neuralnetwork.layer import Layer
 
 class PositionalEncoding(Layer):
 
+    supports_out = True
+
     def __init__(self, d_model):
         super().__init__()
         self.d_model = d_model
+        self._table = None
 
-    def forward(self, inputs):
+    def forward(self, inputs, out=None):
         self.input = inputs
         batch_size, seq_len, d_model = inputs.shape
 
@@ -16,6 +19,16 @@ class PositionalEncoding(Layer):
         # Broadcast to match input shape
         position_encoding = position_encoding[np.newaxis, :, :]  # (1, seq_len, d_model)
 
+        self.output = np.add(inputs, position_encoding, out=out)
+
+        return self.output
+
+    def forward_step(self, inputs, cache):
+        self.input = inputs
+
+        # Every sequence in the batch may be at a different position
+        position_encoding = self._position_table(cache.capacity)[cache.positions]
+
         self.output = inputs + position_encoding
 
         return self.output
@@ -23,6 +36,11 @@ class PositionalEncoding(Layer):
     def backward(self, output_gradient, learning_rate):
         return output_gradient
 
+    def _position_table(self, length):
+        if self._table is None or self._table.shape[0] < length:
+            self._table = self._compute_position_encoding(length)
+        return self._table
+
     def _compute_position_encoding(self, seq_len):
         position = np.arange(seq_len)[:, np.newaxis]
 
@@ -0,0 +1,99 @@
+import copy
+
+import numpy as np
+
+from neuralnetwork.layer import Layer
+from neuralnetwork.layer.quantized import QuantizedTensor, quantized_matmul
+from neuralnetwork.layer.transformer.attention import MultiHeadAttention, SingleHeadAttention
+
+# Inference-only counterparts of the transformer layers holding int8 weights,
+# produced by neuralnetwork.network.quantize. They do not implement backward.
+
+class QuantizedEmbedding(Layer):
+    """
+    Embedding lookup from an int8 (d_model, vocab_size) table with one scale per token.
+    Only the looked up columns are dequantized.
+
+    Expected input shape: (batch_size, seq_len) - token IDs
+    Output shape: (batch_size, seq_len, d_model)
+    """
+
+    def __init__(self, weights, d_model):
+        super().__init__()
+        self.weights = weights
+        self.d_model = d_model
+
+    def forward(self, token_ids):
+        self.input = token_ids
+        scales = self.weights.scales[token_ids] * np.sqrt(self.d_model)
+        self.output = self.weights.values.T[token_ids] * scales[..., np.newaxis]
+        return self.output
+
+class QuantizedProjection(Layer):
+    """
+    Output projection with int8 (d_model, vocab_size) weights, which can be shared with a QuantizedEmbedding.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, vocab_size)
+    """
+
+    def __init__(self, weights, bias, tile_size=256):
+        super().__init__()
+        self.weights = weights
+        self.bias = bias.flatten()
+        self.tile_size = tile_size
+
+    def forward(self, hidden_states):
+        self.input = hidden_states
+        self.output = quantized_matmul(hidden_states, self.weights, self.tile_size)
+        self.output += self.bias
+        return self.output
+
+class QuantizedSingleHeadAttention(SingleHeadAttention):
+    """
+    SingleHeadAttention whose Q/K/V weights are fused into one int8 (d_model, 3 * d_model) matrix.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, d_model)
+    """
+
+    def __init__(self, attention, tile_size=256):
+        Layer.__init__(self)
+        self.d_model = attention.d_model
+        self.mask = attention.mask
+        self.window = attention.window
+        # Both keep activations from forward, so the float layer's instances cannot be shared
+        self.local = copy.deepcopy(attention.local)
+        self.softmax = copy.deepcopy(attention.softmax)
+        self.tile_size = tile_size
+        self.weight_qkv = QuantizedTensor.from_float(
+            np.concatenate([attention.weight_q, attention.weight_k, attention.weight_v], axis=-1))
+
+    def _project(self, inputs):
+        return np.split(quantized_matmul(inputs, self.weight_qkv, self.tile_size), 3, axis=-1)
+
+    def backward(self, output_gradient, learning_rate):
+        raise NotImplementedError("Quantized layers are inference only")
+
+class QuantizedMultiHeadAttention(MultiHeadAttention):
+    """
+    MultiHeadAttention with int8 Q/K/V weights in every head and an int8 output projection.
+
+    Expected input shape: (batch_size, seq_len, d_model)
+    Output shape: (batch_size, seq_len, d_model)
+    """
+
+    def __init__(self, attention, tile_size=256):
+        Layer.__init__(self)
+        self.d_model = attention.d_model
+        self.num_heads = attention.num_heads
+        self.d_k = attention.d_k
+        self.tile_size = tile_size
+        self.attention_heads = [QuantizedSingleHeadAttention(head, tile_size) for head in attention.attention_heads]
+        self.weight_o = QuantizedTensor.from_float(attention.weight_o)
+
+    def _project_output(self, concat_output):
+        return quantized_matmul(concat_output, self.weight_o, self.tile_size)
+
+    def backward(self, output_gradient, learning_rate):
+        raise NotImplementedError("Quantized layers are inference only")
@@ -3,6 +3,8 @@ from neuralnetwork.layer import Layer
 from neuralnetwork.layer import Dense, ReLU
 
 class TransformerFFN(Layer):
+    sublayer_names = ('dense1', 'dense2')
+
     def __init__(self, d_model, d_ff):
         super().__init__()
         self.d_model = d_model
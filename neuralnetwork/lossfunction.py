@@ -1,6 +1,7 @@
 import numpy as np
 
 from neuralnetwork.layer import SoftMax
+from neuralnetwork.layer.activation import _sigmoid
 
 # Mean Square Error
 
@@ -26,6 +27,23 @@ def bce_prime(actual, predicted):
     else:
         return ((1 - actual) / (1 - predicted) - actual / predicted) / np.size(actual)
 
+# Binary Cross Entropy on logits
+#
+# bce of sigmoid(logits), computed without forming the probabilities:
+#   max(z, 0) - z * y + log(1 + exp(-|z|))
+# It stays finite for saturated logits and its derivative wrt the logits is
+# simply sigmoid(z) - y, scaled like bce_prime (per sample or per minibatch row).
+
+def bce_with_logits(actual, logits):
+    return np.mean(np.maximum(logits, 0) - logits * actual + np.log1p(np.exp(-np.abs(logits))))
+
+def bce_with_logits_prime(actual, logits):
+    gradient = _sigmoid(logits) - actual
+    if actual.ndim > 1:
+        return gradient / actual.shape[0]
+    else:
+        return gradient / np.size(actual)
+
 # Cross Entropy
 
 def cross_entropy(predict: np.ndarray, actual: np.ndarray, padding_idx: int = 0) -> float:
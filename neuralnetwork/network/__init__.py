@@ -1,7 +1,22 @@
 from .network import Network
 from .batch_network import BatchNetwork
+from .generation import DecodeCache
+from .inference_server import InferenceServer
+from .freeze import freeze
+from .quantize import quantize
+from .checkpoint import Checkpointer
+from .metrics import MetricsRecorder, InMemorySink, JSONLinesSink, CSVSink
 
 __all__ = [
     'Network',
-    'BatchNetwork'
+    'BatchNetwork',
+    'DecodeCache',
+    'InferenceServer',
+    'freeze',
+    'quantize',
+    'Checkpointer',
+    'MetricsRecorder',
+    'InMemorySink',
+    'JSONLinesSink',
+    'CSVSink'
 ]
@@ -2,46 +2,184 @@ import time
 
 import numpy as np
 
+from neuralnetwork.layer.gradient import GradientCollector
+from neuralnetwork.layer.transformer.output_head import OutputHead
+from neuralnetwork.network.generation import generate
+from neuralnetwork.network.memory_plan import MemoryPlanner
+from neuralnetwork.network.metrics import MetricsRecorder
+from neuralnetwork.scheduler import Scheduler, as_scheduler
+
 class BatchNetwork:
 
-    def __init__(self, layers, loss_functions, data_generator=None):
+    def __init__(self, layers, loss_functions, data_generator=None, max_grad_norm=None):
         self.layers = layers
         self.loss_function, self.loss_function_prime = loss_functions
         self.data_generator = data_generator
+        self.memory_planner = None
+        # Parameter gradients are clipped to this global L2 norm every step (None disables clipping)
+        self.max_grad_norm = max_grad_norm
+        self.grad_norm = None
+        self.loss_history = []
+        self.grad_norm_history = []
+
+    def plan_memory(self, training=True):
+        """
+        Reuse a planned pool of buffers for activations (and with training=True
+        input gradients) instead of allocating new arrays on every step.
+
+        One plan is built per input shape the first time that shape is seen.
+        With training=False the pool is smaller, but the network cannot be trained.
+        """
+        self.memory_planner = MemoryPlanner(self._split_head()[0], training)
+        return self.memory_planner
 
     def forward(self, data):
+        body, head = self._split_head()
+        output = self._forward_layers(body, data)
+        return output if head is None else head.forward(output)
+
+    def _split_head(self):
+        # An OutputHead as the last layer computes the training loss itself from the body's output
+        if self.layers and isinstance(self.layers[-1], OutputHead):
+            return self.layers[:-1], self.layers[-1]
+        return self.layers, None
+
+    def _forward_layers(self, layers, data):
+        if self.memory_planner is None:
+            output = data
+            for layer in layers:
+                output = layer.forward(output)
+            return output
+
+        plan = self.memory_planner.plan(data)
+        if plan is None:
+            outputs = []
+            output = data
+            for layer in layers:
+                output = layer.forward(output)
+                outputs.append(output)
+            self.memory_planner.record(data, outputs)
+            return output
+
+        output = data
+        for layer, out in zip(layers, plan.forward):
+            output = layer.forward(output) if out is None else layer.forward(output, out=out)
+        return output
+
+    def forward_step(self, data, cache):
         output = data
         for layer in self.layers:
-            output = layer.forward(output)
+            output = layer.forward_step(output, cache)
         return output
 
     def train_batch(self, input_batch, target_batch, learning_rate=0.1):
-        output = self.forward(input_batch)
-        target_one_hot = self._create_one_hot(target_batch)
+        if self.memory_planner is not None and not self.memory_planner.training:
+            raise ValueError("Memory was planned for inference, call plan_memory(training=True) before training")
+
+        body, head = self._split_head()
+        output = self._forward_layers(body, input_batch)
+
+        if head is None:
+            target_one_hot = self._create_one_hot(target_batch)
+            loss = self.loss_function(output, target_one_hot)
+            gradient = self.loss_function_prime(output, target_one_hot)
+
+        plan = self.memory_planner.plan(input_batch) if self.memory_planner is not None else None
+
+        with GradientCollector() as gradients:
+            if head is not None:
+                loss, gradient = head.loss(output, target_batch, learning_rate)
 
-        loss = self.loss_function(output, target_one_hot)
-        gradient = self.loss_function_prime(output, target_one_hot)
+            if plan is None:
+                for layer in reversed(body):
+                    gradient = layer.backward(gradient, learning_rate)
+            else:
+                for layer, out in zip(reversed(body), reversed(plan.gradient)):
+                    if out is None:
+                        gradient = layer.backward(gradient, learning_rate)
+                    else:
+                        gradient = layer.backward(gradient, learning_rate, out=out)
 
-        for i, layer in enumerate(reversed(self.layers)):
-            gradient = layer.backward(gradient, learning_rate)
+        self.grad_norm = gradients.apply(learning_rate, self.max_grad_norm)
 
         return loss
 
-    def train(self, batch, iterations, learning_rate=0.1, show_error=None):
-        for iteration in range(iterations):
+    def train(self, batch, iterations, learning_rate=0.1, show_error=None, checkpointer=None, metrics=None):
+        """
+        learning_rate is a number or a neuralnetwork.scheduler.Scheduler, which is
+        stepped with the average loss after every iteration. Pass the same
+        scheduler to consecutive calls to continue its schedule.
+
+        With a Checkpointer, snapshots are taken in the background while training,
+        and after checkpointer.restore() this call resumes at the saved position.
+
+        Step metrics go to `metrics` (a MetricsRecorder with sinks, a fresh
+        in-memory one by default), and its summary is returned.
+        """
+        scheduler = as_scheduler(learning_rate)
+        metrics = metrics if metrics is not None else MetricsRecorder()
+        pad_id = self._pad_id()
+        start_iteration, start_batch, resumed_loss, resumed_grad_norm = 0, 0, 0, 0
+
+        if checkpointer is not None and checkpointer.resume_state is not None:
+            state, checkpointer.resume_state = checkpointer.resume_state, None
+            start_iteration, start_batch = state['iteration'], state['batch_index']
+            resumed_loss, resumed_grad_norm = state['partial_loss'], state['partial_grad_norm']
+            # Advance the caller's scheduler, so later calls with it continue the schedule
+            if isinstance(learning_rate, Scheduler):
+                scheduler.load_state(state['scheduler'])
+            else:
+                scheduler = state['scheduler']
+            if state.get('order') is not None:
+                batch.order = state['order']
+
+        for iteration in range(start_iteration, iterations):
             t1 = time.time()
-            total_loss = 0
+            total_loss = resumed_loss if iteration == start_iteration else 0
+            total_grad_norm = resumed_grad_norm if iteration == start_iteration else 0
+            total_tokens = 0
             num_batches = len(batch)
+            current_rate = scheduler.get_lr()
 
-            for input_batch, target_batch in batch:
-                loss = self.train_batch(input_batch, target_batch, learning_rate)
+            for batch_index in range(start_batch if iteration == start_iteration else 0, num_batches):
+                step_start = time.perf_counter()
+                input_batch, target_batch = batch[batch_index]
+                loss = self.train_batch(input_batch, target_batch, current_rate)
+                step_time = time.perf_counter() - step_start
+
+                tokens = np.count_nonzero(target_batch != pad_id)
                 total_loss += loss
+                total_grad_norm += self.grad_norm
+                total_tokens += tokens
+                metrics.record_step(iteration, batch_index, loss, self.grad_norm, tokens, step_time, current_rate)
+
+                if checkpointer is not None:
+                    checkpointer.after_step({ 'iteration': iteration, 'batch_index': batch_index + 1,
+                                              'partial_loss': total_loss, 'partial_grad_norm': total_grad_norm,
+                                              'scheduler': scheduler, 'order': getattr(batch, 'order', None) })
 
             avg_loss = total_loss / num_batches
+            avg_grad_norm = total_grad_norm / num_batches
+            self.loss_history.append(avg_loss)
+            self.grad_norm_history.append(avg_grad_norm)
+            scheduler.step(avg_loss)
+
+            epoch_time = time.time() - t1
+            metrics.record_epoch(iteration, avg_loss, avg_grad_norm, total_tokens, epoch_time, current_rate)
 
             if show_error is not None:
                 print(
-                    f"Epoch: {show_error['epoch'] + iteration} | Batch Number / Iteration: {show_error['batch_number']} - {iteration + 1} | Loss: {avg_loss:.6f} | Time: {time.time() - t1: .6f}")
+                    f"Epoch: {show_error['epoch'] + iteration} | Batch Number / Iteration: {show_error['batch_number']} - {iteration + 1} | Loss: {avg_loss:.6f} | Grad Norm: {avg_grad_norm:.4f} | LR: {current_rate:.2e} | Tokens/s: {total_tokens / epoch_time:.0f} | Time: {epoch_time: .6f}")
+
+        if checkpointer is not None:
+            checkpointer.wait()
+
+        return metrics.summary()
+
+    def _pad_id(self):
+        if self.data_generator is None:
+            return 0
+        return self.data_generator.token_to_id[self.data_generator.PAD_TOKEN]
 
     def _create_one_hot(self, target_batch):
         if self.data_generator is None:
@@ -58,3 +196,23 @@ class BatchNetwork:
     def evaluate(self, data):
         """Evaluate the network on input data, returning softmax probabilities."""
         return self.forward(data)
+
+    def generate(self, prompts, max_new_tokens=20, strategy='sample', temperature=1.0, top_k=None, top_p=None,
+                 num_beams=4, length_penalty=1.0, eos_id=None, pad_id=None, rng=None, on_tokens=None):
+        """
+        Decode many prompts (lists of token ids) in one padded batch with cached attention.
+
+        strategy is 'greedy', 'sample' (temperature / top_k / top_p) or 'beam'.
+        eos_id and pad_id default to the data generator's tokens.
+        on_tokens(prompt_index, token_ids) streams tokens as they are decided.
+        """
+        if self.data_generator is not None:
+            if eos_id is None:
+                eos_id = self.data_generator.token_to_id[self.data_generator.EOS_TOKEN]
+            if pad_id is None:
+                pad_id = self.data_generator.token_to_id[self.data_generator.PAD_TOKEN]
+
+        return generate(self, prompts, max_new_tokens=max_new_tokens, strategy=strategy,
+                        temperature=temperature, top_k=top_k, top_p=top_p, num_beams=num_beams,
+                        length_penalty=length_penalty, eos_id=eos_id, pad_id=0 if pad_id is None else pad_id,
+                        rng=rng, on_tokens=on_tokens)
@@ -0,0 +1,120 @@
+import os
+import pickle
+import re
+import threading
+
+import numpy as np
+
+class Checkpointer:
+    """
+    Periodic training snapshots written by a background thread.
+
+    BatchNetwork.train(..., checkpointer=...) reports its progress after every
+    batch and every `every` steps a snapshot is taken. The training thread
+    only copies the parameters into a staging buffer, a writer thread saves
+    them to checkpoint_<step>.npz through a temporary file and os.replace, so
+    a crash never leaves a half written checkpoint, and keeps the last
+    keep_last files. A snapshot only waits if the previous one is still
+    being written.
+
+    restore() loads the newest snapshot into the network, and the next train
+    call with this checkpointer continues at the saved epoch and batch, with
+    the saved scheduler state, loss history and batch order. The order is
+    restored for DataGenerator batches and the lazy shard / image batches, a
+    plain list of batches must be rebuilt by the caller in the same order.
+    """
+
+    def __init__(self, network, directory, every=100, keep_last=3):
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        self.network = network
+        self.directory = directory
+        self.every = every
+        self.keep_last = keep_last
+
+        self.step = 0
+        self.resume_state = None
+        self._staging = None
+        self._thread = None
+        self._error = None
+        os.makedirs(directory, exist_ok=True)
+
+    def parameters(self):
+        # Tied arrays are listed by several layers, they are saved once under their first name
+        seen = set()
+        for i, layer in enumerate(self.network.layers):
+            for name, array in layer.parameters(f'{i}.'):
+                if id(array) not in seen:
+                    seen.add(id(array))
+                    yield name, array
+
+    def after_step(self, progress):
+        self.step += 1
+        if self.step % self.every == 0:
+            self.save(progress)
+
+    def save(self, progress):
+        """Snapshot the parameters now and write them in the background"""
+        self.wait()
+
+        parameters = list(self.parameters())
+        if self._staging is None:
+            self._staging = { name: np.empty_like(array) for name, array in parameters }
+        for name, array in parameters:
+            np.copyto(self._staging[name], array)
+
+        state = dict(progress, step=self.step, loss_history=list(self.network.loss_history),
+                     grad_norm_history=list(self.network.grad_norm_history))
+        payload = np.frombuffer(pickle.dumps(state), dtype=np.uint8)
+
+        self._thread = threading.Thread(target=self._write, args=(self.step, payload), daemon=True)
+        self._thread.start()
+
+    def _write(self, step, payload):
+        try:
+            path = os.path.join(self.directory, f'checkpoint_{step:010d}.npz')
+            temporary = path + '.tmp'
+            with open(temporary, 'wb') as file:
+                np.savez(file, __state__=payload, **self._staging)
+            os.replace(temporary, path)
+
+            for old in self.checkpoints()[:-self.keep_last]:
+                os.remove(old)
+        except Exception as e:
+            self._error = e
+
+    def wait(self):
+        """Block until the snapshot being written is on disk, re-raising a failed write"""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        self.wait()
+
+    def checkpoints(self):
+        names = [name for name in os.listdir(self.directory) if re.fullmatch(r'checkpoint_\d+\.npz', name)]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def restore(self, path=None):
+        """Load a snapshot (the newest by default) into the network, returns its progress or None"""
+        self.wait()
+        if path is None:
+            checkpoints = self.checkpoints()
+            if not checkpoints:
+                return None
+            path = checkpoints[-1]
+
+        with np.load(path) as data:
+            for name, array in self.parameters():
+                np.copyto(array, data[name])
+            state = pickle.loads(data['__state__'].tobytes())
+
+        self.network.loss_history = state['loss_history']
+        self.network.grad_norm_history = state['grad_norm_history']
+        self.step = state['step']
+        self.resume_state = state
+        return state
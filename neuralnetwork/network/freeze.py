@@ -0,0 +1,92 @@
+import copy
+
+import numpy as np
+
+from neuralnetwork.layer.transformer import (AddAndNorm, Embedding, MultiHeadAttention, PositionalEncoding, Projection,
+                                             SingleHeadAttention, TransformerFFN)
+from neuralnetwork.layer.transformer.frozen import (FrozenAddAndNorm, FrozenAttention, FrozenEmbedding, FrozenFFN,
+                                                    FrozenProjection)
+from neuralnetwork.network.batch_network import BatchNetwork
+
+def freeze(network, max_seq_len=512):
+    """
+    Build an inference-only copy of a BatchNetwork with per-call constants folded into the weights:
+      - the sqrt(d_model) embedding scale goes into the embedding table
+      - a following PositionalEncoding is precomputed up to max_seq_len and fused into the lookup
+      - the 1/sqrt(d_k) attention score scale goes into the query weights
+      - LayerNorm gamma/beta go into the first projection of the attention or feed forward sublayer
+      - the per-head Q/K/V matmuls are fused into one batched matmul
+      - the Projection bias is flattened once
+    Layers that are not recognised are deep copied unchanged. The original network is not modified.
+    """
+    layers = []
+    i = 0
+    while i < len(network.layers):
+        layer = network.layers[i]
+        following = network.layers[i + 1] if i + 1 < len(network.layers) else None
+
+        if isinstance(layer, Embedding):
+            table = layer.weights.T * np.sqrt(layer.d_model)
+            if isinstance(following, PositionalEncoding):
+                layers.append(FrozenEmbedding(table, following, max_seq_len))
+                i += 1
+            else:
+                layers.append(FrozenEmbedding(table))
+        elif isinstance(layer, AddAndNorm):
+            layers.append(_freeze_add_and_norm(layer))
+        elif isinstance(layer, Projection):
+            layers.append(FrozenProjection(layer.weights.copy(), layer.bias.flatten()))
+        else:
+            layers.append(copy.deepcopy(layer))
+
+        i += 1
+
+    return BatchNetwork(layers, (network.loss_function, network.loss_function_prime),
+                        data_generator=network.data_generator)
+
+def _freeze_add_and_norm(layer):
+    normalization = layer.normalization
+    gamma, beta = normalization.gamma, normalization.beta
+
+    # FrozenAttention is full attention, sliding-window attention is copied as it is
+    if isinstance(layer.sublayer, (MultiHeadAttention, SingleHeadAttention)) and not _is_windowed(layer.sublayer):
+        sublayer = _freeze_attention(layer.sublayer, gamma, beta)
+    elif isinstance(layer.sublayer, TransformerFFN):
+        sublayer = _freeze_ffn(layer.sublayer, gamma, beta)
+    else:
+        return FrozenAddAndNorm(copy.deepcopy(layer.sublayer), normalization.epsilon,
+                                normalization=copy.deepcopy(normalization))
+
+    return FrozenAddAndNorm(sublayer, normalization.epsilon)
+
+def _is_windowed(attention):
+    heads = attention.attention_heads if isinstance(attention, MultiHeadAttention) else [attention]
+    return heads[0].window is not None
+
+def _freeze_attention(attention, gamma, beta):
+    if isinstance(attention, MultiHeadAttention):
+        heads, weight_o = attention.attention_heads, attention.weight_o.copy()
+    else:
+        heads, weight_o = [attention], None
+
+    d_k = heads[0].d_model
+    weights, biases = [], []
+    for h, head in enumerate(heads):
+        # Head h only sees its own slice of the normalized input
+        head_gamma = gamma[h * d_k:(h + 1) * d_k]
+        head_beta = beta[h * d_k:(h + 1) * d_k]
+
+        weight_qkv = np.concatenate([head.weight_q / np.sqrt(d_k), head.weight_k, head.weight_v], axis=-1)
+
+        # (x_norm * gamma + beta) @ W == x_norm @ (gamma[:, None] * W) + beta @ W
+        weights.append(head_gamma[:, np.newaxis] * weight_qkv)
+        biases.append(head_beta @ weight_qkv)
+
+    return FrozenAttention(np.stack(weights), np.stack(biases)[:, np.newaxis, :], weight_o, mask=heads[0].mask)
+
+def _freeze_ffn(ffn, gamma, beta):
+    weights1 = gamma[:, np.newaxis] * ffn.dense1.weights
+    biases1 = beta @ ffn.dense1.weights + ffn.dense1.biases
+
+    return FrozenFFN(weights1, biases1, copy.deepcopy(ffn.activation), ffn.dense2.weights.copy(),
+                     ffn.dense2.biases.copy())
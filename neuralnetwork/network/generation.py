@@ -0,0 +1,271 @@
+import numpy as np
+
+from neuralnetwork.backend import get_backend
+
+class DecodeCache:
+    """
+    Decoding state shared by every layer of a network while generating.
+
+    Holds the key/value caches of the attention layers, the position of every
+    token fed in the current step and which cache slots hold real tokens
+    (prompts are right padded, so padded slots must never be attended).
+
+    Layer states are batch-major arrays, so rows can be gathered with
+    select() to reorder beams or to drop finished sequences.
+    """
+
+    def __init__(self, batch_size, capacity):
+        self.capacity = capacity
+        self.positions = np.zeros((batch_size, 0), dtype=int)
+        self.key_mask = np.zeros((batch_size, capacity), dtype=bool)
+        self.length = 0
+        self.step_length = 0
+        self.states = {}
+        self._masks = {}
+
+    def begin_step(self, positions, valid):
+        # positions, valid: (batch_size, step_length)
+        step_length = positions.shape[1]
+        if self.length + step_length > self.capacity:
+            raise ValueError(f"Decode cache capacity ({self.capacity}) exceeded")
+
+        self.positions = positions
+        self.key_mask[:, self.length:self.length + step_length] = valid
+        self.length += step_length
+        self.step_length = step_length
+        self._masks = {}
+
+    def state(self, layer):
+        return self.states.setdefault(id(layer), {})
+
+    def append(self, layer, *arrays):
+        """Write this step's arrays into the layer's cache and return everything cached so far"""
+        state = self.state(layer)
+        start = self.length - self.step_length
+
+        cached = []
+        for i, array in enumerate(arrays):
+            buffer = state.get(i)
+            if buffer is None:
+                buffer = np.zeros((array.shape[0], self.capacity) + array.shape[2:], dtype=array.dtype)
+                state[i] = buffer
+            buffer[:, start:self.length] = array
+            cached.append(buffer[:, :self.length])
+
+        return cached
+
+    def attention_mask(self, causal=True):
+        """Boolean mask (batch_size, step_length, length) of the slots each new query may attend"""
+        if causal not in self._masks:
+            batch_size = self.key_mask.shape[0]
+            mask = np.broadcast_to(self.key_mask[:, np.newaxis, :self.length],
+                                   (batch_size, self.step_length, self.length))
+            if causal:
+                query_slots = np.arange(self.length - self.step_length, self.length)[:, np.newaxis]
+                mask = mask & (np.arange(self.length)[np.newaxis, :] <= query_slots)
+            self._masks[causal] = mask
+
+        return self._masks[causal]
+
+    def select(self, indices):
+        self.positions = self.positions[indices]
+        self.key_mask = self.key_mask[indices]
+        for state in self.states.values():
+            for key, value in state.items():
+                state[key] = value[indices]
+        self._masks = {}
+
+def log_softmax(logits):
+    stable_logits = logits - np.max(logits, axis=-1, keepdims=True)
+    return stable_logits - np.log(np.sum(np.exp(stable_logits), axis=-1, keepdims=True))
+
+def greedy(logits):
+    return np.argmax(logits, axis=-1)
+
+def sample(logits, temperature=1.0, top_k=None, top_p=None, rng=None):
+    """
+    Sample one token per row of logits (batch_size, vocab_size).
+
+    temperature == 0 falls back to greedy decoding, top_k keeps the k most
+    likely tokens and top_p keeps the smallest set whose mass reaches top_p.
+    """
+    if temperature == 0:
+        return greedy(logits)
+
+    rng = np.random if rng is None else rng
+    batch_size, vocab_size = logits.shape
+
+    logits = logits / temperature
+
+    if top_k is not None and top_k < vocab_size:
+        kth_largest = np.partition(logits, -top_k, axis=-1)[:, -top_k][:, np.newaxis]
+        logits = np.where(logits < kth_largest, -np.inf, logits)
+
+    probs = get_backend().softmax(logits)
+
+    if top_p is not None and top_p < 1.0:
+        order = np.argsort(-probs, axis=-1)
+        sorted_probs = np.take_along_axis(probs, order, axis=-1)
+        # Drop a token once the more likely ones already reach top_p (the first one always stays)
+        sorted_probs[np.cumsum(sorted_probs, axis=-1) - sorted_probs >= top_p] = 0
+        probs = np.zeros_like(probs)
+        np.put_along_axis(probs, order, sorted_probs, axis=-1)
+
+    # Inverse CDF sampling for every row at once
+    cumulative = np.cumsum(probs, axis=-1)
+    threshold = rng.random((batch_size, 1)) * cumulative[:, -1:]
+    return np.minimum(np.sum(cumulative <= threshold, axis=-1), vocab_size - 1)
+
+def generate(network, prompts, max_new_tokens=20, strategy='sample', temperature=1.0, top_k=None,
+             top_p=None, num_beams=4, length_penalty=1.0, eos_id=None, pad_id=0, rng=None, on_tokens=None):
+    """
+    Decode every prompt (a list of token ids) in one padded batch.
+
+    strategy is 'greedy', 'sample' (with temperature / top_k / top_p) or 'beam'.
+    A sequence stops as soon as it emits eos_id and is dropped from the batch.
+    Returns the generated token ids of every prompt (including the final eos_id).
+
+    on_tokens(prompt_index, token_ids) is called as soon as tokens are decided:
+    after every step when sampling, once per prompt when its beam search finishes.
+    """
+    if len(prompts) == 0:
+        return []
+    if any(len(prompt) == 0 for prompt in prompts):
+        raise ValueError("Prompts must contain at least one token")
+
+    if strategy == 'beam':
+        return _beam_search(network, prompts, max_new_tokens, num_beams, length_penalty, eos_id, pad_id, on_tokens)
+
+    if strategy == 'greedy':
+        select_next = greedy
+    elif strategy == 'sample':
+        def select_next(logits):
+            return sample(logits, temperature, top_k, top_p, rng)
+    else:
+        raise ValueError(f"Unknown decoding strategy: {strategy}")
+
+    return _decode(network, prompts, max_new_tokens, select_next, eos_id, pad_id, on_tokens)
+
+def _prefill(network, prompts, capacity_extra, pad_id):
+    lengths = np.array([len(prompt) for prompt in prompts])
+    max_length = lengths.max()
+
+    tokens = np.full((len(prompts), max_length), pad_id)
+    for i, prompt in enumerate(prompts):
+        tokens[i, :len(prompt)] = prompt
+
+    positions = np.broadcast_to(np.arange(max_length), tokens.shape)
+
+    cache = DecodeCache(len(prompts), max_length + capacity_extra)
+    cache.begin_step(positions, positions < lengths[:, np.newaxis])
+
+    logits = network.forward_step(tokens, cache)
+
+    # Each prompt continues from its own last real token
+    return cache, logits[np.arange(len(prompts)), lengths - 1], lengths
+
+def _decode(network, prompts, max_new_tokens, select_next, eos_id, pad_id, on_tokens=None):
+    outputs = [[] for _ in prompts]
+    if max_new_tokens <= 0:
+        return outputs
+
+    cache, logits, positions = _prefill(network, prompts, max_new_tokens, pad_id)
+    active = np.arange(len(prompts))
+
+    for step in range(max_new_tokens):
+        next_tokens = select_next(logits)
+        for row, token in zip(active, next_tokens):
+            outputs[row].append(int(token))
+            if on_tokens is not None:
+                on_tokens(row, [int(token)])
+
+        if step == max_new_tokens - 1:
+            break
+
+        if eos_id is not None:
+            running = next_tokens != eos_id
+            if not running.any():
+                break
+            if not running.all():
+                active, next_tokens, positions = active[running], next_tokens[running], positions[running]
+                cache.select(np.flatnonzero(running))
+
+        cache.begin_step(positions[:, np.newaxis], np.ones((len(active), 1), dtype=bool))
+        logits = network.forward_step(next_tokens[:, np.newaxis], cache)[:, -1]
+        positions = positions + 1
+
+    return outputs
+
+def _beam_search(network, prompts, max_new_tokens, num_beams, length_penalty, eos_id, pad_id, on_tokens=None):
+    outputs = [[] for _ in prompts]
+    if max_new_tokens <= 0:
+        return outputs
+
+    cache, logits, positions = _prefill(network, prompts, max_new_tokens, pad_id)
+
+    # Expand every prompt into num_beams rows: (prompt, beam) -> prompt * num_beams + beam
+    cache.select(np.repeat(np.arange(len(prompts)), num_beams))
+    logits = np.repeat(logits, num_beams, axis=0)
+    positions = np.repeat(positions, num_beams)
+
+    active = np.arange(len(prompts))
+    vocab_size = logits.shape[-1]
+
+    # Only the first beam is live initially so the first expansion picks distinct tokens
+    scores = np.full((len(prompts), num_beams), -np.inf)
+    scores[:, 0] = 0.0
+    sequences = np.zeros((len(prompts), num_beams, 0), dtype=int)
+    generated_lengths = np.zeros((len(prompts), num_beams), dtype=int)
+    finished = np.zeros((len(prompts), num_beams), dtype=bool)
+
+    for step in range(max_new_tokens):
+        num_active = len(active)
+        log_probs = log_softmax(logits).reshape(num_active, num_beams, vocab_size)
+
+        # Finished beams can only be extended with padding, at no cost
+        log_probs[finished] = -np.inf
+        log_probs[finished, pad_id] = 0.0
+
+        candidates = (scores[:, :, np.newaxis] + log_probs).reshape(num_active, -1)
+        top = np.argpartition(-candidates, num_beams - 1, axis=-1)[:, :num_beams]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(candidates, top, axis=-1), axis=-1), axis=-1)
+
+        scores = np.take_along_axis(candidates, top, axis=-1)
+        beam_index, tokens = top // vocab_size, top % vocab_size
+
+        was_finished = np.take_along_axis(finished, beam_index, axis=-1)
+        generated_lengths = np.take_along_axis(generated_lengths, beam_index, axis=-1) + ~was_finished
+        sequences = np.concatenate([np.take_along_axis(sequences, beam_index[:, :, np.newaxis], axis=1),
+                                    tokens[:, :, np.newaxis]], axis=-1)
+        finished = was_finished
+        if eos_id is not None:
+            finished = finished | (tokens == eos_id)
+
+        done = finished.all(axis=-1)
+        if step == max_new_tokens - 1:
+            done[:] = True
+
+        for i in np.flatnonzero(done):
+            normalized = scores[i] / np.maximum(generated_lengths[i], 1) ** length_penalty
+            best = np.argmax(normalized)
+            outputs[active[i]] = [int(token) for token in sequences[i, best, :generated_lengths[i, best]]]
+            if on_tokens is not None:
+                on_tokens(active[i], outputs[active[i]])
+
+        if done.all():
+            break
+
+        # Reorder the cache to follow the surviving beams and drop finished prompts
+        keep = np.flatnonzero(~done)
+        rows = (keep[:, np.newaxis] * num_beams + beam_index[keep]).ravel()
+        cache.select(rows)
+
+        active, scores, tokens = active[keep], scores[keep], tokens[keep]
+        sequences, generated_lengths, finished = sequences[keep], generated_lengths[keep], finished[keep]
+        positions = positions[rows]
+
+        cache.begin_step(positions[:, np.newaxis], np.ones((len(rows), 1), dtype=bool))
+        logits = network.forward_step(tokens.reshape(-1, 1), cache)[:, -1]
+        positions = positions + 1
+
+    return outputs
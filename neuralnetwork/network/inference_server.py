@@ -0,0 +1,220 @@
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+class InferenceServer:
+    """
+    Asyncio front end that answers many questions with one trained BatchNetwork.
+
+    Concurrent requests are gathered into micro-batches: the first request
+    opens a batch which is closed after max_latency seconds or once it holds
+    max_batch_size questions. Every batch is decoded with one batched
+    generate() call on a worker thread while tokens are streamed back to each
+    request as soon as they are sampled.
+
+    stop() fails the requests still waiting for a batch, and a later submit
+    starts the server again.
+
+    Wire protocol (JSON lines, over a local TCP socket or stdio):
+        request:  {"id": 1, "question": "what is the square of 4"}
+        replies:  {"id": 1, "token": "the"} ... {"id": 1, "done": true, "response": "..."}
+        errors:   {"id": 1, "error": "..."}
+
+    With a subword tokenizer on the data generator, questions are encoded and
+    responses decoded by it. Each "token" reply is then the text the step adds
+    to the decoded response (" four", "ty"), so the replies concatenate to it.
+    """
+
+    def __init__(self, network, data_generator, max_batch_size=16, max_latency=0.01, max_new_tokens=20,
+                 **generate_options):
+        self.network = network
+        self.data_generator = data_generator
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_new_tokens = max_new_tokens
+        self.generate_options = generate_options
+
+        self._executor = None
+        self._requests = None
+        self._batcher = None
+
+    async def start(self):
+        # Also restarts a server that was stopped or whose batch loop failed
+        if self._batcher is None or self._batcher.done():
+            # The layers cache activations on themselves, so only one batch may run at a time
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            self._requests = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._executor is not None:
+            # The batch in flight finishes on its thread, the event loop keeps running meanwhile
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown)
+
+    async def submit(self, question):
+        """Asynchronously yield the answer to one question token by token"""
+        await self.start()
+
+        tokenizer = self.data_generator.tokenizer
+        if tokenizer is not None:
+            # A subword tokenizer can encode any word
+            prompt = tokenizer.encode(question)
+            if not prompt:
+                raise ValueError("Empty question")
+        else:
+            tokens = question.split()
+            unknown = [token for token in tokens if token not in self.data_generator.token_to_id]
+            if not tokens or unknown:
+                raise ValueError(f"Unknown tokens: {unknown}" if unknown else "Empty question")
+            prompt = self.data_generator.tokens_to_ids(tokens)
+
+        stream = asyncio.Queue()
+        await self._requests.put((prompt, stream))
+
+        while True:
+            item = await stream.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def answer(self, question):
+        return self._join([piece async for piece in self.submit(question)])
+
+    def _join(self, pieces):
+        # Subword pieces are streamed as the growing decoded text, words on their own
+        return ''.join(pieces) if self.data_generator.tokenizer is not None else ' '.join(pieces)
+
+    async def serve_tcp(self, host='127.0.0.1', port=8765):
+        async def handle_client(reader, writer):
+            # Every reply waits for the socket buffer to drain, one request at a time
+            lock = asyncio.Lock()
+
+            async def write(message):
+                async with lock:
+                    writer.write((json.dumps(message) + '\n').encode())
+                    await writer.drain()
+
+            tasks = set()
+            while line := await reader.readline():
+                task = asyncio.create_task(self._handle_line(line, write))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            await asyncio.gather(*tasks)
+            await writer.drain()
+            writer.close()
+
+        await self.start()
+        server = await asyncio.start_server(handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        async def write(message):
+            sys.stdout.write(json.dumps(message) + '\n')
+            sys.stdout.flush()
+
+        await self.start()
+        tasks = set()
+        while line := await reader.readline():
+            task = asyncio.create_task(self._handle_line(line, write))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+
+    async def _handle_line(self, line, write):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+
+            response_tokens = []
+            async for token in self.submit(request['question']):
+                response_tokens.append(token)
+                await write({'id': request_id, 'token': token})
+
+            await write({'id': request_id, 'done': True, 'response': self._join(response_tokens)})
+        except Exception as e:
+            await write({'id': request_id, 'error': str(e)})
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._requests.get()]
+
+                # Keep collecting requests until the latency budget or the batch is used up
+                deadline = loop.time() + self.max_latency
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._requests.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Once submitted, _run_batch finishes the batch's streams itself
+                running = loop.run_in_executor(self._executor, self._run_batch, batch, loop)
+                batch = []
+                await running
+        except asyncio.CancelledError:
+            self._fail_pending(batch, RuntimeError("Inference server stopped"))
+            raise
+        except Exception as e:
+            # The error goes to the waiting requests, the next submit starts a new loop
+            self._fail_pending(batch, e)
+
+    def _fail_pending(self, batch, error):
+        # Requests that will never be decoded must not wait forever
+        while not self._requests.empty():
+            batch.append(self._requests.get_nowait())
+        for _, stream in batch:
+            stream.put_nowait(error)
+
+    def _run_batch(self, batch, loop):
+        streams = [stream for _, stream in batch]
+        tokenizer = self.data_generator.tokenizer
+        response_ids = [[] for _ in batch]
+        decoded = [''] * len(batch)
+
+        def on_tokens(index, token_ids):
+            if tokenizer is None:
+                for token_id in token_ids:
+                    loop.call_soon_threadsafe(streams[index].put_nowait, self.data_generator.id_to_token[token_id])
+                return
+
+            # Decode the whole response so far and send what it adds, pieces of a word end up joined
+            response_ids[index].extend(token_ids)
+            text = tokenizer.decode(response_ids[index])
+            piece, decoded[index] = text[len(decoded[index]):], text
+            if piece:
+                loop.call_soon_threadsafe(streams[index].put_nowait, piece)
+
+        try:
+            self.network.generate([prompt for prompt, _ in batch], max_new_tokens=self.max_new_tokens,
+                                  on_tokens=on_tokens, **self.generate_options)
+        except Exception as e:
+            for stream in streams:
+                loop.call_soon_threadsafe(stream.put_nowait, e)
+        finally:
+            for stream in streams:
+                loop.call_soon_threadsafe(stream.put_nowait, None)
@@ -0,0 +1,153 @@
+import numpy as np
+
+# Static buffer planning for a layer stack. The shapes of every activation are
+# fixed by the input shape, so one unplanned forward tells us all of them. From
+# there a liveness pass works out which activations / gradients are alive at
+# the same time, and the ones that never overlap share one preallocated buffer.
+#
+# Timeline of a training step with L layers:
+#   step i            forward of layer i, writes activation a_i
+#   step 2L - 1 - i   backward of layer i, writes gradient g_i (wrt its input)
+# a_i is read by the forward of layer i + 1, and by the backwards of layers
+# i + 1 and i (as their cached input / output), so in training it stays alive
+# until the backward of layer i. Without backward it dies after layer i + 1.
+# g_i is only read by the backward of layer i - 1.
+
+class MemoryPlan:
+    """
+    Buffers for one input shape.
+
+    forward[i]:  out= array for the forward of layer i, or None to let the layer allocate
+    gradient[i]: out= array for the backward of layer i, or None
+    """
+
+    def __init__(self, forward, gradient, buffers, unplanned_nbytes):
+        self.forward = forward
+        self.gradient = gradient
+        self.buffers = buffers
+        # What the planned arrays would cost if each one was allocated separately
+        self.unplanned_nbytes = unplanned_nbytes
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers)
+
+class MemoryPlanner:
+    """
+    Builds and keeps one MemoryPlan per (input shape, dtype) seen by a layer stack.
+
+    The first forward with a new shape runs unplanned and is recorded, every
+    later forward with that shape writes into the planned buffers.
+    With training=False the buffers are only valid until the next forward,
+    so the plan cannot be used for backward.
+    """
+
+    def __init__(self, layers, training=True):
+        self.layers = layers
+        self.training = training
+        self.plans = {}
+
+    def plan(self, inputs):
+        return self.plans.get((inputs.shape, inputs.dtype))
+
+    def record(self, inputs, outputs):
+        specs = [(output.shape, output.dtype) for output in outputs]
+        plan = build_plan(self.layers, (inputs.shape, inputs.dtype), specs, self.training)
+        self.plans[(inputs.shape, inputs.dtype)] = plan
+        return plan
+
+def writes_into_out(layer):
+    # In-place activations write into their input instead
+    return getattr(layer, 'supports_out', False) and not getattr(layer, 'in_place', False)
+
+def writes_gradient_into_out(layer):
+    return getattr(layer, 'supports_gradient_out', False)
+
+class _Value:
+    """An array in the timeline, possibly seen under several names (views, in-place results)"""
+
+    def __init__(self, start, end, shape, dtype):
+        self.start = start
+        self.end = end
+        self.shape = shape
+        self.dtype = dtype
+        self.buffer = None
+
+def build_plan(layers, input_spec, specs, training=True):
+    """
+    Assign buffers to the activations (and with training=True the input gradients)
+    of a layer stack, given the (shape, dtype) of every layer output.
+
+    Layers that cannot write into out= may return a view of (or overwrite) their
+    input, so their output is treated as an alias that keeps the input alive.
+    The last output is returned to the caller and is never put in the pool.
+    """
+    num_layers = len(layers)
+    returned = float('inf')
+
+    def backward_step(i):
+        return 2 * num_layers - 1 - i
+
+    # Forward activations
+    activations = []
+    previous = None
+    for i, layer in enumerate(layers):
+        end = backward_step(i) if training else i + 1
+        if writes_into_out(layer):
+            value = _Value(i, end, *specs[i])
+        else:
+            value = previous
+            if value is not None:
+                value.end = max(value.end, end)
+        activations.append(value)
+        previous = value
+
+    if activations and activations[-1] is not None:
+        activations[-1].end = returned
+
+    # Input gradients, produced from the last layer down to the first
+    gradients = [None] * num_layers
+    if training:
+        previous = None  # The loss gradient is not planned
+        for i in reversed(range(num_layers)):
+            start = backward_step(i)
+            end = start + 1 if i > 0 else returned
+            shape, dtype = specs[i - 1] if i > 0 else input_spec
+            if writes_gradient_into_out(layers[i]) and i > 0:
+                # Token id inputs still get float gradients
+                value = _Value(start, end, shape, dtype if np.issubdtype(dtype, np.floating) else np.float64)
+            else:
+                value = previous
+                if value is not None:
+                    value.end = max(value.end, end)
+            gradients[i] = value
+            previous = value
+
+    values = {id(value): value for value in activations + gradients if value is not None}
+    values = sorted((value for value in values.values() if value.end != returned), key=lambda value: value.start)
+
+    # Greedy first fit: a buffer is free again once the last reader of its value has run
+    buffers = []
+    free_after = []  # step after which buffers[j] may be reused
+    for value in values:
+        for j, buffer in enumerate(buffers):
+            if free_after[j] < value.start and buffer.shape == value.shape and buffer.dtype == value.dtype:
+                value.buffer = buffer
+                free_after[j] = value.end
+                break
+        else:
+            value.buffer = np.empty(value.shape, dtype=value.dtype)
+            buffers.append(value.buffer)
+            free_after.append(value.end)
+
+    def owned(value, i, writes):
+        if value is None or value.buffer is None or not writes(layers[i]):
+            return None
+        return value.buffer
+
+    forward = [owned(activations[i], i, writes_into_out) for i in range(num_layers)]
+    gradient = [owned(gradients[i], i, writes_gradient_into_out) if i > 0 else None for i in range(num_layers)]
+
+    unplanned_nbytes = sum(int(np.prod(value.shape)) * np.dtype(value.dtype).itemsize for value in values)
+
+    return MemoryPlan(forward, gradient, buffers, unplanned_nbytes)
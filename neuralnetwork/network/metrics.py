@@ -0,0 +1,126 @@
+import csv
+import json
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def peak_memory():
+    """High-water mark of the process resident set size in bytes, or None when unknown"""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class InMemorySink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+class JSONLinesSink:
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class CSVSink:
+    """Records of one type ('step' or 'epoch') as CSV rows, appended to the file"""
+
+    def __init__(self, path, record_type='epoch'):
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.record_type = record_type
+        self.writer = None
+
+    def write(self, record):
+        if record['type'] != self.record_type:
+            return
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(record))
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+        self.writer.writerow(record)
+
+    def close(self):
+        self.file.close()
+
+class MetricsRecorder:
+    """
+    Collects per-step training metrics and forwards them to sinks.
+
+    Every step records loss, gradient norm, learning rate, non-padding target
+    tokens and wall time, every epoch its averages, tokens/sec and the memory
+    high-water mark. Steps are kept as plain Python lists, the only per-step
+    cost besides the sinks themselves. summary() reduces them to throughput,
+    step-time percentiles and the loss curve.
+    """
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.losses = []
+        self.grad_norms = []
+        self.step_times = []
+        self.tokens = []
+        self.epoch_losses = []
+        self.peak_memory = None
+
+    def record_step(self, epoch, step, loss, grad_norm, tokens, seconds, learning_rate):
+        self.losses.append(float(loss))
+        self.grad_norms.append(float(grad_norm))
+        self.step_times.append(seconds)
+        self.tokens.append(int(tokens))
+
+        if self.sinks:
+            self._write({ 'type': 'step', 'epoch': epoch, 'step': step, 'loss': float(loss),
+                          'grad_norm': float(grad_norm), 'tokens': int(tokens), 'seconds': seconds,
+                          'tokens_per_second': tokens / seconds if seconds > 0 else None,
+                          'learning_rate': learning_rate })
+
+    def record_epoch(self, epoch, loss, grad_norm, tokens, seconds, learning_rate):
+        self.epoch_losses.append(float(loss))
+        self.peak_memory = peak_memory()
+        self._write({ 'type': 'epoch', 'epoch': epoch, 'loss': float(loss), 'grad_norm': float(grad_norm),
+                      'tokens': int(tokens), 'seconds': seconds,
+                      'tokens_per_second': tokens / seconds if seconds > 0 else None,
+                      'learning_rate': learning_rate, 'peak_memory': self.peak_memory, 'time': time.time() })
+
+    def summary(self):
+        step_times = np.asarray(self.step_times)
+        total_time = float(step_times.sum())
+        total_tokens = int(sum(self.tokens))
+        percentiles = [float(p) for p in np.percentile(step_times, [50, 90, 99])] if len(step_times) else [None] * 3
+
+        return {
+            'steps': len(self.losses),
+            'tokens': total_tokens,
+            'tokens_per_second': total_tokens / total_time if total_time > 0 else None,
+            'step_time_mean': float(step_times.mean()) if len(step_times) else None,
+            'step_time_p50': percentiles[0],
+            'step_time_p90': percentiles[1],
+            'step_time_p99': percentiles[2],
+            'grad_norm_mean': float(np.mean(self.grad_norms)) if self.grad_norms else None,
+            'grad_norm_max': float(np.max(self.grad_norms)) if self.grad_norms else None,
+            'peak_memory': self.peak_memory,
+            'final_loss': self.epoch_losses[-1] if self.epoch_losses else None,
+            'loss_history': list(self.epoch_losses),
+        }
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def _write(self, record):
+        for sink in self.sinks:
+            sink.write(record)
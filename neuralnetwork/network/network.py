@@ -1,29 +1,62 @@
 import numpy as np
 
+from neuralnetwork.layer import Sigmoid
+from neuralnetwork.layer.gradient import GradientCollector
+from neuralnetwork.lossfunction import bce, bce_with_logits, bce_with_logits_prime
+from neuralnetwork.scheduler import as_scheduler
+
+# Losses that fuse with a final Sigmoid layer: training stops at the logits and
+# uses the logits form, whose gradient is sigmoid(z) - y instead of bce_prime's
+# divisions by the saturating probabilities followed by the sigmoid derivative
+_sigmoid_fusions = {
+    bce: (bce_with_logits, bce_with_logits_prime),
+    bce_with_logits: (bce_with_logits, bce_with_logits_prime)
+}
+
 class Network:
 
-    def __init__(self, layers, loss_functions):
+    def __init__(self, layers, loss_functions, max_grad_norm=None, fuse_sigmoid=True):
         self.layers = layers
         self.loss_function, self.loss_function_prime = loss_functions
+        # With a final Sigmoid and bce, train on the logits (evaluate still applies the sigmoid)
+        self.fused_sigmoid = (fuse_sigmoid and bool(layers) and isinstance(layers[-1], Sigmoid) and
+                              self.loss_function in _sigmoid_fusions)
+        if self.fused_sigmoid:
+            self.loss_function, self.loss_function_prime = _sigmoid_fusions[self.loss_function]
+        # Per-sample gradients are clipped to this global L2 norm (None disables clipping)
+        self.max_grad_norm = max_grad_norm
+        self.loss_history = []
+        self.grad_norm_history = []
 
-    def _predict(self, data):
+    def _predict(self, data, layers=None):
         output = data
-        for layer in self.layers:
+        for layer in self.layers if layers is None else layers:
             output = layer.forward(output)
         return output
 
     def train(self, data, result, epochs, learning_rate=0.1, show_error=False):
+        # learning_rate may be a scheduler, stepped with the average error of every epoch
+        scheduler = as_scheduler(learning_rate)
+        layers = self.layers[:-1] if self.fused_sigmoid else self.layers
+
         for e in range(epochs):
             error = 0
+            grad_norm = 0
+            current_rate = scheduler.get_lr()
             for x, y in zip(data, result):
-                output = self._predict(x)
+                output = self._predict(x, layers)
 
                 error += self.loss_function(y, output)
 
                 gradient = self.loss_function_prime(y, output)
-                for layer in reversed(self.layers):
-                    gradient = layer.backward(gradient, learning_rate)
+                with GradientCollector() as gradients:
+                    for layer in reversed(layers):
+                        gradient = layer.backward(gradient, current_rate)
+                grad_norm += gradients.apply(current_rate, self.max_grad_norm)
             error /= len(data)
+            self.loss_history.append(error)
+            self.grad_norm_history.append(grad_norm / len(data))
+            scheduler.step(error)
 
             if show_error:
                 print(f"Epoch {e}: Average Error = {error:.6f}")
@@ -0,0 +1,66 @@
+import copy
+import warnings
+
+from neuralnetwork.layer import Dense
+from neuralnetwork.layer.quantized import QuantizedDense, QuantizedTensor
+from neuralnetwork.layer.transformer import (AddAndNorm, Embedding, MultiHeadAttention, Projection,
+                                             SingleHeadAttention, TransformerFFN)
+from neuralnetwork.layer.transformer.quantized import (QuantizedEmbedding, QuantizedMultiHeadAttention,
+                                                       QuantizedProjection, QuantizedSingleHeadAttention)
+from neuralnetwork.network.batch_network import BatchNetwork
+
+def quantize(network, tile_size=256):
+    """
+    Build an inference-only copy of a trained BatchNetwork with per-channel int8 weights in
+    every Dense, Projection, Embedding and attention Q/K/V/O matrix.
+
+    Matmuls dequantize one tile of tile_size output channels at a time. A tied
+    embedding/projection matrix is quantized once and shared by both layers.
+    The original network is not modified.
+
+    Other layers with weights, e.g. GroupedQueryAttention, LinearAttention or
+    an OutputHead, are deep copied with float weights and named in a warning.
+    """
+    # id(float weights) -> QuantizedTensor, so tied weights stay tied
+    shared = {}
+    kept_float = []
+    layers = [_quantize_layer(layer, tile_size, shared, kept_float) for layer in network.layers]
+    if kept_float:
+        warnings.warn(f"quantize kept float weights in: {', '.join(dict.fromkeys(kept_float))}")
+
+    return BatchNetwork(layers, (network.loss_function, network.loss_function_prime),
+                        data_generator=network.data_generator)
+
+def _quantize_weights(weights, shared):
+    if id(weights) not in shared:
+        # One scale per vocabulary column serves both the embedding rows and the projection outputs
+        shared[id(weights)] = QuantizedTensor.from_float(weights)
+    return shared[id(weights)]
+
+def _quantize_layer(layer, tile_size, shared, kept_float):
+    if isinstance(layer, Dense):
+        return QuantizedDense(layer, tile_size)
+    if isinstance(layer, Embedding):
+        return QuantizedEmbedding(_quantize_weights(layer.weights, shared), layer.d_model)
+    if isinstance(layer, Projection):
+        return QuantizedProjection(_quantize_weights(layer.weights, shared), layer.bias, tile_size)
+    if isinstance(layer, MultiHeadAttention):
+        return QuantizedMultiHeadAttention(layer, tile_size)
+    if isinstance(layer, SingleHeadAttention):
+        return QuantizedSingleHeadAttention(layer, tile_size)
+
+    if isinstance(layer, AddAndNorm):
+        quantized = copy.copy(layer)
+        quantized.normalization = copy.deepcopy(layer.normalization)
+        quantized.sublayer = _quantize_layer(layer.sublayer, tile_size, shared, kept_float)
+        return quantized
+    if isinstance(layer, TransformerFFN):
+        quantized = copy.copy(layer)
+        quantized.dense1 = QuantizedDense(layer.dense1, tile_size)
+        quantized.dense2 = QuantizedDense(layer.dense2, tile_size)
+        quantized.activation = copy.deepcopy(layer.activation)
+        return quantized
+
+    if any(True for _ in layer.parameters()):
+        kept_float.append(type(layer).__name__)
+    return copy.deepcopy(layer)
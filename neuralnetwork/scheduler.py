@@ -0,0 +1,128 @@
+import math
+
+# Learning rate schedules. A scheduler is stepped once per epoch (one pass over
+# the batches given to train) with that epoch's average loss, and get_lr()
+# returns the rate to use for the next epoch.
+
+class Scheduler:
+    def __init__(self, learning_rate):
+        self.learning_rate = learning_rate
+        self.epoch = 0
+
+    def get_lr(self):
+        raise NotImplementedError()
+
+    def step(self, loss=None):
+        self.epoch += 1
+
+    def load_state(self, saved):
+        """Continue from `saved`, e.g. a copy of this scheduler restored from a checkpoint"""
+        if type(saved) is not type(self):
+            raise ValueError(f"Cannot load the state of a {type(saved).__name__} into a {type(self).__name__}")
+        for name, value in vars(saved).items():
+            current = getattr(self, name, None)
+            if isinstance(current, Scheduler):
+                current.load_state(value)
+            else:
+                setattr(self, name, value)
+
+class ConstantLR(Scheduler):
+    def get_lr(self):
+        return self.learning_rate
+
+class LinearWarmup(Scheduler):
+    """
+    Ramp linearly from learning_rate / warmup_epochs up to learning_rate over
+    warmup_epochs, then hand over to `after` (constant when None), which
+    starts counting its own epochs once the warmup is done.
+    """
+
+    def __init__(self, learning_rate, warmup_epochs, after=None):
+        super().__init__(learning_rate)
+        if warmup_epochs < 1:
+            raise ValueError("warmup_epochs must be at least 1")
+        self.warmup_epochs = warmup_epochs
+        self.after = after if after is not None else ConstantLR(learning_rate)
+
+    def get_lr(self):
+        if self.epoch < self.warmup_epochs:
+            return self.learning_rate * (self.epoch + 1) / self.warmup_epochs
+        return self.after.get_lr()
+
+    def step(self, loss=None):
+        if self.epoch >= self.warmup_epochs:
+            self.after.step(loss)
+        super().step(loss)
+
+class CosineDecay(Scheduler):
+    """Half a cosine from learning_rate down to min_learning_rate over total_epochs, then flat"""
+
+    def __init__(self, learning_rate, total_epochs, min_learning_rate=0.0):
+        super().__init__(learning_rate)
+        self.total_epochs = total_epochs
+        self.min_learning_rate = min_learning_rate
+
+    def get_lr(self):
+        progress = min(self.epoch / self.total_epochs, 1.0)
+        return self.min_learning_rate + 0.5 * (self.learning_rate - self.min_learning_rate) * (1 + math.cos(math.pi * progress))
+
+class StepDecay(Scheduler):
+    """Multiply the rate by gamma every step_size epochs"""
+
+    def __init__(self, learning_rate, step_size, gamma=0.1):
+        super().__init__(learning_rate)
+        self.step_size = step_size
+        self.gamma = gamma
+
+    def get_lr(self):
+        return self.learning_rate * self.gamma ** (self.epoch // self.step_size)
+
+class ReduceOnPlateau(Scheduler):
+    """
+    Multiply the rate by factor when the epoch loss has not improved by more
+    than threshold (relative) for patience epochs, then wait cooldown epochs
+    before watching again. The rate never goes below min_learning_rate.
+    """
+
+    def __init__(self, learning_rate, factor=0.5, patience=10, threshold=1e-4, cooldown=0, min_learning_rate=0.0):
+        super().__init__(learning_rate)
+        if not 0 < factor < 1:
+            raise ValueError("factor must be between 0 and 1")
+        self.factor = factor
+        self.patience = patience
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.min_learning_rate = min_learning_rate
+
+        self.current = learning_rate
+        self.best = math.inf
+        self.bad_epochs = 0
+        self.cooldown_left = 0
+
+    def get_lr(self):
+        return self.current
+
+    def step(self, loss=None):
+        super().step(loss)
+        if loss is None:
+            raise ValueError("ReduceOnPlateau needs the epoch loss")
+
+        if loss < self.best * (1 - self.threshold):
+            self.best = loss
+            self.bad_epochs = 0
+        else:
+            self.bad_epochs += 1
+
+        if self.cooldown_left > 0:
+            self.cooldown_left -= 1
+            self.bad_epochs = 0
+        elif self.bad_epochs > self.patience:
+            self.current = max(self.current * self.factor, self.min_learning_rate)
+            self.cooldown_left = self.cooldown
+            self.bad_epochs = 0
+
+def as_scheduler(learning_rate):
+    """Wrap a plain number in a ConstantLR, schedulers are returned unchanged"""
+    if isinstance(learning_rate, Scheduler):
+        return learning_rate
+    return ConstantLR(learning_rate)
@@ -0,0 +1,210 @@
+import itertools
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from neuralnetwork.scheduler import as_scheduler
+
+# Hyperparameter sweeps over independent BatchNetwork trainings in a process pool.
+#
+# A sweep is driven by a build function, build(config) -> (network, batches,
+# learning_rate), which must be defined at module level so the worker processes
+# can import it (scripts starting a sweep need an `if __name__ == '__main__':`
+# guard). Workers are spawned fresh, so the BLAS thread variables set for them
+# are read when NumPy is first imported there.
+
+BLAS_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                         'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+class Uniform:
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng):
+        return rng.uniform(self.low, self.high)
+
+class LogUniform(Uniform):
+    """Uniform in log space, for learning rates and other scale parameters"""
+
+    def sample(self, rng):
+        return math.exp(rng.uniform(math.log(self.low), math.log(self.high)))
+
+def grid(space):
+    """Every combination of a {name: list of values} space, in order"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_search(space, num_trials, seed=None):
+    """
+    num_trials configs drawn from a space whose values are lists (one is
+    chosen), Uniform / LogUniform ranges or single fixed values.
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(num_trials):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, Uniform):
+                config[name] = values.sample(rng)
+            elif isinstance(values, (list, tuple)):
+                config[name] = rng.choice(values)
+            else:
+                config[name] = values
+        configs.append(config)
+    return configs
+
+@contextmanager
+def pinned_blas_threads(num_threads):
+    """Set the BLAS thread variables for processes started inside the block"""
+    previous = { name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES }
+    for name in BLAS_THREAD_VARIABLES:
+        os.environ[name] = str(num_threads)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _run_trial(build, config, state, epochs, keep_state):
+    # Runs in a worker: build the trial (or unpickle where the last rung stopped) and train it to `epochs`
+    if state is None:
+        network, batches, learning_rate = build(config)
+        scheduler = as_scheduler(learning_rate)
+        done = 0
+    else:
+        network, batches, scheduler, done = pickle.loads(state)
+
+    start = time.perf_counter()
+    summary = network.train(batches, epochs - done, learning_rate=scheduler)
+    seconds = time.perf_counter() - start
+
+    return {
+        'loss': summary['final_loss'],
+        'loss_history': list(network.loss_history),
+        'epochs': epochs,
+        'tokens_per_second': summary['tokens_per_second'],
+        'seconds': seconds,
+        'state': pickle.dumps((network, batches, scheduler, epochs)) if keep_state else None
+    }
+
+class Sweep:
+    """
+    Train one BatchNetwork per config across a pool of worker processes.
+
+    Every worker runs single trials with blas_threads BLAS threads, by default
+    cpu_count // blas_threads workers share the machine.
+
+    With min_epochs set the sweep uses successive halving: all trials train
+    for min_epochs, the best 1 / reduction of them (by last epoch loss) train
+    on to min_epochs * reduction, and so on until the survivors reach epochs.
+    Between rungs a trial's network, batches and scheduler travel back to the
+    parent pickled, and the next rung continues it in whichever worker is free.
+    Without min_epochs every trial trains for the full epochs.
+
+    run() returns one result dict per trial (config, loss, loss_history,
+    epochs reached, tokens_per_second, seconds, error), best first.
+    """
+
+    def __init__(self, build, configs, epochs, workers=None, blas_threads=1, min_epochs=None, reduction=3):
+        if reduction < 2:
+            raise ValueError("reduction must be at least 2")
+        if min_epochs is not None and not 1 <= min_epochs <= epochs:
+            raise ValueError("min_epochs must be between 1 and epochs")
+
+        self.build = build
+        self.configs = list(configs)
+        self.epochs = epochs
+        self.blas_threads = blas_threads
+        self.workers = workers or max(1, (os.cpu_count() or 1) // blas_threads)
+        self.min_epochs = min_epochs
+        self.reduction = reduction
+        self.results = []
+
+    def rungs(self):
+        """Epochs every surviving trial has reached after each round"""
+        if self.min_epochs is None:
+            return [self.epochs]
+        rungs = []
+        epochs = self.min_epochs
+        while epochs < self.epochs:
+            rungs.append(epochs)
+            epochs *= self.reduction
+        return rungs + [self.epochs]
+
+    def run(self):
+        self.results = [{ 'trial': i, 'config': config, 'loss': None, 'loss_history': [], 'epochs': 0,
+                          'tokens_per_second': None, 'seconds': 0.0, 'error': None }
+                        for i, config in enumerate(self.configs)]
+        states = [None] * len(self.configs)
+        alive = list(range(len(self.configs)))
+        rungs = self.rungs()
+
+        with pinned_blas_threads(self.blas_threads), \
+                ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            for rung, epochs in enumerate(rungs):
+                last = rung == len(rungs) - 1
+                futures = { i: pool.submit(_run_trial, self.build, self.configs[i], states[i], epochs, not last)
+                            for i in alive }
+
+                for i, future in futures.items():
+                    result = self.results[i]
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        result['error'] = f'{type(e).__name__}: {e}'
+                        states[i] = None
+                        continue
+                    states[i] = outcome.pop('state')
+                    result['seconds'] += outcome.pop('seconds')
+                    result.update(outcome)
+
+                ranked = sorted((i for i in alive if self.results[i]['error'] is None),
+                                key=lambda i: self._rank(self.results[i]))
+                alive = ranked[:max(1, math.ceil(len(ranked) / self.reduction))]
+                for i in set(futures) - set(alive):
+                    states[i] = None
+
+        self.results.sort(key=self._rank)
+        return self.results
+
+    @staticmethod
+    def _rank(result):
+        # Longest trained first, then by loss, diverged (NaN) and failed trials last
+        loss = result['loss']
+        if result['error'] is not None or loss is None or math.isnan(loss):
+            loss = math.inf
+        return -result['epochs'], loss
+
+    def table(self):
+        """The results as an aligned text table, one row per trial"""
+        names = list(dict.fromkeys(name for result in self.results for name in result['config']))
+        header = ['trial'] + names + ['epochs', 'loss', 'tokens/s', 'seconds']
+
+        rows = []
+        for result in self.results:
+            row = [str(result['trial'])] + [_format(result['config'].get(name, '')) for name in names]
+            if result['error'] is not None:
+                row += [str(result['epochs']), result['error'], '', '']
+            else:
+                row += [str(result['epochs']), _format(result['loss']), _format(result['tokens_per_second'], '.0f'),
+                        _format(result['seconds'], '.1f')]
+            rows.append(row)
+
+        widths = [max(len(row[column]) for row in [header] + rows) for column in range(len(header))]
+        lines = [' | '.join(cell.ljust(width) for cell, width in zip(row, widths)) for row in [header] + rows]
+        lines.insert(1, '-+-'.join('-' * width for width in widths))
+        return '\n'.join(lines)
+
+def _format(value, spec='.4g'):
+    if isinstance(value, float):
+        return format(value, spec)
+    return '' if value is None else str(value)
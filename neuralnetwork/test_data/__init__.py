@@ -1,8 +1,19 @@
 from .sentence import *
 from .data_generator import DataGenerator
+from .tokenizer import BPETokenizer
+from .token_shards import ShardWriter, ShardDataset, write_generator_shards, write_text_shards
+from .image_dataset import ImageDataset, read_idx, load_mnist
 
 __all__ = [
     'DataGenerator',
+    'BPETokenizer',
+    'ShardWriter',
+    'ShardDataset',
+    'write_generator_shards',
+    'write_text_shards',
+    'ImageDataset',
+    'read_idx',
+    'load_mnist',
     'square_question_answer',
     'square_root_question_answer',
     'sum_question_answer'
@@ -5,15 +5,30 @@ from neuralnetwork.test_data import square_question_answer, square_root_question
 class DataGenerator:
     PAD_TOKEN = '<PAD>'
     EOS_TOKEN = '<EOS>'  # End Of Sequence token
-
-    def __init__(self):
+    UNK_TOKEN = '<UNK>'  # Words outside the vocabulary
+
+    def __init__(self, tokenizer=None):
+        """
+        Without a tokenizer every word of the corpus is one token.
+        With a BPETokenizer the samples are encoded into its subword ids; an
+        untrained tokenizer is first trained on the samples.
+        """
         self.token_to_id = { }
         self.id_to_token = { }
         self.vocab_size = 0
         self.samples = []
-        self._create_vocabulary()
+        self.tokenizer = tokenizer
         self._generate_samples()
 
+        if tokenizer is None:
+            self._create_vocabulary()
+        else:
+            if not tokenizer.trained:
+                tokenizer.train(' '.join(sample) for sample in self.samples)
+            self.token_to_id = tokenizer.token_to_id
+            self.id_to_token = tokenizer.id_to_token
+            self.vocab_size = tokenizer.vocab_size
+
     def _create_vocabulary(self):
         used_numbers = set()
         
@@ -39,7 +54,7 @@ class DataGenerator:
 
         words = ['what', 'is', 'the', 'square', 'root', 'of', 'sum', 'and']
 
-        all_tokens = [self.PAD_TOKEN] + words + numbers + [self.EOS_TOKEN]
+        all_tokens = [self.PAD_TOKEN] + words + numbers + [self.EOS_TOKEN, self.UNK_TOKEN]
 
         self.token_to_id = { token: i for i, token in enumerate(all_tokens) }
         self.id_to_token = { i: token for i, token in enumerate(all_tokens) }
@@ -72,21 +87,36 @@ class DataGenerator:
         self.samples = samples
 
     def tokens_to_ids(self, tokens):
-        return [self.token_to_id.get(token, self.token_to_id[self.PAD_TOKEN]) for token in tokens]
+        if self.tokenizer is not None:
+            return self.tokenizer.encode(' '.join(tokens))
+        return [self.token_to_id.get(token, self.token_to_id[self.UNK_TOKEN]) for token in tokens]
 
     def ids_to_tokens(self, ids):
         return [self.id_to_token[id] for id in ids]
 
-    def create_batches(self, batch_size, shuffle=True):
-        samples = self.samples.copy()
+    def decode(self, ids):
+        """Text of a sequence of ids, with subword tokens joined back into words"""
+        if self.tokenizer is not None:
+            return self.tokenizer.decode(ids)
+        return ' '.join(token for token in self.ids_to_tokens(ids) if token != self.PAD_TOKEN)
 
-        if not samples:
+    def create_batches(self, batch_size, shuffle=True):
+        if not self.samples:
             return []
 
+        order = np.arange(len(self.samples))
         if shuffle:
-            np.random.shuffle(samples)
+            np.random.shuffle(order)
+        return SampleBatches(self, order, batch_size)
+
+    def assemble_batches(self, order, batch_size):
+        """(x, y) batches of the samples taken in the given order"""
+        samples = [self.samples[i] for i in order]
 
-        id_sequences = [self.tokens_to_ids(sample) for sample in samples]
+        if self.tokenizer is not None:
+            id_sequences = self.tokenizer.encode_batch([' '.join(sample) for sample in samples])
+        else:
+            id_sequences = [self.tokens_to_ids(sample) for sample in samples]
 
         padded_sequences = self._pad_sequences(id_sequences)
 
@@ -163,6 +193,28 @@ class DataGenerator:
             print(f"  Input tokens 1: {[self.id_to_token[id] for id in x_batch[0]]}")
             print(f"  Target tokens 1: {[self.id_to_token[id] for id in y_batch[0]]}")
 
+class SampleBatches(list):
+    """
+    The list of (x, y) batches from DataGenerator.create_batches, which also
+    keeps the sample order it was built from. Assigning order rebuilds the
+    batches in that order, which is how a checkpoint resumes the same batches.
+    """
+
+    def __init__(self, data_generator, order, batch_size):
+        super().__init__()
+        self.data_generator = data_generator
+        self.batch_size = batch_size
+        self.order = order
+
+    @property
+    def order(self):
+        return self._order
+
+    @order.setter
+    def order(self, order):
+        self._order = np.asarray(order)
+        self[:] = self.data_generator.assemble_batches(self._order, self.batch_size)
+
 if __name__ == '__main__':
     data_gen = DataGenerator()
     data_gen.inspect()
\ No newline at end of file
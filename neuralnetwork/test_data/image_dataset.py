@@ -0,0 +1,145 @@
+import os
+
+import numpy as np
+
+# Image classification data read straight from local files:
+#   IDX    the MNIST format, big-endian header followed by the raw array
+#   .npy   NumPy arrays, e.g. images saved as (count, height, width) uint8
+# Both are opened with np.memmap, so only the samples of a batch are read.
+
+# IDX type byte -> element dtype (multi-byte types are big-endian)
+_IDX_DTYPES = {
+    0x08: np.dtype(np.uint8),
+    0x09: np.dtype(np.int8),
+    0x0B: np.dtype('>i2'),
+    0x0C: np.dtype('>i4'),
+    0x0D: np.dtype('>f4'),
+    0x0E: np.dtype('>f8')
+}
+
+def read_idx(path):
+    """Memory-map an uncompressed IDX file"""
+    with open(path, 'rb') as file:
+        header = file.read(4)
+        if len(header) < 4 or header[0] != 0 or header[1] != 0:
+            raise ValueError(f"{path} is not an IDX file (gzipped files must be decompressed first)")
+        if header[2] not in _IDX_DTYPES:
+            raise ValueError(f"Unknown IDX element type: {header[2]:#x}")
+        shape = tuple(np.frombuffer(file.read(4 * header[3]), dtype='>u4').astype(int))
+
+    return np.memmap(path, dtype=_IDX_DTYPES[header[2]], mode='r', offset=4 + 4 * len(shape), shape=shape)
+
+def load_array(path):
+    """Memory-map a .npy or IDX file"""
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    return read_idx(path)
+
+class ImageDataset:
+    """
+    Labelled images with the batch interface of DataGenerator.
+
+    images and labels are file paths (IDX or .npy) or arrays, images shaped
+    (count, ...) and labels (count,) integer classes. Nothing is copied up
+    front: classes keeps only the samples of those classes (relabelled to
+    their position in classes), limit_per_class takes the first samples of
+    each class, and the selection is a single index array into the mapped files.
+
+    Every batch is scaled to float32 and one-hot encoded into buffers that are
+    reused by the next batch, so copy a batch to keep it. sample_shape and
+    label_shape reshape each sample, e.g. (1, 28, 28) for Convolutional and
+    (1, num_classes) for a per-sample Network.
+    """
+
+    def __init__(self, images, labels, classes=None, limit_per_class=None, scale=1 / 255,
+                 sample_shape=None, label_shape=None):
+        self.images = load_array(images) if isinstance(images, str) else images
+        labels = load_array(labels) if isinstance(labels, str) else labels
+        if len(self.images) != len(labels):
+            raise ValueError(f"{len(self.images)} images but {len(labels)} labels")
+
+        # Labels are one byte per sample, small enough to read whole
+        labels = np.asarray(labels).astype(np.int64)
+        self.classes = np.unique(labels) if classes is None else np.asarray(classes)
+        self.num_classes = len(self.classes)
+
+        # class_index[label] -> one-hot column, -1 for classes that are left out
+        class_index = np.full(max(labels.max(), self.classes.max()) + 1, -1)
+        class_index[self.classes] = np.arange(self.num_classes)
+
+        selected = [np.flatnonzero(labels == label)[:limit_per_class] for label in self.classes]
+        self.indices = np.sort(np.concatenate(selected))
+        self.targets = class_index[labels[self.indices]]
+
+        self.scale = scale
+        self.sample_shape = tuple(sample_shape) if sample_shape is not None else self.images.shape[1:]
+        self.label_shape = tuple(label_shape) if label_shape is not None else (self.num_classes,)
+        if np.prod(self.sample_shape) != np.prod(self.images.shape[1:]):
+            raise ValueError(f"Cannot reshape images of shape {self.images.shape[1:]} to {self.sample_shape}")
+        if np.prod(self.label_shape) != self.num_classes:
+            raise ValueError(f"label_shape {self.label_shape} does not hold {self.num_classes} classes")
+
+        self._x = None
+        self._y = None
+
+    def __len__(self):
+        return len(self.indices)
+
+    def create_batches(self, batch_size, shuffle=True, rng=None):
+        order = np.arange(len(self))
+        if shuffle:
+            (rng if rng is not None else np.random).shuffle(order)
+        return ImageBatches(self, order, batch_size)
+
+    def assemble(self, positions):
+        """(x, y) for the given positions in the selection, in the reused buffers"""
+        count = len(positions)
+        if self._x is None or len(self._x) < count:
+            self._x = np.empty((count,) + self.sample_shape, dtype=np.float32)
+            self._y = np.empty((count,) + self.label_shape, dtype=np.float32)
+        x, y = self._x[:count], self._y[:count]
+
+        # Fancy indexing reads only these samples from the mapped file
+        images = self.images[self.indices[positions]]
+        np.multiply(images.reshape(x.shape), self.scale, out=x, casting='unsafe')
+
+        one_hot = y.reshape(count, self.num_classes)
+        one_hot.fill(0)
+        one_hot[np.arange(count), self.targets[positions]] = 1
+        return x, y
+
+class ImageBatches:
+    """Lazy list of (x, y) batches, each one assembled when it is reached"""
+
+    def __init__(self, dataset, order, batch_size):
+        self.dataset = dataset
+        self.order = order
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return (len(self.order) + self.batch_size - 1) // self.batch_size
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.dataset.assemble(self.order[i * self.batch_size:(i + 1) * self.batch_size])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def load_mnist(directory, split='train', **options):
+    """
+    ImageDataset over the MNIST files in directory, as IDX
+    (train-images-idx3-ubyte, t10k-labels-idx1-ubyte, ...) or .npy with the same names.
+    """
+    if split not in ('train', 'test'):
+        raise ValueError(f"Unknown MNIST split: {split}")
+    prefix = 'train' if split == 'train' else 't10k'
+    paths = []
+    for name in (f'{prefix}-images-idx3-ubyte', f'{prefix}-labels-idx1-ubyte'):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) and os.path.exists(path + '.npy'):
+            path += '.npy'
+        paths.append(path)
+    return ImageDataset(*paths, **options)
@@ -0,0 +1,184 @@
+import json
+import os
+
+import numpy as np
+
+# On-disk dataset of token id sequences:
+#   meta.json               vocabulary, special tokens and shard list
+#   shard_00000.tokens      every sequence of the shard back to back, flat int32
+#   shard_00000.index       int64 offsets, sequence i is tokens[index[i]:index[i + 1]]
+# Shards are opened with np.memmap, so only the pages of the sequences a
+# batch needs are read and the corpus may be larger than memory.
+
+TOKEN_DTYPE = np.int32
+INDEX_DTYPE = np.int64
+
+class ShardWriter:
+    """
+    Append token id sequences to a shard directory, starting a new shard
+    after shard_size tokens. Use as a context manager or call close().
+
+    vocabulary lists the tokens in id order (or is an id -> token dict).
+    """
+
+    def __init__(self, directory, vocabulary, pad_token='<PAD>', eos_token='<EOS>', shard_size=1 << 24):
+        if isinstance(vocabulary, dict):
+            vocabulary = [vocabulary[i] for i in range(len(vocabulary))]
+        self.directory = directory
+        self.vocabulary = list(vocabulary)
+        self.pad_token = pad_token
+        self.eos_token = eos_token
+        self.shard_size = shard_size
+
+        self.shards = []
+        self._file = None
+        self._offsets = None
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write(self, ids):
+        if self._file is None or self._offsets[-1] >= self.shard_size:
+            self._finish_shard()
+            self._start_shard()
+
+        ids = np.asarray(ids, dtype=TOKEN_DTYPE)
+        if ids.size and (ids.min() < 0 or ids.max() >= len(self.vocabulary)):
+            raise ValueError("Token id outside the vocabulary")
+
+        self._file.write(ids.tobytes())
+        self._offsets.append(self._offsets[-1] + len(ids))
+
+    def close(self):
+        self._finish_shard()
+        with open(os.path.join(self.directory, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump({ 'vocabulary': self.vocabulary, 'pad_token': self.pad_token, 'eos_token': self.eos_token,
+                        'shards': self.shards }, file, ensure_ascii=False)
+
+    def _start_shard(self):
+        name = f'shard_{len(self.shards):05d}'
+        self._file = open(os.path.join(self.directory, name + '.tokens'), 'wb')
+        self._offsets = [0]
+        self.shards.append({ 'name': name, 'num_sequences': 0 })
+
+    def _finish_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        offsets = np.asarray(self._offsets, dtype=INDEX_DTYPE)
+        offsets.tofile(os.path.join(self.directory, self.shards[-1]['name'] + '.index'))
+        self.shards[-1]['num_sequences'] = len(offsets) - 1
+
+def write_generator_shards(directory, data_generator, shard_size=1 << 24):
+    """Convert the samples of a DataGenerator (word or subword tokens) into shards"""
+    with ShardWriter(directory, data_generator.id_to_token, data_generator.PAD_TOKEN, data_generator.EOS_TOKEN,
+                     shard_size) as writer:
+        for sample in data_generator.samples:
+            writer.write(data_generator.tokens_to_ids(sample))
+    return ShardDataset(directory)
+
+def write_text_shards(directory, texts, tokenizer, shard_size=1 << 24, append_eos=True):
+    """Tokenize an iterable of strings (e.g. lines of a file) with a BPETokenizer into shards"""
+    with ShardWriter(directory, tokenizer.id_to_token, tokenizer.PAD_TOKEN, tokenizer.EOS_TOKEN,
+                     shard_size) as writer:
+        for text in texts:
+            ids = tokenizer.encode(text)
+            if append_eos:
+                ids.append(tokenizer.eos_id)
+            writer.write(ids)
+    return ShardDataset(directory)
+
+class ShardDataset:
+    """
+    Read-only view of a shard directory with the batch interface of DataGenerator:
+    vocab_size, token_to_id / id_to_token, PAD_TOKEN / EOS_TOKEN and create_batches,
+    so it can be given to BatchNetwork as its data generator.
+
+    Sequences longer than max_length + 1 tokens are cut to that length.
+    """
+
+    def __init__(self, directory, max_length=None):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as file:
+            meta = json.load(file)
+
+        self.directory = directory
+        self.max_length = max_length
+        self.PAD_TOKEN = meta['pad_token']
+        self.EOS_TOKEN = meta['eos_token']
+        self.id_to_token = dict(enumerate(meta['vocabulary']))
+        self.token_to_id = { token: i for i, token in self.id_to_token.items() }
+        self.vocab_size = len(self.id_to_token)
+
+        self.tokens = []
+        self.offsets = []
+        for shard in meta['shards']:
+            path = os.path.join(directory, shard['name'])
+            self.offsets.append(np.memmap(path + '.index', dtype=INDEX_DTYPE, mode='r'))
+            # np.memmap cannot map an empty file
+            if self.offsets[-1][-1] > 0:
+                self.tokens.append(np.memmap(path + '.tokens', dtype=TOKEN_DTYPE, mode='r'))
+            else:
+                self.tokens.append(np.zeros(0, dtype=TOKEN_DTYPE))
+
+        # First global sequence number of every shard
+        self.shard_starts = np.cumsum([0] + [len(offsets) - 1 for offsets in self.offsets])
+
+    def __len__(self):
+        return int(self.shard_starts[-1])
+
+    def __getitem__(self, index):
+        shard = int(np.searchsorted(self.shard_starts, index, side='right')) - 1
+        local = index - self.shard_starts[shard]
+        offsets = self.offsets[shard]
+        return self.tokens[shard][offsets[local]:offsets[local + 1]]
+
+    def tokens_to_ids(self, tokens):
+        return [self.token_to_id[token] for token in tokens]
+
+    def ids_to_tokens(self, ids):
+        return [self.id_to_token[id] for id in ids]
+
+    def create_batches(self, batch_size, shuffle=True, rng=None):
+        order = np.arange(len(self))
+        if shuffle:
+            (rng if rng is not None else np.random).shuffle(order)
+        return ShardBatches(self, order, batch_size)
+
+    def assemble(self, indices):
+        """(x, y) for the given sequence numbers, right-padded to the longest of them"""
+        sequences = [self[index] for index in indices]
+        if self.max_length is not None:
+            sequences = [sequence[:self.max_length + 1] for sequence in sequences]
+
+        batch = np.full((len(sequences), max(len(sequence) for sequence in sequences)),
+                        self.token_to_id[self.PAD_TOKEN], dtype=np.int64)
+        for row, sequence in enumerate(sequences):
+            batch[row, :len(sequence)] = sequence
+
+        return batch[:, :-1], batch[:, 1:]
+
+class ShardBatches:
+    """Lazy list of (x, y) batches, each one read from the shards when it is reached"""
+
+    def __init__(self, dataset, order, batch_size):
+        self.dataset = dataset
+        self.order = order
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return (len(self.order) + self.batch_size - 1) // self.batch_size
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.dataset.assemble(self.order[i * self.batch_size:(i + 1) * self.batch_size])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
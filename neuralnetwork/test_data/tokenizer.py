@@ -0,0 +1,229 @@
+import heapq
+import json
+from collections import Counter
+
+import numpy as np
+
+class BPETokenizer:
+    """
+    Byte pair encoding over characters with SentencePiece-style word starts.
+
+    Text is split on whitespace and every word gets a leading WORD_START, so
+    'the sum' is learned as '▁the', '▁sum', ... and decodes back exactly.
+    train() learns merges from a corpus until vocab_size tokens exist, then the
+    vocabulary is compiled into a character trie. Words are encoded by walking
+    the trie and taking the longest known token at every position, each word
+    is encoded once and then served from a cache. Characters never seen in
+    training become UNK_TOKEN, special tokens written as whole words
+    (e.g. '<EOS>') map straight to their ids.
+
+    Ids 0, 1, 2 are PAD_TOKEN, UNK_TOKEN and EOS_TOKEN.
+    """
+
+    PAD_TOKEN = '<PAD>'
+    UNK_TOKEN = '<UNK>'
+    EOS_TOKEN = '<EOS>'
+    WORD_START = '▁'
+
+    def __init__(self, vocab_size=1000, min_frequency=2, cache_size=65536):
+        self.target_vocab_size = vocab_size
+        self.min_frequency = min_frequency
+        self.cache_size = cache_size
+
+        self.special_tokens = [self.PAD_TOKEN, self.UNK_TOKEN, self.EOS_TOKEN]
+        self.alphabet = []
+        self.merges = []
+        self._compile()
+
+    @property
+    def vocab_size(self):
+        return len(self.id_to_token)
+
+    @property
+    def trained(self):
+        return bool(self.alphabet)
+
+    @property
+    def pad_id(self):
+        return self.token_to_id[self.PAD_TOKEN]
+
+    @property
+    def unk_id(self):
+        return self.token_to_id[self.UNK_TOKEN]
+
+    @property
+    def eos_id(self):
+        return self.token_to_id[self.EOS_TOKEN]
+
+    def train(self, texts):
+        """Learn merges from an iterable of strings, replacing any previous training"""
+        word_counts = Counter(self.WORD_START + word for text in texts for word in text.split()
+                              if word not in self.special_tokens)
+
+        words = [list(word) for word in word_counts]
+        counts = [word_counts[word] for word in word_counts]
+        self.alphabet = sorted({char for word in words for char in word})
+        self.merges = []
+
+        pair_counts = Counter()
+        pair_words = {}
+        for index, symbols in enumerate(words):
+            for pair in zip(symbols, symbols[1:]):
+                pair_counts[pair] += counts[index]
+                pair_words.setdefault(pair, set()).add(index)
+
+        # Max heap with lazy invalidation, stale entries are skipped when popped
+        heap = [(-count, pair) for pair, count in pair_counts.items()]
+        heapq.heapify(heap)
+
+        known = set(self.special_tokens) | set(self.alphabet)
+        while len(known) < self.target_vocab_size and heap:
+            negative_count, pair = heapq.heappop(heap)
+            if pair_counts.get(pair, 0) != -negative_count:
+                continue
+            if -negative_count < self.min_frequency:
+                break
+
+            merged = pair[0] + pair[1]
+            self.merges.append(pair)
+            known.add(merged)
+
+            changed = set()
+            for index in pair_words.pop(pair, ()):
+                symbols = words[index]
+                for old_pair in zip(symbols, symbols[1:]):
+                    pair_counts[old_pair] -= counts[index]
+                    changed.add(old_pair)
+
+                words[index] = symbols = self._merge(symbols, pair, merged)
+
+                for new_pair in zip(symbols, symbols[1:]):
+                    pair_counts[new_pair] += counts[index]
+                    pair_words.setdefault(new_pair, set()).add(index)
+                    changed.add(new_pair)
+
+            for changed_pair in changed:
+                count = pair_counts[changed_pair]
+                if count > 0:
+                    heapq.heappush(heap, (-count, changed_pair))
+                else:
+                    del pair_counts[changed_pair]
+
+        self._compile()
+        return self
+
+    @staticmethod
+    def _merge(symbols, pair, merged):
+        result = []
+        i = 0
+        while i < len(symbols):
+            if i + 1 < len(symbols) and symbols[i] == pair[0] and symbols[i + 1] == pair[1]:
+                result.append(merged)
+                i += 2
+            else:
+                result.append(symbols[i])
+                i += 1
+        return result
+
+    def _compile(self):
+        # Vocabulary: specials, single characters, then one token per merge in merge order
+        tokens = list(self.special_tokens) + list(self.alphabet)
+        tokens += [left + right for left, right in self.merges]
+        # Different merges can spell the same token, keep its first id
+        tokens = list(dict.fromkeys(tokens))
+        self.id_to_token = dict(enumerate(tokens))
+        self.token_to_id = { token: i for i, token in enumerate(tokens) }
+        self._specials = { token: self.token_to_id[token] for token in self.special_tokens }
+
+        # Character trie: node -> {char: child}, the token id of a node is stored under None
+        self._trie = {}
+        for token, token_id in self.token_to_id.items():
+            if token in self._specials:
+                continue
+            node = self._trie
+            for char in token:
+                node = node.setdefault(char, {})
+            node[None] = token_id
+
+        self._cache = {}
+
+    def _encode_word(self, word):
+        ids = self._cache.get(word)
+        if ids is not None:
+            return ids
+
+        if word in self._specials:
+            ids = (self._specials[word],)
+        else:
+            text = self.WORD_START + word
+            unk_id = self.token_to_id[self.UNK_TOKEN]
+            ids = []
+            i = 0
+            while i < len(text):
+                node = self._trie
+                match_id, match_end = unk_id, i + 1
+                for j in range(i, len(text)):
+                    node = node.get(text[j])
+                    if node is None:
+                        break
+                    if None in node:
+                        match_id, match_end = node[None], j + 1
+                ids.append(match_id)
+                i = match_end
+            ids = tuple(ids)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[word] = ids
+        return ids
+
+    def encode(self, text):
+        ids = []
+        for word in text.split():
+            ids.extend(self._encode_word(word))
+        return ids
+
+    def encode_batch(self, texts, pad=False):
+        """
+        Encode many strings. With pad=True the result is a (len(texts), longest)
+        int array right-padded with the PAD id instead of a list of lists.
+        """
+        encoded = [self.encode(text) for text in texts]
+        if not pad:
+            return encoded
+
+        batch = np.full((len(encoded), max((len(ids) for ids in encoded), default=0)), self.pad_id, dtype=np.int64)
+        for row, ids in enumerate(encoded):
+            batch[row, :len(ids)] = ids
+        return batch
+
+    def decode(self, ids):
+        pieces = []
+        for token_id in ids:
+            token_id = int(token_id)
+            if token_id == self.pad_id:
+                continue
+            token = self.id_to_token[token_id]
+            # <EOS> reads as its own word, <UNK> stands in for characters inside a word
+            if token in self._specials and token != self.UNK_TOKEN:
+                token = self.WORD_START + token
+            pieces.append(token)
+        return ' '.join(''.join(pieces).replace(self.WORD_START, ' ').split())
+
+    def decode_batch(self, batch):
+        return [self.decode(ids) for ids in batch]
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({ 'vocab_size': self.target_vocab_size, 'min_frequency': self.min_frequency,
+                        'alphabet': self.alphabet, 'merges': self.merges }, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, cache_size=65536):
+        with open(path, encoding='utf-8') as file:
+            state = json.load(file)
+        tokenizer = cls(state['vocab_size'], state['min_frequency'], cache_size)
+        tokenizer.alphabet = state['alphabet']
+        tokenizer.merges = [tuple(pair) for pair in state['merges']]
+        tokenizer._compile()
+        return tokenizer
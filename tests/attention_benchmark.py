@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from neuralnetwork.layer.transformer import (AddAndNorm, GroupedQueryAttention, LinearAttention, MultiHeadAttention,
+                                             PositionalEncoding, TransformerFFN, create_shared_embedding_projection)
+from neuralnetwork.lossfunction import cross_entropy, cross_entropy_prime
+from neuralnetwork.network.batch_network import BatchNetwork
+from neuralnetwork.test_data.data_generator import DataGenerator
+
+# Softmax attention against its cheaper variants: one forward + backward over
+# growing sequence lengths, then the same small transformer trained on the
+# DataGenerator task with each of them.
+
+d_model = 64
+num_heads = 4
+d_ff = 4 * d_model
+n_layer = 2
+
+seq_lengths = [128, 512, 2048]
+timing_batch_size = 2
+
+batch_size = 16
+epochs = 30
+learning_rate = 0.003
+
+variants = {
+    'softmax': lambda: MultiHeadAttention(d_model, num_heads),
+    'window 64': lambda: MultiHeadAttention(d_model, num_heads, window=64, global_tokens=4),
+    'grouped-query 2': lambda: GroupedQueryAttention(d_model, num_heads, 2),
+    'linear': lambda: LinearAttention(d_model, num_heads)
+}
+
+def time_attention(create, seq_len, repeats=3):
+    attention = create()
+    inputs = np.random.randn(timing_batch_size, seq_len, d_model)
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = attention.forward(inputs)
+        attention.backward(np.ones_like(output), 0.0)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+print(f"Forward + backward, batch size {timing_batch_size} (ms)")
+print(f"{'':16}" + ''.join(f"{seq_len:>10}" for seq_len in seq_lengths))
+for name, create in variants.items():
+    print(f"{name:16}" + ''.join(f"{time_attention(create, seq_len) * 1000:10.1f}" for seq_len in seq_lengths))
+
+def build(create_attention, data_gen):
+    embedding, projection = create_shared_embedding_projection(data_gen.vocab_size, d_model)
+    layers = [embedding, PositionalEncoding(d_model)]
+    for _ in range(n_layer):
+        layers += [AddAndNorm(d_model, create_attention()), AddAndNorm(d_model, TransformerFFN(d_model, d_ff))]
+    layers.append(projection)
+    return BatchNetwork(layers, (cross_entropy, cross_entropy_prime), data_generator=data_gen)
+
+print(f"\nTraining on the question / answer task, {epochs} epochs")
+data_gen = DataGenerator()
+batches = data_gen.create_batches(batch_size=batch_size)
+for name, create in variants.items():
+    np.random.seed(0)
+    network = build(create, data_gen)
+    summary = network.train(batches, iterations=epochs, learning_rate=learning_rate)
+    print(f"{name:16} final loss {summary['final_loss']:.4f} | {summary['tokens_per_second']:.0f} tokens/s")
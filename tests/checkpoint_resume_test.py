@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from neuralnetwork.layer.transformer import AddAndNorm, MultiHeadAttention, PositionalEncoding, TransformerFFN
+from neuralnetwork.layer.transformer.embedding_projection import create_shared_embedding_projection
+from neuralnetwork.lossfunction import cross_entropy, cross_entropy_prime
+from neuralnetwork.network import BatchNetwork, Checkpointer, InMemorySink, MetricsRecorder
+from neuralnetwork.scheduler import CosineDecay
+from neuralnetwork.test_data import DataGenerator
+
+# Training interrupted after a mid-epoch snapshot, resumed from it, then
+# continued by a second train call with the same scheduler. The learning rate
+# must follow the uninterrupted schedule the whole way, and the weights must
+# come out exactly as those of an uninterrupted run.
+d_model = 16
+epochs = 6
+batch_size = 64
+
+def build(shuffle_seed):
+    np.random.seed(0)
+    data_gen = DataGenerator()
+    embedding, projection = create_shared_embedding_projection(data_gen.vocab_size, d_model)
+    layers = [embedding, PositionalEncoding(d_model),
+              AddAndNorm(d_model, MultiHeadAttention(d_model, 2)),
+              AddAndNorm(d_model, TransformerFFN(d_model, 2 * d_model)),
+              projection]
+    network = BatchNetwork(layers, (cross_entropy, cross_entropy_prime), data_generator=data_gen)
+    # A restarted process shuffles differently, the checkpoint brings back the interrupted order
+    np.random.seed(shuffle_seed)
+    return network, data_gen.create_batches(batch_size=batch_size)
+
+def epoch_rates(run):
+    sink = InMemorySink()
+    run(MetricsRecorder([sink]))
+    return [record['learning_rate'] for record in sink.records if record['type'] == 'epoch']
+
+def weights(network):
+    return [array.copy() for layer in network.layers for _, array in layer.parameters()]
+
+expected = [CosineDecay(0.01, epochs).get_lr()]
+reference = CosineDecay(0.01, epochs)
+for _ in range(epochs - 1):
+    reference.step()
+    expected.append(reference.get_lr())
+
+network, batches = build(shuffle_seed=1)
+uninterrupted = CosineDecay(0.01, epochs)
+network.train(batches, 4, uninterrupted)
+network.train(batches, 2, uninterrupted)
+expected_weights = weights(network)
+
+with tempfile.TemporaryDirectory() as directory:
+    # First run: the last snapshot is taken one batch into the second epoch
+    network, batches = build(shuffle_seed=1)
+    checkpointer = Checkpointer(network, directory, every=len(batches) + 1)
+    network.train(batches, 2, CosineDecay(0.01, epochs), checkpointer=checkpointer)
+
+    # Restart with a fresh scheduler: resume to epoch 4, then train 2 more epochs
+    network, batches = build(shuffle_seed=2)
+    scheduler = CosineDecay(0.01, epochs)
+    checkpointer = Checkpointer(network, directory, every=len(batches) + 1)
+    checkpointer.restore()
+
+    rates = epoch_rates(lambda metrics: network.train(batches, 4, scheduler, checkpointer=checkpointer,
+                                                      metrics=metrics))
+    assert scheduler.epoch == 4, scheduler.epoch
+    rates += epoch_rates(lambda metrics: network.train(batches, 2, scheduler, metrics=metrics))
+
+assert np.allclose(rates, expected[1:]), (rates, expected[1:])
+assert scheduler.epoch == epochs and np.isclose(scheduler.get_lr(), 0.0)
+assert all(np.array_equal(a, b) for a, b in zip(weights(network), expected_weights)), \
+    "resumed weights differ from the uninterrupted run"
+
+try:
+    Checkpointer(network, tempfile.gettempdir(), keep_last=0)
+    raise AssertionError("keep_last=0 was accepted")
+except ValueError:
+    pass
+
+print("Learning rate continuous across resume:", ", ".join(f"{rate:.2e}" for rate in rates))
+print("Resumed weights identical to the uninterrupted run")
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from neuralnetwork.layer.cnn import Convolutional
+from neuralnetwork.layer.cnn.conv_algorithms import check_against_direct
+from neuralnetwork.lossfunction import mse, mse_prime
+from neuralnetwork.network import Checkpointer, Network
+
+# Algorithms caching values derived from the kernels must notice kernels
+# written from outside the layer: restoring a checkpoint after the layer has
+# run with other kernels must give the results of the restored kernels.
+input_shape = (3, 13, 11)
+
+for algorithm in ['fft', 'winograd']:
+    np.random.seed(0)
+    layer = Convolutional(input_shape, 3, 4, algorithm=algorithm)
+    network = Network([layer], (mse, mse_prime))
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpointer = Checkpointer(network, directory)
+        checkpointer.save({})
+        checkpointer.wait()
+
+        # Run with other kernels so the caches hold their transforms, then restore
+        np.copyto(layer.kernels, np.random.randn(*layer.kernels.shape))
+        layer.forward(np.random.randn(*input_shape))
+        checkpointer.restore()
+
+    error = check_against_direct(algorithm, input_shape, kernels=layer.kernels, algorithm=layer.algorithm)
+    assert error < 1e-9, (algorithm, error)
+    print(f"{algorithm}: restored kernels match the direct convolution (max error {error:.1e})")
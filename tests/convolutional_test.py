@@ -1,34 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import numpy as np
-from keras.datasets import mnist
-from keras.utils import to_categorical
 
 from neuralnetwork.layer import Sigmoid, Dense
 from neuralnetwork.layer.cnn import *
 from neuralnetwork.lossfunction import bce, bce_prime
 from neuralnetwork.network import Network
+from neuralnetwork.test_data import load_mnist
 
-def preprocess_data(x, y, limit):
-    zero_index = np.where(y == 0)[0][:limit]
-    one_index = np.where(y == 1)[0][:limit]
-    all_indicies = np.hstack((zero_index, one_index))
-    all_indicies = np.random.permutation(all_indicies)
-    x, y = x[all_indicies], y[all_indicies]
-    x = x.reshape(len(x), 1, 28, 28)
-    x = x.astype("float32") / 255
-    y = to_categorical(y)
-    y = y.reshape(len(y), 2, 1)
-    return x, y
+# Uncompressed MNIST IDX files (train-images-idx3-ubyte, ...) or .npy copies
+mnist_directory = os.environ.get('MNIST_DIR', 'data/mnist')
 
-(x_train, y_train), (x_test, y_test) = mnist.load_data()
+# The first 100 zeros and ones, one (1, 28, 28) image and (1, 2) one-hot label per sample
+options = { 'classes': (0, 1), 'limit_per_class': 100, 'sample_shape': (1, 28, 28), 'label_shape': (1, 2) }
+train = load_mnist(mnist_directory, 'train', **options)
+test = load_mnist(mnist_directory, 'test', **options)
 
-x_train, y_train = preprocess_data(x_train, y_train, 100)
-x_test, y_test = preprocess_data(x_test, y_test, 100)
+# One shuffled batch holding the whole selection
+x_train, y_train = train.create_batches(len(train))[0]
+x_test, y_test = test.create_batches(len(test))[0]
 
 network = Network([
     Convolutional((1, 28, 28), 3, 5),
     Sigmoid(),
-    Reshape((5, 26, 26), (5 * 26 * 26, 1)),
-    Dense(5 * 26 * 26, 100),
+    MaxPool2D(2),
+    Reshape((5, 13, 13), (1, 5 * 13 * 13)),
+    Dense(5 * 13 * 13, 100),
     Sigmoid(),
     Dense(100, 2),
     Sigmoid()
@@ -5,7 +5,7 @@ from neuralnetwork.network.network import Network
 from neuralnetwork.lossfunction import mse, mse_prime
 
 def test_single_prediction(network, test_input):
-    test_data = np.reshape(test_input, (len(test_input), 1))
+    test_data = np.reshape(test_input, (1, len(test_input)))
     prediction = network.evaluate(test_data)
     a, b, c = test_input
     expected = [1 if a > b else 0, 1 if b > c else 0]
@@ -29,8 +29,9 @@ data = [[2, 3, 4], [1, 5, 2], [3, 2, 3], [4, 1, 5], [0, 7, 3],
 result = [[0, 0], [0, 1], [1, 0], [1, 0], [0, 1],
           [1, 1], [0, 1], [1, 0], [0, 0], [0, 1]]
 
-X = np.reshape(data, (len(data), len(data[0]), 1))
-Y = np.reshape(result, (len(result), len(result[0]), 1))
+# Dense takes row vectors, every sample is a (1, features) batch of one
+X = np.reshape(data, (len(data), 1, len(data[0])))
+Y = np.reshape(result, (len(result), 1, len(result[0])))
 
 network.train(X, Y, epochs=1000, learning_rate=0.1)
 
@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from neuralnetwork.layer.transformer import AddAndNorm, MultiHeadAttention, PositionalEncoding, TransformerFFN
+from neuralnetwork.layer.transformer.embedding_projection import create_shared_embedding_projection
+from neuralnetwork.lossfunction import cross_entropy, cross_entropy_prime
+from neuralnetwork.network import BatchNetwork, freeze
+from neuralnetwork.test_data import DataGenerator
+
+# A frozen network is a snapshot: it matches the source when frozen and keeps
+# its outputs while the source (tied embedding / projection included) trains on.
+np.random.seed(0)
+d_model = 16
+data_gen = DataGenerator()
+embedding, projection = create_shared_embedding_projection(data_gen.vocab_size, d_model)
+network = BatchNetwork([embedding, PositionalEncoding(d_model),
+                        AddAndNorm(d_model, MultiHeadAttention(d_model, 2)),
+                        AddAndNorm(d_model, TransformerFFN(d_model, 2 * d_model)),
+                        projection],
+                       (cross_entropy, cross_entropy_prime), data_generator=data_gen)
+batches = data_gen.create_batches(batch_size=32, shuffle=False)
+x = batches[0][0]
+
+frozen = freeze(network)
+frozen_output = frozen.forward(x).copy()
+assert np.allclose(frozen_output, network.forward(x)), "frozen network differs from its source"
+
+network.train(batches, 2, 0.01)
+assert not np.allclose(network.forward(x), frozen_output), "training did not change the source network"
+assert np.array_equal(frozen.forward(x), frozen_output), "training the source changed the frozen network"
+
+print("Frozen network unaffected by training its source")
@@ -0,0 +1,82 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from neuralnetwork.backend import NumpyBackend, use_backend
+from neuralnetwork.layer.transformer import GroupedQueryAttention, MultiHeadAttention
+from neuralnetwork.network.generation import DecodeCache
+
+# Grouped-query attention against MultiHeadAttention of the same size: fewer
+# parameters and forward FLOPs, by exactly the K/V projections of the heads it
+# shares, and the same function when every query head keeps its own K/V head.
+d_model = 64
+num_heads = 8
+d_k = d_model // num_heads
+batch_size, seq_len = 2, 16
+
+class FlopCounter(NumpyBackend):
+    """Counts the multiply-adds of every matmul and einsum as 2 FLOPs"""
+
+    def __init__(self):
+        super().__init__()
+        self.flops = 0
+
+    def matmul(self, a, b, out=None):
+        result = super().matmul(a, b, out=out)
+        self.flops += 2 * result.size * a.shape[-1]
+        return result
+
+    def batched_matmul(self, a, b, out=None):
+        result = super().batched_matmul(a, b, out=out)
+        self.flops += 2 * result.size * a.shape[-1]
+        return result
+
+    def einsum(self, subscripts, *operands):
+        sizes = {}
+        for labels, operand in zip(subscripts.split('->')[0].split(','), operands):
+            sizes.update(zip(labels, operand.shape))
+        self.flops += 2 * int(np.prod(list(sizes.values())))
+        return super().einsum(subscripts, *operands)
+
+def parameter_count(layer):
+    return sum(array.size for _, array in layer.parameters())
+
+def forward_flops(layer, inputs):
+    with use_backend(FlopCounter()) as counter:
+        layer.forward(inputs)
+    return counter.flops
+
+np.random.seed(0)
+inputs = np.random.randn(batch_size, seq_len, d_model)
+mha = MultiHeadAttention(d_model, num_heads)
+mha_parameters = parameter_count(mha)
+mha_flops = forward_flops(mha, inputs)
+
+for num_kv_heads in [8, 4, 2, 1]:
+    gqa = GroupedQueryAttention(d_model, num_heads, num_kv_heads)
+    shared_heads = num_heads - num_kv_heads
+
+    # K and V lose a (d_k, d_k) projection for every shared head
+    assert parameter_count(gqa) == mha_parameters - 2 * shared_heads * d_k * d_k, num_kv_heads
+    saved = 2 * 2 * batch_size * seq_len * shared_heads * d_k * d_k
+    assert forward_flops(gqa, inputs) == mha_flops - saved, (num_kv_heads, forward_flops(gqa, inputs), mha_flops)
+
+    cache = DecodeCache(batch_size, seq_len)
+    cache.begin_step(np.tile(np.arange(seq_len), (batch_size, 1)), np.ones((batch_size, seq_len), dtype=bool))
+    gqa.forward_step(inputs, cache)
+    cached = sum(buffer[0, 0].size for buffer in cache.state(gqa).values())
+    assert cached == 2 * num_kv_heads * d_k, (num_kv_heads, cached)
+
+    print(f"{num_kv_heads} K/V heads: {parameter_count(gqa)} parameters (MHA {mha_parameters}), "
+          f"{forward_flops(gqa, inputs)} forward FLOPs (MHA {mha_flops}), {cached} cached values per token")
+
+# One K/V head per query head is MultiHeadAttention with its weights laid out per head
+gqa = GroupedQueryAttention(d_model, num_heads, num_heads)
+for h, head in enumerate(mha.attention_heads):
+    gqa.weight_q[h], gqa.weight_k[h], gqa.weight_v[h] = head.weight_q, head.weight_k, head.weight_v
+gqa.weight_o[...] = mha.weight_o
+assert np.allclose(gqa.forward(inputs), mha.forward(inputs))
+print("num_kv_heads == num_heads matches MultiHeadAttention")
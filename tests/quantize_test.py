@@ -0,0 +1,56 @@
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from neuralnetwork.layer.transformer import (AddAndNorm, GroupedQueryAttention, MultiHeadAttention,
+                                             PositionalEncoding, TransformerFFN)
+from neuralnetwork.layer.transformer.embedding_projection import create_shared_embedding_projection
+from neuralnetwork.lossfunction import cross_entropy, cross_entropy_prime
+from neuralnetwork.network import BatchNetwork, quantize
+from neuralnetwork.test_data import DataGenerator
+
+# int8 weights must stay close to the float network relative to the size of
+# its logits, and the quantized copy must not share state with its source.
+np.random.seed(0)
+d_model = 32
+data_gen = DataGenerator()
+embedding, projection = create_shared_embedding_projection(data_gen.vocab_size, d_model)
+network = BatchNetwork([embedding, PositionalEncoding(d_model),
+                        AddAndNorm(d_model, MultiHeadAttention(d_model, 4, window=4)),
+                        AddAndNorm(d_model, TransformerFFN(d_model, 4 * d_model)),
+                        projection],
+                       (cross_entropy, cross_entropy_prime), data_generator=data_gen)
+batches = data_gen.create_batches(batch_size=32, shuffle=False)
+network.train(batches, 5, 0.01)
+x, y = batches[0]
+
+quantized = quantize(network)
+logits = network.forward(x).copy()
+quantized_logits = quantized.forward(x)
+relative_error = np.linalg.norm(quantized_logits - logits) / np.linalg.norm(logits)
+assert relative_error < 0.02, relative_error
+print(f"Relative logit error: {relative_error:.2e}")
+
+# A quantized forward between the float layer's forward and backward must not change its gradient
+attention, quantized_attention = network.layers[2].sublayer, quantized.layers[2].sublayer
+hidden = np.random.randn(4, 12, d_model)
+output_gradient = np.random.randn(4, 12, d_model)
+attention.forward(hidden)
+expected_gradient = attention.backward(output_gradient, 0.0)
+attention.forward(hidden)
+quantized_attention.forward(np.random.randn(2, 9, d_model))
+assert np.array_equal(attention.backward(output_gradient, 0.0), expected_gradient)
+
+# Layers without an int8 version are reported
+gqa_network = BatchNetwork([embedding, AddAndNorm(d_model, GroupedQueryAttention(d_model, 4, 2)), projection],
+                           (cross_entropy, cross_entropy_prime), data_generator=data_gen)
+with warnings.catch_warnings(record=True) as caught:
+    warnings.simplefilter('always')
+    quantize(gqa_network)
+assert any('GroupedQueryAttention' in str(warning.message) for warning in caught), caught
+
+print("Quantized network independent of its source")
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from neuralnetwork.backend import NumpyBackend, ThreadedNumpyBackend
+
+# The threaded backend must give NumpyBackend's results for every shape pair
+# matmul broadcasts, including operands that only one side batches.
+rng = np.random.default_rng(0)
+reference = NumpyBackend()
+threaded = ThreadedNumpyBackend(num_threads=4)
+
+batched_shapes = [
+    ((8, 5, 3), (8, 3, 4)),         # same batch
+    ((8, 5, 3), (3, 4)),            # shared right operand
+    ((8, 5, 3), (1, 3, 4)),         # right operand broadcast along the batch
+    ((1, 5, 3), (8, 3, 4)),         # left operand broadcast along the batch
+    ((6, 5, 3), (2, 6, 3, 4)),      # right operand with an extra leading axis
+    ((2, 6, 5, 3), (6, 3, 4)),      # left operand with an extra leading axis
+    ((2, 1, 5, 3), (1, 6, 3, 4)),   # both broadcast
+    ((8, 5, 3), (3,)),              # matrix-vector
+]
+for a_shape, b_shape in batched_shapes:
+    a, b = rng.standard_normal(a_shape), rng.standard_normal(b_shape)
+    expected = reference.batched_matmul(a, b)
+    result = threaded.batched_matmul(a, b)
+    assert result.shape == expected.shape, (a_shape, b_shape, result.shape)
+    assert np.allclose(result, expected), (a_shape, b_shape)
+
+    out = np.empty(expected.shape)
+    assert threaded.batched_matmul(a, b, out=out) is out and np.allclose(out, expected), (a_shape, b_shape)
+
+for a_shape in [(300, 16), (4, 100, 16), (16,)]:
+    a, b = rng.standard_normal(a_shape), rng.standard_normal((16, 8))
+    assert np.allclose(threaded.matmul(a, b), reference.matmul(a, b)), a_shape
+
+print(f"Threaded backend matches NumpyBackend on {len(batched_shapes)} batched shape pairs")
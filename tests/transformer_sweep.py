@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neuralnetwork.layer.transformer import AddAndNorm, TransformerFFN
+from neuralnetwork.layer.transformer.attention import MultiHeadAttention
+from neuralnetwork.layer.transformer.embedding_projection import create_shared_embedding_projection
+from neuralnetwork.layer.transformer.positional_encoding import PositionalEncoding
+from neuralnetwork.lossfunction import cross_entropy, cross_entropy_prime
+from neuralnetwork.network.batch_network import BatchNetwork
+from neuralnetwork.scheduler import CosineDecay, LinearWarmup
+from neuralnetwork.sweep import LogUniform, Sweep, grid, random_search
+from neuralnetwork.test_data.data_generator import DataGenerator
+
+# The hyperparameters of transformer_test.py as a search space
+search_space = {
+    'd_model': [32, 64],
+    'num_heads': [2, 4],
+    'd_ff_factor': [2, 4],
+    'n_layer': [1, 2],
+    'batch_size': [16, 32],
+    'learning_rate': LogUniform(3e-4, 1e-2),
+}
+num_trials = 12
+epochs = 81
+warmup_epochs = 10
+
+def build(config):
+    # Runs inside a worker process
+    d_model = config['d_model']
+    data_gen = DataGenerator()
+    embedding, projection = create_shared_embedding_projection(data_gen.vocab_size, d_model)
+
+    layers = [embedding, PositionalEncoding(d_model)]
+    for _ in range(config['n_layer']):
+        layers += [AddAndNorm(d_model, MultiHeadAttention(d_model, config['num_heads'])),
+                   AddAndNorm(d_model, TransformerFFN(d_model, config['d_ff_factor'] * d_model))]
+    layers.append(projection)
+
+    network = BatchNetwork(layers, (cross_entropy, cross_entropy_prime), data_generator=data_gen)
+    learning_rate = LinearWarmup(config['learning_rate'], warmup_epochs,
+                                 CosineDecay(config['learning_rate'], epochs - warmup_epochs, 1e-5))
+    return network, data_gen.create_batches(batch_size=config['batch_size']), learning_rate
+
+if __name__ == '__main__':
+    configs = random_search(search_space, num_trials, seed=0)
+    # or an exhaustive grid over a smaller space:
+    # configs = grid({ 'd_model': [32, 64], 'num_heads': [4], 'd_ff_factor': [4], 'n_layer': [1, 2],
+    #                  'batch_size': [16], 'learning_rate': [1e-3, 3e-3] })
+
+    # Successive halving: everything trains 3 epochs, the best third 9, then 27, then the full run
+    sweep = Sweep(build, configs, epochs, blas_threads=1, min_epochs=3, reduction=3)
+    sweep.run()
+    print(sweep.table())
@@ -1,7 +1,6 @@
 import os
 import sys
 
-from neuralnetwork.layer import SoftMax
 from neuralnetwork.layer.transformer import AddAndNorm, TransformerFFN
 from neuralnetwork.layer.transformer.attention import MultiHeadAttention
 
@@ -13,6 +12,7 @@ from neuralnetwork.layer.transformer.embedding_projection import create_shared_e
 from neuralnetwork.layer.transformer.positional_encoding import PositionalEncoding
 from neuralnetwork.lossfunction import cross_entropy, cross_entropy_prime
 from neuralnetwork.network.batch_network import BatchNetwork
+from neuralnetwork.scheduler import CosineDecay, LinearWarmup
 from neuralnetwork.test_data.data_generator import DataGenerator
 
 d_model = 64
@@ -20,11 +20,16 @@ num_heads = 4
 d_ff = 4 * d_model
 n_layer = 2
 
-n_batch = 200
+n_batch = 20
 batch_size = 16
-learning_rate = 0.00001
 epoch_p_batch = 50
 
+# Warm up, then cosine decay over the whole run
+warmup_epochs = 50
+peak_learning_rate = 0.003
+learning_rate = LinearWarmup(peak_learning_rate, warmup_epochs,
+                             CosineDecay(peak_learning_rate, n_batch * epoch_p_batch - warmup_epochs, 1e-5))
+
 def transformer_layer(number):
     return [
         layer
@@ -53,45 +58,31 @@ transformer = BatchNetwork(
 epoch = 1
 for i in range(n_batch):
     batches = data_gen.create_batches(batch_size=batch_size)
-    loss = transformer.train(batches, iterations=epoch_p_batch, learning_rate=learning_rate,
-                             show_error={ 'epoch': epoch, 'batch_number': i + 1 })
+    summary = transformer.train(batches, iterations=epoch_p_batch, learning_rate=learning_rate,
+                                show_error={ 'epoch': epoch, 'batch_number': i + 1 })
+    print(f"Tokens/s: {summary['tokens_per_second']:.0f} | Step p50 / p99: {summary['step_time_p50'] * 1000:.1f} / {summary['step_time_p99'] * 1000:.1f} ms")
     epoch += epoch_p_batch
 
 # Interactive Loop
-softmax = SoftMax()
+max_response_length = 20
+
 while True:
     user_input = input("Enter a question (or 'exit' to quit): ")
 
     if user_input.lower() == 'exit':
         break
 
-    input_question_tokens = user_input.split()
+    # Several questions can be separated by ';' and are answered in one batch
+    questions = [question.split() for question in user_input.split(';') if question.strip()]
     try:
-        question_ids = data_gen.tokens_to_ids(input_question_tokens)
+        question_ids = [data_gen.tokens_to_ids(question) for question in questions]
     except KeyError as e:
         print(f"Unknown token: {e}")
         print(f"Available tokens: {list(data_gen.token_to_id.keys())}")
         continue
 
-    current_sequence = question_ids.copy()
-    response_tokens = []
-
-    max_response_length = 20
-
-    for _ in range(max_response_length):
-        question_batch = np.array(current_sequence).reshape(1, -1)
-
-        prediction = transformer.forward(question_batch)
-
-        probs = prediction[0, len(current_sequence) - 1, :]
-        predicted_id = np.random.choice(len(probs), p=softmax.forward(probs))
-        predicted_token = data_gen.id_to_token[predicted_id]
-
-        response_tokens.append(predicted_token)
-        current_sequence.append(predicted_id)
-
-        if predicted_token == data_gen.EOS_TOKEN:
-            break
+    responses = transformer.generate(question_ids, max_new_tokens=max_response_length, strategy='sample')
 
-    print(f"Response: {' '.join(response_tokens)}")
+    for response_ids in responses:
+        print(f"Response: {' '.join(data_gen.ids_to_tokens(response_ids))}")
     print("---")